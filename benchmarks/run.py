@@ -0,0 +1,377 @@
+# benchmarks/run.py — benchmarks do pipeline e dos cálculos das páginas (sem Streamlit rodando)
+# --------------------------------------------------------------------------------------------
+# Uso (a partir da raiz do projeto):
+#   python -m benchmarks.run --rows 10k,100k,1M
+#   python -m benchmarks.run --rows 100k --save benchmarks/baseline.json
+#   python -m benchmarks.run --rows 100k --compare benchmarks/baseline.json
+#   python -m benchmarks.run --rows 1M --workers 8   (+ pré-processamento em partições paralelas)
+#
+# Para cada tamanho, gera um RAW sintético (benchmarks/synthetic.py) e mede
+# cada etapa do pipeline (leitura/preparo, processado completo e incremental,
+# carga do dataset, índice de filtros) e os cálculos que as páginas fazem a
+# cada rerun (filtros, cubo, agrupamentos, Pareto, coorte, rankings,
+# histogramas, amostragem do scatter, contagens distintas). Os widgets ficam
+# de fora: os filtros são medidos no índice (o que sidebar_filters executa).
+# Tempo: menor e mediana de --repeat execuções. Memória: pico do tracemalloc
+# numa execução extra (alocações de Python/NumPy/pandas; buffers internos do
+# pyarrow não entram; nem a dos processos filhos com --workers).
+# --compare aponta etapas mais lentas (ou com mais pico) que a tolerância e
+# encerra com código 1 — serve como verificação de regressão.
+import argparse
+import gc
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import default_spec, generate_raw, append_rows
+from utils.app_paths import get_paths
+from utils.pre_process import load_and_prepare, update_processed
+from utils.dataset import Dataset
+from utils.filter_engine import FilterIndex
+from utils.cube import query_cube
+from utils.pareto import build_paretos
+from utils.cohort import build_cohort, cohort_from_activity
+from utils.topk import build_rankings, group_sums
+from utils.histograms import histogram_counts, HIST_COLS
+from utils.scatter import sample_positions, density_grid
+from utils.sketches import SKETCH_COLS
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_SIZES = "10k,100k"
+DEFAULT_REPEAT = 3
+# acima disso, load_and_prepare (tudo em memória) é pulado
+MAX_IN_MEMORY_ROWS = 2_000_000
+# linhas anexadas no teste do modo incremental (fração do tamanho)
+APPEND_FRACTION = 0.01
+# regressão = tempo (ou pico) acima de tolerância × baseline
+DEFAULT_TOLERANCE = 1.25
+# etapas mais rápidas que isto não são comparadas (ruído de medição)
+MIN_COMPARE_SECONDS = 0.005
+
+
+def parse_size(text):
+    """'10k' -> 10000, '1M' -> 1000000, '2500' -> 2500."""
+    t = text.strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(t[-1:], 1)
+    return int(float(t[:-1] if mult > 1 else t) * mult)
+
+
+def measure(fn, repeat, setup=None):
+    """Executa fn() 'repeat' vezes (tempo) + 1 vez sob tracemalloc (pico). Retorna (saída, métricas)."""
+    times = []
+    out = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        t0 = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t0)
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, {
+        "seconds": round(min(times), 6),
+        "median": round(statistics.median(times), 6),
+        "runs": [round(t, 6) for t in times],
+        "peak_mb": round(peak / 2**20, 3),
+    }
+
+
+# ---------------------------
+# Estados de filtro representativos
+# ---------------------------
+def filter_states(df):
+    """
+    Dois estados no formato de lateral_filters.get_filter_state:
+      - 'cube': meses inteiros (metade central do período) + 2 segmentos (cabe no cubo/sketches)
+      - 'rows': o anterior + faixa de profit (exige as linhas)
+    """
+    codes = np.sort(df["month_code"].unique())
+    lo, hi = codes[len(codes) // 4], codes[3 * len(codes) // 4]
+    start = pd.Timestamp(year=int(lo) // 12, month=int(lo) % 12 + 1, day=1)
+    end = pd.Timestamp(year=int(hi) // 12, month=int(hi) % 12 + 1, day=1) + pd.offsets.MonthEnd(0)
+    segs = sorted(df["segment"].dropna().unique().tolist())[:2]
+    cube_state = {
+        "date": {"col": "order_date", "start": start, "end": end,
+                 "start_is_min": False, "end_is_max": False, "full": False},
+        "dims": {"segment": segs},
+        "ranges": {},
+    }
+    profit = df["profit"]
+    row_state = dict(cube_state, ranges={"profit": (float(profit.quantile(0.10)), float(profit.max()))})
+    return cube_state, row_state
+
+
+def apply_state(index, state):
+    """Bitmap das linhas do estado (as mesmas operações de sidebar_filters)."""
+    mask = index.all()
+    date = state["date"]
+    mask &= index.range_bitmap(date["col"], date["start"], date["end"])
+    for col, sel in state["dims"].items():
+        if sel is not None:
+            mask &= index.dim_bitmap(col, sel)
+    for col, rng in state["ranges"].items():
+        if rng is not None:
+            mask &= index.range_bitmap(col, rng[0], rng[1])
+    return mask
+
+
+# ---------------------------
+# Etapas
+# ---------------------------
+def bench_size(rows, args, workdir, log):
+    """Mede todas as etapas para um tamanho; retorna {'spec', 'stages': {nome: métricas}}."""
+    spec = default_spec(rows, orders=args.orders, customers=args.customers, products=args.products,
+                        cities=args.cities, missing_scale=args.missing_scale)
+    d = Path(workdir) / f"rows_{rows}"
+    d.mkdir(parents=True, exist_ok=True)
+    raw = d / "raw.csv"
+    t0 = time.perf_counter()
+    generate_raw(raw, spec, args.template, seed=args.seed)
+    log(f"[{rows:,} linhas] RAW sintético gerado em {time.perf_counter() - t0:.1f}s "
+        f"({raw.stat().st_size / 2**20:.1f} MiB)")
+
+    stages = {}
+
+    def run(name, fn, setup=None, repeat=None):
+        out, m = measure(fn, repeat or args.repeat, setup)
+        stages[name] = m
+        log(f"  {name:<40} {m['seconds'] * 1000:10.2f} ms  pico {m['peak_mb']:9.2f} MiB")
+        return out
+
+    # --- pipeline ---
+    full_dir = d / "full"
+    processed = full_dir / "processed.parquet"
+
+    def clean_full():
+        shutil.rmtree(full_dir, ignore_errors=True)
+        full_dir.mkdir()
+
+    if rows <= args.max_in_memory:
+        run("pre_process.load_and_prepare", lambda: load_and_prepare(raw))
+    run("pre_process.update_processed[full]", lambda: update_processed(raw, processed, workers=1),
+        setup=clean_full)
+    if args.workers > 1:
+        par_dir = d / "parallel"
+
+        def clean_parallel():
+            shutil.rmtree(par_dir, ignore_errors=True)
+            par_dir.mkdir()
+
+        run(f"pre_process.update_processed[full,workers={args.workers}]",
+            lambda: update_processed(raw, par_dir / "processed.parquet", workers=args.workers),
+            setup=clean_parallel)
+
+    # incremental: processado do RAW base + cauda nova de APPEND_FRACTION das linhas
+    app_dir = d / "append"
+    app_raw = d / "raw_appended.csv"
+    shutil.copyfile(raw, app_raw)
+    append_rows(app_raw, spec, args.template, max(1, int(rows * APPEND_FRACTION)), seed=args.seed)
+
+    def reset_append():
+        shutil.rmtree(app_dir, ignore_errors=True)
+        shutil.copytree(full_dir, app_dir)
+        shutil.copyfile(app_raw, app_dir / "raw.csv")
+
+    run("pre_process.update_processed[append]",
+        lambda: update_processed(app_dir / "raw.csv", app_dir / "processed.parquet", workers=1),
+        setup=reset_append)
+
+    ds = run("dataset.load", lambda: Dataset(processed))
+    df = ds.df
+    index = run("filter_engine.FilterIndex", lambda: FilterIndex(df))
+    ds._index = index
+
+    # --- filtros ---
+    cube_state, row_state = filter_states(df)
+    bitmap = run("filters.bitmap", lambda: apply_state(index, row_state))
+    f = run("filters.materialize", lambda: df.take(index.positions(bitmap)))
+
+    # --- cubo / agrupamentos das páginas ---
+    sales = "total_net_sales" if "total_net_sales" in df.columns else "sales"
+    series = [c for c in ("total_gross_sales", "profit") if c in df.columns]
+    agg = run("cube.query_cube", lambda: query_cube(ds.cube, cube_state))
+    run("page1.trend_groupby[cube]",
+        lambda: agg.groupby("month_year", as_index=False, observed=True)[series].sum())
+    run("page1.trend_groupby[rows]",
+        lambda: f.groupby("month_year", as_index=False, observed=True)[series].sum())
+    run("page4.segment_groupby[cube]",
+        lambda: agg.groupby(["segment", "category", "sub_category"], observed=True)[[sales, "profit"]].sum())
+
+    # --- página 2 ---
+    run("page2.histograms", lambda: [histogram_counts(df, c, ds.hist_edges[c], index=index, bitmap=bitmap)
+                                     for c in HIST_COLS if c in ds.hist_edges])
+    run("page2.scatter_sample", lambda: sample_positions(f, "profit", sales, strata="segment"))
+    run("page2.scatter_density", lambda: density_grid(f, "profit", sales))
+
+    # --- página 3 ---
+    us = df["is_usa"].to_numpy(dtype=bool)
+    run("page3.us_state_sums", lambda: group_sums(agg.loc[agg["is_usa"].to_numpy(dtype=bool)], "state_code", [sales])
+        if agg is not None else group_sums(df.loc[us], "state_code", [sales]))
+    run("page3.top_cities", lambda: build_rankings(f, "city", [sales])[sales].top(20))
+    run("page3.top_customers", lambda: [r.ends(20) for r in build_rankings(f, "customer_name", [sales, "profit"]).values()])
+
+    # --- página 4 ---
+    run("page4.paretos", lambda: build_paretos(f, "product_name", [sales, "profit", "quantity"]))
+    run("page4.rankings", lambda: build_rankings(f, "product_name", ["profit"])["profit"].ends(20))
+    run("page4.cohort[filtered]", lambda: build_cohort(f, "customer_name", value_col=sales).matrix("retention"))
+    run("page4.cohort[stored]", lambda: cohort_from_activity(ds.activity)[0].matrix("retention"))
+
+    # --- KPIs de únicos ---
+    cols = [c for c in SKETCH_COLS if c in df.columns]
+    f_cube = df.take(index.positions(apply_state(index, cube_state)))
+    run("kpi.distinct[exact]", lambda: [f_cube[c].nunique() for c in cols])
+    if ds.sketches is not None:
+        run("kpi.distinct[hll]", lambda: [ds.sketches.count(c, ds.sketches.cell_mask(cube_state)) for c in cols])
+
+    return {"spec": spec, "stages": stages}
+
+
+# ---------------------------
+# Baseline / comparação
+# ---------------------------
+def git_revision():
+    """
+    Commit do código medido ({'commit', 'dirty'}); dirty = havia alterações não
+    commitadas. None fora de um repositório git (ou sem o git instalado).
+    """
+    root = Path(__file__).resolve().parents[1]
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return {"commit": commit, "dirty": bool(status.strip())}
+
+
+def describe_revision(env):
+    """Commit de um JSON de resultados, para o log ('desconhecido' em JSONs antigos)."""
+    rev = (env or {}).get("git")
+    if not rev:
+        return "desconhecido"
+    return rev["commit"][:12] + (" (com alterações não commitadas)" if rev["dirty"] else "")
+
+
+def environment():
+    """Versões, máquina e commit (acompanham o JSON para comparações honestas)."""
+    import pyarrow
+    return {
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "pyarrow": pyarrow.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Linhas de comparação e lista de regressões (tamanho, etapa, métrica, razão)."""
+    lines, regressions = [], []
+    for size, res in current["results"].items():
+        base = baseline.get("results", {}).get(size)
+        if base is None:
+            lines.append(f"[{size}] sem baseline")
+            continue
+        lines.append(f"[{size} linhas]")
+        for name, m in res["stages"].items():
+            b = base["stages"].get(name)
+            if b is None:
+                lines.append(f"  {name:<40} (nova)")
+                continue
+            t_ratio = m["seconds"] / b["seconds"] if b["seconds"] else float("inf")
+            m_ratio = m["peak_mb"] / b["peak_mb"] if b["peak_mb"] else 1.0
+            flag = ""
+            if max(m["seconds"], b["seconds"]) >= MIN_COMPARE_SECONDS and t_ratio > tolerance:
+                regressions.append((size, name, "tempo", t_ratio))
+                flag += "  <- TEMPO"
+            if m_ratio > tolerance and m["peak_mb"] - b["peak_mb"] > 1:
+                regressions.append((size, name, "memória", m_ratio))
+                flag += "  <- MEMÓRIA"
+            lines.append(f"  {name:<40} tempo x{t_ratio:5.2f}  pico x{m_ratio:5.2f}{flag}")
+    return lines, regressions
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Benchmarks do pipeline e das páginas (headless).")
+    p.add_argument("--rows", default=DEFAULT_SIZES, help="tamanhos separados por vírgula (ex.: 10k,100k,1M,10M)")
+    p.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    p.add_argument("--orders", type=int, help="nº de pedidos (padrão: proporcional ao RAW real)")
+    p.add_argument("--customers", type=int, help="nº de clientes")
+    p.add_argument("--products", type=int, help="nº de produtos")
+    p.add_argument("--cities", type=int, help="nº de cidades (padrão: as do RAW real)")
+    p.add_argument("--missing-scale", type=float, default=1.0, help="multiplica as taxas de faltantes do RAW real")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--max-in-memory", type=int, default=MAX_IN_MEMORY_ROWS,
+                   help="acima deste tamanho load_and_prepare (tudo em memória) é pulado")
+    p.add_argument("--workers", type=int, default=1,
+                   help="mede também o processado completo em partições com N processos (ver utils/pre_process.py)")
+    p.add_argument("--template", default=str(get_paths(PROJECT_ROOT)["RAW_PATH"]),
+                   help="RAW real usado como molde (colunas, vocabulário, distribuições)")
+    p.add_argument("--workdir", help="pasta dos arquivos gerados (padrão: temporária, apagada no fim)")
+    p.add_argument("--save", help="grava os resultados neste JSON (baseline)")
+    p.add_argument("--compare", help="compara com um JSON de baseline")
+    p.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = p.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.rows.split(",") if s.strip()]
+    tmp = None if args.workdir else tempfile.mkdtemp(prefix="tt_bench_")
+    workdir = args.workdir or tmp
+
+    def log(msg):
+        print(msg, flush=True)
+
+    result = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "repeat": args.repeat,
+        "results": {},
+    }
+    try:
+        for rows in sizes:
+            result["results"][str(rows)] = bench_size(rows, args, workdir, log)
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+        log(f"Resultados gravados em {args.save}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        lines, regressions = compare(result, baseline, args.tolerance)
+        log(f"\nComparação com {args.compare} (tolerância x{args.tolerance:.2f}):")
+        log(f"  baseline: commit {describe_revision(baseline.get('environment'))}, "
+            f"{baseline.get('created', '?')}")
+        log(f"  atual:    commit {describe_revision(result['environment'])}")
+        for line in lines:
+            log(line)
+        if regressions:
+            log(f"\n{len(regressions)} regressão(ões) acima da tolerância.")
+            return 1
+        log("\nSem regressões acima da tolerância.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
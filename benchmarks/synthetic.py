@@ -0,0 +1,184 @@
+# benchmarks/synthetic.py — datasets sintéticos no formato do RAW (Superstore)
+# --------------------------------------------------------------------------
+# Gera CSVs com as mesmas colunas, formatos (datas M/D/AAAA, decimais) e ruído
+# (faltantes) de data/raw/dataset_ruido.csv, em qualquer tamanho (10k → 10M
+# linhas) e com cardinalidades configuráveis. O vocabulário das dimensões
+# pequenas (segmento, categoria/subcategoria, geografia, modo de envio) e as
+# distribuições numéricas vêm de uma amostra do RAW real; clientes, produtos,
+# pedidos e cidades extras são sintéticos. Gravação em blocos: o dataset
+# inteiro nunca fica em memória.
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# linhas do RAW real lidas para extrair vocabulário e distribuições
+TEMPLATE_ROWS = 20_000
+# linhas geradas por bloco gravado no CSV
+GEN_CHUNK_ROWS = 500_000
+
+# proporções do RAW real (9.994 linhas): usadas quando a cardinalidade não é informada
+DEFAULT_RATIOS = {"orders": 0.50, "customers": 0.08, "products": 0.19}
+
+
+def load_template(raw_path, nrows=TEMPLATE_ROWS):
+    """Amostra do RAW real (colunas na ordem original) e taxa de faltantes por coluna."""
+    t = None
+    for enc in ("utf-8", "cp1252", "latin1"):
+        try:
+            t = pd.read_csv(raw_path, encoding=enc, nrows=nrows)
+            break
+        except UnicodeDecodeError:
+            continue
+    return t, t.isna().mean().to_dict()
+
+
+def default_spec(rows, orders=None, customers=None, products=None, cities=None, missing_scale=1.0):
+    """Cardinalidades do dataset sintético (None = proporcional ao RAW real)."""
+    def scaled(value, key, minimum):
+        return int(value) if value else max(minimum, int(rows * DEFAULT_RATIOS[key]))
+    return {
+        "rows": int(rows),
+        "orders": min(int(rows), scaled(orders, "orders", 1)),
+        "customers": scaled(customers, "customers", 10),
+        "products": scaled(products, "products", 10),
+        "cities": int(cities) if cities else None,  # None = cidades do RAW real
+        "missing_scale": float(missing_scale),
+    }
+
+
+class _Universe:
+    """Entidades sintéticas (clientes, produtos, pedidos) sorteadas uma vez por dataset."""
+
+    def __init__(self, template, spec, rng):
+        t = template
+        self.columns = list(t.columns)
+        n_c, n_p, n_o = spec["customers"], spec["products"], spec["orders"]
+
+        # clientes: id, nome e segmento (um segmento por cliente, como no RAW)
+        segs = t["Segment"].dropna()
+        self.cust_id = np.array([f"CU-{i:07d}" for i in range(n_c)], dtype=object)
+        self.cust_name = np.array([f"Customer {i:07d}" for i in range(n_c)], dtype=object)
+        self.cust_seg = segs.sample(n_c, replace=True, random_state=rng.integers(2**31)).to_numpy()
+
+        # produtos: (categoria, subcategoria) do RAW + id/nome sintéticos
+        cats = t[["Category", "Sub-Category"]].dropna()
+        pick = cats.sample(n_p, replace=True, random_state=rng.integers(2**31)).to_numpy()
+        self.prod_cat, self.prod_sub = pick[:, 0], pick[:, 1]
+        self.prod_id = np.array([f"{c[:3].upper()}-{s[:2].upper()}-{i:08d}"
+                                 for i, (c, s) in enumerate(pick)], dtype=object)
+        self.prod_name = np.array([f"Product {i:08d} ({s})" for i, s in enumerate(self.prod_sub)], dtype=object)
+
+        # geografia: combinações reais (cidade, estado, CEP, região, país), + cidades extras
+        geo = t[["Country", "City", "State", "Postal Code", "Region"]].drop_duplicates(["City", "State"])
+        geo = geo.reset_index(drop=True)
+        if spec["cities"] and spec["cities"] > len(geo):
+            extra = geo.sample(spec["cities"] - len(geo), replace=True, random_state=rng.integers(2**31))
+            extra = extra.assign(City=[f"City {i:06d}" for i in range(len(extra))])
+            geo = pd.concat([geo, extra], ignore_index=True)
+        elif spec["cities"]:
+            geo = geo.iloc[:spec["cities"]]
+        self.geo = geo
+
+        # pedidos: cliente, datas, modo de envio e endereço
+        dates = pd.to_datetime(t["Order Date"], format="%m/%d/%Y", errors="coerce").dropna()
+        start, end = dates.min().value // 86_400_000_000_000, dates.max().value // 86_400_000_000_000
+        self.ord_id = np.array([f"US-{i:09d}" for i in range(n_o)], dtype=object)
+        self.ord_cust = rng.integers(0, n_c, n_o)
+        self.ord_day = rng.integers(start, end + 1, n_o)
+        self.ord_ship_days = rng.integers(0, 8, n_o)
+        self.ord_mode = t["Ship Mode"].dropna().sample(n_o, replace=True,
+                                                       random_state=rng.integers(2**31)).to_numpy()
+        self.ord_geo = rng.integers(0, len(geo), n_o)
+
+        # valores por linha: preço unitário, desconto e margem reamostrados do RAW
+        num = t[["Quantity", "Total Gross Sale", "Discount (%)", "Total Net Sales", "Profit"]].dropna()
+        self.unit_price = (num["Total Gross Sale"] / num["Quantity"]).to_numpy()
+        self.discount = num["Discount (%)"].to_numpy()
+        net = num["Total Net Sales"].to_numpy()
+        self.margin = np.divide(num["Profit"].to_numpy(), net, out=np.zeros(len(net)), where=net != 0)
+        self.quantity = num["Quantity"].to_numpy()
+
+
+def _dates(days):
+    """Dias desde a época -> texto M/D/AAAA (formato do RAW), via datas únicas."""
+    uniq, inv = np.unique(days, return_inverse=True)
+    d = pd.to_datetime(uniq, unit="D")
+    labels = np.array([f"{m}/{dd}/{y}" for m, dd, y in zip(d.month, d.day, d.year)], dtype=object)
+    return labels[inv]
+
+
+def _chunk(u, first_row, n, missing, rng):
+    """Bloco de n linhas (Row ID a partir de first_row + 1)."""
+    # linhas agrupadas por pedido, em ordem (como no RAW)
+    o = np.sort(rng.integers(0, len(u.ord_id), n))
+    c = u.ord_cust[o]
+    p = rng.integers(0, len(u.prod_id), n)
+    g = u.geo.iloc[u.ord_geo[o]]
+    k = rng.integers(0, len(u.unit_price), n)
+    qty = u.quantity[rng.integers(0, len(u.quantity), n)]
+    gross = np.round(u.unit_price[k] * qty, 2)
+    disc = u.discount[k]
+    net = np.round(gross * (1 - disc), 2)
+    profit = np.round(net * u.margin[k], 2)
+    df = pd.DataFrame({
+        "Row ID": np.arange(first_row + 1, first_row + n + 1),
+        "Order ID": u.ord_id[o],
+        "Order Date": _dates(u.ord_day[o]),
+        "Ship Date": _dates(u.ord_day[o] + u.ord_ship_days[o]),
+        "Ship Mode": u.ord_mode[o],
+        "Customer ID": u.cust_id[c],
+        "Customer Name": u.cust_name[c],
+        "Segment": u.cust_seg[c],
+        "Country": g["Country"].to_numpy(),
+        "City": g["City"].to_numpy(),
+        "State": g["State"].to_numpy(),
+        "Postal Code": g["Postal Code"].to_numpy(),
+        "Region": g["Region"].to_numpy(),
+        "Product ID": u.prod_id[p],
+        "Category": u.prod_cat[p],
+        "Sub-Category": u.prod_sub[p],
+        "Product Name": u.prod_name[p],
+        "Quantity": qty,
+        "Total Gross Sale": gross,
+        "Discount (%)": disc,
+        "Total Net Sales": net,
+        "Total Cost": np.round(net - profit, 2),
+        "Profit": profit,
+    })
+    # ruído: faltantes nas mesmas colunas/taxas do RAW real
+    for col, rate in missing.items():
+        if rate > 0 and col in df.columns:
+            df.loc[rng.random(n) < rate, col] = np.nan
+    return df[[c for c in u.columns if c in df.columns]]
+
+
+def generate_raw(path, spec, raw_template, seed=0, chunk_rows=GEN_CHUNK_ROWS):
+    """
+    Grava em 'path' um CSV sintético com spec['rows'] linhas (ver default_spec),
+    no formato de 'raw_template' (caminho do RAW real). Retorna o caminho.
+    """
+    template, missing = load_template(raw_template)
+    missing = {c: min(1.0, r * spec["missing_scale"]) for c, r in missing.items()}
+    rng = np.random.default_rng(seed)
+    u = _Universe(template, spec, rng)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for start in range(0, spec["rows"], chunk_rows):
+            n = min(chunk_rows, spec["rows"] - start)
+            _chunk(u, start, n, missing, rng).to_csv(f, index=False, header=(start == 0))
+    return path
+
+
+def append_rows(path, spec, raw_template, rows, seed=0):
+    """
+    Anexa 'rows' linhas novas (Row ID continuando) ao fim de um CSV gerado
+    com o mesmo 'seed' (mesmos clientes/produtos/pedidos, linhas diferentes).
+    """
+    template, missing = load_template(raw_template)
+    missing = {c: min(1.0, r * spec["missing_scale"]) for c, r in missing.items()}
+    u = _Universe(template, spec, np.random.default_rng(seed))
+    rng = np.random.default_rng([seed, 1])
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        _chunk(u, spec["rows"], rows, missing, rng).to_csv(f, index=False, header=False)
+    return path
@@ -1,9 +1,12 @@
 # main.py — Streamlit 1.50.0 (versão essencial + utils, com bootstrap centralizado)
 # ---------------------------------------------------------------------------
 # 1) Bootstrap de imports (via utils/bootstrap.py)
-# 2) Lê RAW, pré-processa e salva processed.csv (usando utils)
+# 2) Lê RAW, pré-processa e salva processed.parquet (usando utils)
+#    — ou, com DASHBOARD_PREBUILT=1, só carrega os artefatos gerados antes por
+#    `python -m utils.pre_process build` e para com erro se estiverem desatualizados
 # 3) Monta navegação (utils) e roda a página principal
 
+import os
 from pathlib import Path
 from utils.bootstrap import add_root
 
@@ -12,8 +15,10 @@ PROJECT_ROOT = add_root(Path(__file__).resolve().parent)
 
 import streamlit as st
 from utils.app_paths import get_paths, ensure_dirs
-from utils.pre_process import run_preprocessing
+from utils.pre_process import run_preprocessing, load_prebuilt
 from utils.navigation import build_navigation
+from utils.perf import span
+from utils.distinct import keep_approx_state
 
 st.set_page_config(
     page_title="Superstore Dashboard",
@@ -22,6 +27,10 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# modo só pré-gerado: o app nunca roda ETL numa requisição de usuário
+PREBUILT_ENV = "DASHBOARD_PREBUILT"
+PREBUILT_ONLY = os.environ.get(PREBUILT_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
 with st.sidebar:
     st.markdown("### 📊 Superstore Dashboard")
     st.caption("Streamlit 1.50.0")
@@ -31,9 +40,14 @@ def main():
     paths = get_paths(PROJECT_ROOT)
     ensure_dirs(paths)
 
-    # pré-processamento (gera processed.csv; cacheado em utils/pre_process.py)
+    # pré-processamento incremental (gera/atualiza processed.parquet; ver utils/pre_process.py)
+    # ou, no modo só pré-gerado, apenas valida os artefatos existentes
     try:
-        _ = run_preprocessing(paths["RAW_PATH"], paths["PROCESSED_PATH"])
+        with span("main.preprocessing"):
+            if PREBUILT_ONLY:
+                manifest = load_prebuilt(paths["RAW_PATH"], paths["PROCESSED_PATH"])
+            else:
+                manifest = run_preprocessing(paths["RAW_PATH"], paths["PROCESSED_PATH"])
     except Exception as e:
         st.exception(e)
         st.stop()
@@ -46,8 +60,14 @@ def main():
         "RAW_PATH": str(paths["RAW_PATH"]),
         "PROCESSED_PATH": str(paths["PROCESSED_PATH"]),
     })
+    # versão do processado: muda quando o RAW é atualizado (invalida caches das páginas)
+    st.session_state["DATA_VERSION"] = manifest["version"]
+    # estado de widgets compartilhados entre páginas (ver utils/distinct.py)
+    keep_approx_state()
 
-    nav.run()
+    # cada rerun da página vira um span (as seções e agregados dela ficam aninhados)
+    with span(f"page.{nav.title}"):
+        nav.run()
 
 if __name__ == "__main__":
     main()
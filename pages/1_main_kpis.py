@@ -1,26 +1,33 @@
 # pages/1_main_kpis.py — Visão Geral (KPIs + tendências)
 import streamlit as st
 import plotly.express as px
-from utils.pre_process import load_processed
-from utils.lateral_filters import sidebar_filters
+from utils.dataset import get_dataset
+from utils.lateral_filters import sidebar_filters, get_filter_state, FILTER_COLUMNS
+from utils.cube import query_cube
+from utils.filter_cache import filtered_aggregate
+from utils.figure_cache import cached_figure
+from utils.distinct import approx_toggle, distinct_metric, approx_caption
 from utils.aux_functions import first_existing  # <- helper centralizado
 
-@st.cache_data(show_spinner=False)
-def get_df():
-    from pathlib import Path
-    paths = st.session_state.get("PATHS", {})
-    processed = paths.get(
-        "PROCESSED_PATH",
-        str(Path(__file__).resolve().parents[1] / "data" / "processed" / "processed.csv")
-    )
-    return load_processed(processed)
+# colunas lidas do processado (além das usadas pelos filtros laterais)
+COLUMNS = ("city", "category", "product_name", "product", "total_net_sales", "sales",
+           "total_cost", "profit", "month_year", "total_gross_sales")
 
 def main(df=None):
+    # dataset compartilhado (somente leitura): colunas da página + índice dos filtros
+    ds = get_dataset()
+    index = None
     if df is None:
-        df = get_df()
+        df, index = ds.frame(COLUMNS + FILTER_COLUMNS), ds.index
 
     # aplica filtros da barra lateral antes dos KPIs/gráficos
-    df = sidebar_filters(df)
+    df = sidebar_filters(df, index=index)
+    approx_toggle()
+
+    # somas/agrupamentos: cubo pré-agregado quando os filtros cabem nele (senão, linhas)
+    agg_src = query_cube(ds.cube, get_filter_state())
+    if agg_src is None:
+        agg_src = df
 
     st.title("Visão Geral")
     # st.dataframe(df.head(), use_container_width=True)
@@ -35,22 +42,24 @@ def main(df=None):
     sales_col = first_existing(df, ["total_net_sales", "sales"])
     with col1:
         if sales_col:
-            st.metric("Vendas Totais (R$)", f"{df[sales_col].sum():,.2f}")
+            st.metric("Vendas Totais (R$)", f"{agg_src[sales_col].sum():,.2f}")
     with col2:
         if "total_cost" in df.columns:
-            st.metric("Custo Total (R$)", f"{df['total_cost'].sum():,.2f}")
+            st.metric("Custo Total (R$)", f"{agg_src['total_cost'].sum():,.2f}")
     with col3:
         if "profit" in df.columns:
-            st.metric("Receita Total (R$)", f"{df['profit'].sum():,.2f}")
+            st.metric("Receita Total (R$)", f"{agg_src['profit'].sum():,.2f}")
+    approximated = []
     with col4:
         if cities_col:
-            st.metric("Países únicos", f"{df[cities_col].nunique():,}")
+            approximated.append(distinct_metric("Países únicos", ds, df, cities_col))
     with col5:
         if category_col:
-            st.metric("Categorias únicas", f"{df[category_col].nunique():,}")
+            approximated.append(distinct_metric("Categorias únicas", ds, df, category_col))
     with col6:
         if product_col:
-            st.metric("Produtos únicos", f"{df[product_col].nunique():,}")
+            approximated.append(distinct_metric("Produtos únicos", ds, df, product_col))
+    approx_caption(approximated)
 
     st.divider()
 
@@ -61,11 +70,16 @@ def main(df=None):
             series.append("total_gross_sales")
         series.append("profit")
         if series:
-            dfg = df.groupby("month_year", as_index=False)[series].sum()
-            fig = px.line(dfg, x="month_year", y=series, markers=True,
-                          title="Tendência mensal: Vendas Brutas vs Profit")
-            fig.update_layout(legend_title_text="Métrica")
-            st.plotly_chart(fig, use_container_width=True)
+            dfg = filtered_aggregate(
+                "sum:month_year:" + ",".join(series),
+                lambda: agg_src.groupby("month_year", as_index=False, observed=True)[series].sum(),
+            )
+            def build():
+                fig = px.line(dfg, x="month_year", y=series, markers=True,
+                              title="Tendência mensal: Vendas Brutas vs Profit")
+                fig.update_layout(legend_title_text="Métrica")
+                return fig
+            st.plotly_chart(cached_figure("main:trend", dfg, build), use_container_width=True)
 
 # execução
 main()
@@ -1,30 +1,43 @@
 # pages/2_sales_kpis.py — Vendas • Descontos • Custos
 import streamlit as st
 import plotly.express as px
+import plotly.graph_objects as go
 import pandas as pd
-
-from utils.pre_process import load_processed
-from utils.lateral_filters import sidebar_filters
+import numpy as np
+
+from utils.dataset import get_dataset
+from utils.lateral_filters import sidebar_filters, get_filter_state, get_filter_bitmap, FILTER_COLUMNS
+from utils.cube import query_cube
+from utils.filter_cache import filtered_aggregate
+from utils.figure_cache import cached_figure
+from utils.distinct import approx_toggle, distinct_metric, approx_caption
+from utils.scatter import (SCATTER_MODES, SCATTER_MAX_POINTS, resolve_mode,
+                           sample_positions, density_grid)
+from utils.histograms import histogram_counts, HIST_BINS
+from utils.topk import select_positions
 from utils.aux_functions import first_existing  # <- helper centralizado
 
-@st.cache_data(show_spinner=False)
-def get_df():
-    from pathlib import Path
-    paths = st.session_state.get("PATHS", {})
-    processed = paths.get(
-        "PROCESSED_PATH",
-        str(Path(__file__).resolve().parents[1] / "data" / "processed" / "processed.csv")
-    )
-    return load_processed(processed)
+# colunas lidas do processado (além das usadas pelos filtros laterais)
+COLUMNS = ("total_net_sales", "sales", "profit", "total_cost", "total_gross_sales", "order_id",
+           "quantity", "discount", "month_year", "category", "sub_category", "segment", "product_name")
 
 def main(df=None):
+    # dataset compartilhado (somente leitura): colunas da página + índice dos filtros
+    ds = get_dataset()
+    index = None
     if df is None:
-        df = get_df()
+        df, index = ds.frame(COLUMNS + FILTER_COLUMNS), ds.index
 
     st.title("Vendas • Descontos • Custos")
     st.dataframe(df.head(), use_container_width=True)
 
-    df = sidebar_filters(df)
+    df = sidebar_filters(df, index=index)
+    approx_toggle()
+
+    # somas/agrupamentos: cubo pré-agregado quando os filtros cabem nele (senão, linhas)
+    agg_src = query_cube(ds.cube, get_filter_state())
+    if agg_src is None:
+        agg_src = df
 
     sales_col = first_existing(df, ["total_net_sales", "sales"])
     profit_col = first_existing(df, ["profit"])
@@ -35,24 +48,26 @@ def main(df=None):
     discount_col = first_existing(df, ["discount"])
 
     col1, col2, col3, col4, col5, col6 = st.columns(6)
+    approximated = []
     with col1:
         if orders_col:
-            st.metric("Pedidos (total)", f"{df[sales_col].nunique()}")
+            approximated.append(distinct_metric("Pedidos (total)", ds, df, orders_col))
     with col2:
         if sales_col:
-            st.metric("Vendas Líquidas Totais (R$)", f"{df[sales_col].sum():,.2f}")
+            st.metric("Vendas Líquidas Totais (R$)", f"{agg_src[sales_col].sum():,.2f}")
     with col3:
         if cost_col:
-            st.metric("Custo Total (R$)", f"{df[cost_col].sum():,.2f}")
+            st.metric("Custo Total (R$)", f"{agg_src[cost_col].sum():,.2f}")
     with col4:
         if profit_col:
-            st.metric("Receita Total (R$)", f"{df[profit_col].sum():,.2f}")
+            st.metric("Receita Total (R$)", f"{agg_src[profit_col].sum():,.2f}")
     with col5:
         if quantity_col:
-            st.metric("Quantidade Total de Produtos (unidades)", f"{df[quantity_col].sum()}")
+            st.metric("Quantidade Total de Produtos (unidades)", f"{agg_src[quantity_col].sum()}")
     with col6:
         if discount_col:
             st.metric("Receita Total (R$)", f"{df[discount_col].mean() * 100:,.2f}")
+    approx_caption(approximated)
 
     st.divider()
 
@@ -62,18 +77,30 @@ def main(df=None):
         if sales_col: series.append(sales_col)
         if profit_col: series.append(profit_col)
         if series:
-            g = df.groupby("month_year", as_index=False)[series].sum()
-            fig = px.line(g, x="month_year", y=series, markers=True,
-                          title="Tendência mensal: Vendas Brutas / Vendas / Profit")
-            fig.update_layout(legend_title_text="Métrica")
-            st.plotly_chart(fig, use_container_width=True)
+            g = filtered_aggregate(
+                "sum:month_year:" + ",".join(series),
+                lambda: agg_src.groupby("month_year", as_index=False, observed=True)[series].sum(),
+            )
+            def build():
+                fig = px.line(g, x="month_year", y=series, markers=True,
+                              title="Tendência mensal: Vendas Brutas / Vendas / Profit")
+                fig.update_layout(legend_title_text="Métrica")
+                return fig
+            st.plotly_chart(cached_figure("sales:trend", g, build), use_container_width=True)
 
     st.divider()
 
     cat_col = first_existing(df, ["category"])
     if cat_col and sales_col and profit_col:
-        g = df.groupby(cat_col, as_index=False)[[sales_col, profit_col]].sum().sort_values(sales_col, ascending=False)
-        fig = px.bar(g, x=cat_col, y=[sales_col, profit_col], barmode="group", title="Vendas e Profit por Categoria")
+        g = filtered_aggregate(
+            f"sum:{cat_col}:{sales_col},{profit_col}",
+            lambda: agg_src.groupby(cat_col, as_index=False, observed=True)[[sales_col, profit_col]].sum(),
+        ).sort_values(sales_col, ascending=False)
+        fig = cached_figure(
+            "sales:category", g,
+            lambda: px.bar(g, x=cat_col, y=[sales_col, profit_col], barmode="group",
+                           title="Vendas e Profit por Categoria"),
+        )
         st.plotly_chart(fig, use_container_width=True)
 
     st.divider()
@@ -81,27 +108,83 @@ def main(df=None):
     seg_col = first_existing(df, ["segment"])
     disc_col = first_existing(df, ["discount"])
     if sales_col and profit_col:
-        hover = [c for c in ["product_name", "sub_category", "category"] if c in df.columns]
-        fig = px.scatter(df, x=profit_col, y=sales_col, color=seg_col if seg_col else None,
-                         size=disc_col if disc_col else None, hover_data=hover,
-                         title="Dispersão: Vendas vs Profit (cor=Segmento, tam=Discount)")
+        # muitos pontos: amostra (mantendo extremos) ou densidade, em vez de 1 ponto por linha
+        c1, c2 = st.columns([3, 1])
+        with c1:
+            mode = st.radio(
+                "Dispersão", SCATTER_MODES, horizontal=True,
+                format_func=lambda m: {"auto": "Automático", "sample": "Amostra", "density": "Densidade",
+                                       "all": "Todos os pontos"}[m],
+                help="Acima do limite, 'Automático' mostra uma amostra estratificada por segmento "
+                     "que mantém os maiores lucros e prejuízos.",
+            )
+        with c2:
+            max_points = st.number_input("Limite de pontos", min_value=500, max_value=200_000,
+                                         value=SCATTER_MAX_POINTS, step=500)
+        mode = resolve_mode(mode, len(df), max_points)
+
+        if mode == "density":
+            counts, xc, yc = filtered_aggregate(
+                f"density:{profit_col}:{sales_col}",
+                lambda: density_grid(df, profit_col, sales_col),
+            )
+            def build():
+                fig = go.Figure(go.Heatmap(x=xc, y=yc, z=np.where(counts.T > 0, counts.T, np.nan),
+                                           colorscale="Blues", colorbar=dict(title="Linhas")))
+                fig.update_layout(title=f"Densidade: Vendas vs Profit ({len(df):,} linhas)",
+                                  xaxis_title=profit_col, yaxis_title=sales_col)
+                return fig
+            fig = cached_figure("sales:density", (xc, yc, counts), build, n_rows=len(df))
+        else:
+            plot_df = df
+            title = "Dispersão: Vendas vs Profit (cor=Segmento, tam=Discount)"
+            if mode == "sample" and len(df) > max_points:
+                pos = filtered_aggregate(
+                    f"sample:{profit_col}:{sales_col}:{seg_col}:{max_points}",
+                    lambda: sample_positions(df, profit_col, sales_col, max_points, strata=seg_col),
+                )
+                plot_df = df.take(pos)
+                title += f" — amostra de {len(plot_df):,} de {len(df):,} linhas"
+            hover = [c for c in ["product_name", "sub_category", "category"] if c in df.columns]
+            # linhas = f(estado dos filtros, modo, limite): a chave do estado basta como "hash" dos dados
+            fig = cached_figure(
+                "sales:scatter", st.session_state.get("FILTER_KEY"),
+                lambda: px.scatter(plot_df, x=profit_col, y=sales_col, color=seg_col if seg_col else None,
+                                   size=disc_col if disc_col else None, hover_data=hover, title=title),
+                mode=mode, max_points=max_points, n_rows=len(plot_df),
+            )
         st.plotly_chart(fig, use_container_width=True)
 
     st.divider()
 
-    if disc_col:
-        st.plotly_chart(px.histogram(df, x=disc_col, nbins=40, title="Distribuição de Discount"),
-                        use_container_width=True)
-    if cost_col:
-        st.plotly_chart(px.histogram(df, x=cost_col, nbins=40, title="Distribuição de Total Cost"),
-                        use_container_width=True)
+    # histogramas pré-agrupados no servidor (bins fixos do pré-processamento)
+    for col, title in [(disc_col, "Distribuição de Discount"), (cost_col, "Distribuição de Total Cost")]:
+        if not col:
+            continue
+        edges = ds.hist_edges.get(col)
+        if edges is None:
+            edges = np.histogram_bin_edges(df[col].dropna(), bins=HIST_BINS)
+        counts = filtered_aggregate(
+            f"hist:{col}:{len(edges)}",
+            lambda: histogram_counts(df, col, edges, index=index, bitmap=get_filter_bitmap()),
+        )
+        edges = np.asarray(edges)
+
+        def build():
+            fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                                   name="count"))
+            fig.update_layout(title=title, xaxis_title=col, yaxis_title="count", bargap=0)
+            return fig
+        st.plotly_chart(cached_figure(f"sales:hist:{col}", (edges, counts), build), use_container_width=True)
 
     if profit_col:
-        losses = df[df[profit_col] < 0].copy()
+        # 20 linhas de menor profit (< 0) por seleção parcial, sem ordenar todas as linhas
+        profit = df[profit_col].to_numpy(dtype="float64", na_value=np.nan)
+        neg = np.flatnonzero(profit < 0)
+        losses = df.take(neg[select_positions(profit[neg], 20, largest=False)])
         if not losses.empty:
             cols_show = [c for c in ["order_id", "product_name", "sub_category", "category",
                                      sales_col, profit_col, cost_col, disc_col] if c and c in losses.columns]
-            losses = losses.sort_values(profit_col, ascending=True).head(20)
             st.subheader("Top prejuízos (20)")
             st.dataframe(losses[cols_show], use_container_width=True)
 
@@ -3,26 +3,37 @@ import streamlit as st
 import plotly.express as px
 import pandas as pd
 
-from utils.pre_process import load_processed
-from utils.lateral_filters import sidebar_filters
-from utils.aux_functions import first_existing, names_to_us_abbrev
+from utils.dataset import get_dataset
+from utils.lateral_filters import sidebar_filters, get_filter_state, FILTER_COLUMNS
+from utils.cube import query_cube
+from utils.filter_cache import filtered_aggregate
+from utils.figure_cache import cached_figure
+from utils.distinct import approx_toggle, distinct_metric, approx_caption
+from utils.topk import build_rankings, group_sums
+from utils.dtypes import USA_ALIASES
+from utils.sections import lazy_section
+from utils.perf import timed
+from utils.aux_functions import first_existing, names_to_us_abbrev, US_ABBR_TO_STATE
 
-@st.cache_data(show_spinner=False)
-def get_df():
-    from pathlib import Path
-    paths = st.session_state.get("PATHS", {})
-    processed = paths.get(
-        "PROCESSED_PATH",
-        str(Path(__file__).resolve().parents[1] / "data" / "processed" / "processed.csv")
-    )
-    return load_processed(processed)
+# colunas lidas do processado (além das usadas pelos filtros laterais)
+COLUMNS = ("total_net_sales", "sales", "profit", "total_cost", "country", "state", "city",
+           "segment", "customer_name", "customer_id", "customer", "state_code", "is_usa")
 
 def main(df=None):
+    # dataset compartilhado (somente leitura): colunas da página + índice dos filtros
+    ds = get_dataset()
+    index = None
     if df is None:
-        df = get_df()
+        df, index = ds.frame(COLUMNS + FILTER_COLUMNS), ds.index
 
     st.title("Clientes • Geografia")
-    df = sidebar_filters(df)
+    df = sidebar_filters(df, index=index)
+    approx_toggle()
+
+    # somas/agrupamentos: cubo pré-agregado quando os filtros cabem nele (senão, linhas)
+    agg_src = query_cube(ds.cube, get_filter_state())
+    if agg_src is None:
+        agg_src = df
 
     sales_col = first_existing(df, ["total_net_sales", "sales"])
     profit_col = first_existing(df, ["profit"])
@@ -34,104 +45,160 @@ def main(df=None):
     customer_col = first_existing(df, ["customer_name", "customer_id", "customer"])
 
     col1, col2, col3, col4, col5 = st.columns(5)
-    with col1:
-        st.metric("Qtd Clientes (únicos)", f"{df[customer_col].nunique():,}" if customer_col else "—")
-    with col2:
-        st.metric("Qtd Segmentos (únicos)", f"{df[segment_col].nunique():,}" if segment_col else "—")
-    with col3:
-        st.metric("Qtd Países (únicos)", f"{df[country_col].nunique():,}" if country_col else "—")
-    with col4:
-        st.metric("Qtd Estados (únicos)", f"{df[state_col].nunique():,}" if state_col else "—")
-    with col5:
-        st.metric("Qtd Cidades (únicos)", f"{df[city_col].nunique():,}" if city_col else "—")
+    approximated = []
+    for box, label, col in ((col1, "Qtd Clientes (únicos)", customer_col),
+                            (col2, "Qtd Segmentos (únicos)", segment_col),
+                            (col3, "Qtd Países (únicos)", country_col),
+                            (col4, "Qtd Estados (únicos)", state_col),
+                            (col5, "Qtd Cidades (únicos)", city_col)):
+        with box:
+            if col:
+                approximated.append(distinct_metric(label, ds, df, col))
+            else:
+                st.metric(label, "—")
+    approx_caption(approximated)
+
+    st.divider()
 
+    # cada seção é um fragment: reexecuta sozinha quando um widget dela muda
+    segment_section(agg_src, segment_col, sales_col, profit_col)
     st.divider()
+    map_section(agg_src, country_col, state_col, sales_col)
+    st.divider()
+    cities_section(df, city_col, sales_col)
+    st.divider()
+    customers_section(df, customer_col, sales_col, profit_col)
 
-    # Barras por Segment
+@st.fragment
+@timed("clients.segment_section")
+def segment_section(agg_src, segment_col, sales_col, profit_col):
+    """Barras por Segment."""
     if segment_col and (sales_col or profit_col):
         agg_cols = [column for column in [sales_col, profit_col] if column]
         
         dfg = (
-            df
-            .groupby(segment_col, as_index=False)
+            agg_src
+            .groupby(segment_col, as_index=False, observed=True)
             [agg_cols].sum()
             .sort_values(agg_cols[0], ascending=False)
         )
         
         st.plotly_chart(
-            px.bar(
-                dfg
-                , x=segment_col
-                , y=agg_cols
-                , barmode="group"
-                , title="Resultados por Segmento"
+            cached_figure(
+                "clients:segment"
+                , dfg
+                , lambda: px.bar(
+                    dfg
+                    , x=segment_col
+                    , y=agg_cols
+                    , barmode="group"
+                    , title="Resultados por Segmento"
+                )
             )
             , use_container_width=True
         )
 
-    st.divider()
+def us_state_sales(src, country_col, state_col, sales_col):
+    """
+    Vendas por sigla de estado dos EUA. Usa 'is_usa'/'state_code' gravados no
+    pré-processamento (soma por código inteiro); sem eles — ou se nenhuma
+    linha for dos EUA — normaliza os textos de todas as linhas.
+    """
+    us = src["is_usa"].to_numpy(dtype=bool) if "is_usa" in src.columns else None
+    if ("state_code" in src.columns and isinstance(src["state_code"].dtype, pd.CategoricalDtype)
+            and (us is None or us.any())):
+        us = slice(None) if us is None else us
+        codes, sums = group_sums(src.loc[us, ["state_code", sales_col]], "state_code", [sales_col])
+        g = pd.DataFrame({"state_code": codes.astype(str), sales_col: sums[sales_col]})
+    else:
+        df_us = src
+        if country_col:
+            mask_usa = src[country_col].astype(str).str.upper().isin(USA_ALIASES)
+            if mask_usa.any():
+                df_us = src[mask_usa]
+        g = df_us.groupby(state_col, as_index=False, observed=True)[sales_col].sum()
+        g["state_code"] = names_to_us_abbrev(g[state_col]).str.upper()
+        g = g[g["state_code"].str.fullmatch(r"[A-Z]{2}")]
+        g = g.groupby("state_code", as_index=False)[sales_col].sum()
+    g[state_col] = g["state_code"].map(US_ABBR_TO_STATE).fillna(g["state_code"])
+    return g
 
-    # Mapa por Estados dos EUA
-    df_us = df.copy()
-    if country_col:
-        usa_aliases = {"United States", "United States of America", "USA", "US", "U.S.", "U.S.A.", "UNITED STATES"}
-        mask_usa = df_us[country_col].astype(str).str.upper().isin({s.upper() for s in usa_aliases})
-        if mask_usa.any():
-            df_us = df_us[mask_usa]
+@st.fragment
+@timed("clients.map_section")
+def map_section(agg_src, country_col, state_col, sales_col):
+    """Mapa por Estados dos EUA."""
     if not state_col:
         st.info("Para o mapa por estados dos EUA, é necessário ter a coluna 'state'.")
     elif not sales_col:
         st.info("Para o mapa por estados dos EUA, é necessário ter a coluna de Vendas (sales/total_net_sales).")
     else:
-        g = df_us.groupby(state_col, as_index=False)[sales_col].sum()
+        g = filtered_aggregate(
+            f"sum_us:state_code:{sales_col}",
+            lambda: us_state_sales(agg_src, country_col, state_col, sales_col),
+        )
         if g.empty:
-            st.caption("Sem dados para exibir no mapa por estados com os filtros atuais.")
+            st.caption("Sem dados para exibir no mapa por estados com os filtros atuais "
+                       "(ou estados sem sigla dos EUA).")
         else:
-            g["state_code"] = names_to_us_abbrev(g[state_col]).str.upper()
-            g = g[g["state_code"].str.fullmatch(r"[A-Z]{2}")]
-            if g.empty:
-                st.caption("Não foi possível mapear estados para siglas dos EUA. Exibindo barras como fallback.")
-                st.plotly_chart(px.bar(g, x=state_col, y=sales_col, title="Vendas por Estado (fallback)"),
+            def build():
+                fig = px.choropleth(
+                    g, locations="state_code", locationmode="USA-states",
+                    color=sales_col, scope="usa", hover_name=state_col,
+                    title=f"Vendas por Estado (EUA) — métrica: {sales_col}"
+                )
+                fig.update_layout(coloraxis_colorbar=dict(title=sales_col))
+                return fig
+            try:
+                st.plotly_chart(cached_figure("clients:map", g, build), use_container_width=True)
+            except Exception:
+                st.plotly_chart(px.bar(g.sort_values(sales_col, ascending=False),
+                                       x=state_col, y=sales_col,
+                                       title="Vendas por Estado (fallback em barras)"),
                                 use_container_width=True)
-            else:
-                try:
-                    fig = px.choropleth(
-                        g, locations="state_code", locationmode="USA-states",
-                        color=sales_col, scope="usa", hover_name=state_col,
-                        title=f"Vendas por Estado (EUA) — métrica: {sales_col}"
-                    )
-                    fig.update_layout(coloraxis_colorbar=dict(title=sales_col))
-                    st.plotly_chart(fig, use_container_width=True)
-                except Exception:
-                    st.plotly_chart(px.bar(g.sort_values(sales_col, ascending=False),
-                                           x=state_col, y=sales_col,
-                                           title="Vendas por Estado (fallback em barras)"),
-                                    use_container_width=True)
-
-    st.divider()
 
-    # Top Cidades por Sales
+@st.fragment
+@timed("clients.cities_section")
+def cities_section(df, city_col, sales_col):
+    """Top Cidades por Sales."""
     if city_col and sales_col:
-        g = df.groupby(city_col, as_index=False)[sales_col].sum().sort_values(sales_col, ascending=False).head(20)
-        st.plotly_chart(px.bar(g, x=city_col, y=sales_col, title="Top cidades por Vendas (Top 20)"),
+        g = filtered_aggregate(
+            f"rank:{city_col}:{sales_col}",
+            lambda: build_rankings(df, city_col, [sales_col]),
+        )[sales_col].top(20)
+        st.plotly_chart(cached_figure("clients:cities", g,
+                                      lambda: px.bar(g, x=city_col, y=sales_col, title="Top cidades por Vendas (Top 20)")),
                         use_container_width=True)
 
-    st.divider()
-
-    # Top Clientes
-    if customer_col and (sales_col or profit_col):
+@st.fragment
+@timed("clients.customers_section")
+def customers_section(df, customer_col, sales_col, profit_col):
+    """Top Clientes (um agregado por métrica; pontas por seleção parcial). Só calcula se aberta."""
+    if not customer_col or not (sales_col or profit_col):
+        return
+    box, is_open = lazy_section("Top clientes (Vendas / Profit / Prejuízos)", key="clients_top_customers")
+    if not is_open:
+        return
+    with box:
         agg_cols = [c for c in [sales_col, profit_col] if c]
-        g = df.groupby(customer_col, as_index=False)[agg_cols].sum()
+        ranks = filtered_aggregate(
+            f"rank:{customer_col}:" + ",".join(agg_cols),
+            lambda: build_rankings(df, customer_col, agg_cols),
+        )
         if sales_col:
-            st.plotly_chart(px.bar(g.sort_values(sales_col, ascending=False).head(20),
-                                   x=customer_col, y=sales_col, title="Top clientes por Vendas (Top 20)"),
+            top = ranks[sales_col].top(20)
+            st.plotly_chart(cached_figure("clients:top_sales", top,
+                                          lambda: px.bar(top, x=customer_col, y=sales_col,
+                                                         title="Top clientes por Vendas (Top 20)")),
                             use_container_width=True)
         if profit_col:
-            st.plotly_chart(px.bar(g.sort_values(profit_col, ascending=False).head(20),
-                                   x=customer_col, y=profit_col, title="Top clientes por Profit (Top 20)"),
+            gains, losses = ranks[profit_col].ends(20)
+            st.plotly_chart(cached_figure("clients:top_profit", gains,
+                                          lambda: px.bar(gains, x=customer_col, y=profit_col,
+                                                         title="Top clientes por Profit (Top 20)")),
                             use_container_width=True)
-            st.plotly_chart(px.bar(g.sort_values(profit_col, ascending=True).head(20),
-                                   x=customer_col, y=profit_col, title="Maiores prejuízos por cliente (Top 20)"),
+            st.plotly_chart(cached_figure("clients:top_losses", losses,
+                                          lambda: px.bar(losses, x=customer_col, y=profit_col,
+                                                         title="Maiores prejuízos por cliente (Top 20)")),
                             use_container_width=True)
 
 main()
@@ -2,37 +2,42 @@
 # -------------------------------------------------------------------------------
 import streamlit as st
 import plotly.express as px
-import pandas as pd
-import numpy as np
-
-from utils.pre_process import load_processed
-from utils.lateral_filters import sidebar_filters
-from utils.aux_functions import (
-    first_existing,
-    build_pareto_full,
-    abc_class,
-    ensure_month_col,
-    build_customer_cohort_count,
-)
-
-@st.cache_data(show_spinner=False)
-def get_df():
-    from pathlib import Path
-    paths = st.session_state.get("PATHS", {})
-    processed = paths.get(
-        "PROCESSED_PATH",
-        str(Path(__file__).resolve().parents[1] / "data" / "processed" / "processed.csv")
-    )
-    return load_processed(processed)
+
+from utils.dataset import get_dataset
+from utils.lateral_filters import sidebar_filters, get_filter_state, is_unfiltered, FILTER_COLUMNS
+from utils.cube import query_cube
+from utils.filter_cache import filtered_aggregate
+from utils.figure_cache import cached_figure
+from utils.distinct import approx_toggle, distinct_metric, approx_caption
+from utils.pareto import build_paretos, ABC_THRESHOLDS
+from utils.cohort import build_cohort
+from utils.topk import build_rankings
+from utils.sections import lazy_section
+from utils.perf import timed
+from utils.aux_functions import first_existing  # <- helper centralizado
+
+# colunas lidas do processado (além das usadas pelos filtros laterais)
+COLUMNS = ("total_net_sales", "sales", "profit", "total_cost", "quantity", "category", "sub_category",
+           "product_name", "product", "segment", "customer_name", "customer_id", "customer",
+           "order_date", "month_year")
 
 def main(df=None):
+    # dataset compartilhado (somente leitura): colunas da página + índice dos filtros
+    ds = get_dataset()
+    index = None
     if df is None:
-        df = get_df()
+        df, index = ds.frame(COLUMNS + FILTER_COLUMNS), ds.index
 
     st.title("Produtos (ABC / Pareto) + Cohort (clientes)")
 
     # Filtros laterais
-    df = sidebar_filters(df)
+    df = sidebar_filters(df, index=index)
+    approx_toggle()
+
+    # somas/agrupamentos: cubo pré-agregado quando os filtros cabem nele (senão, linhas)
+    agg_src = query_cube(ds.cube, get_filter_state())
+    if agg_src is None:
+        agg_src = df
 
     # Colunas relevantes
     sales_col = first_existing(df, ["total_net_sales", "sales"])
@@ -47,33 +52,51 @@ def main(df=None):
 
     # KPIs
     c1, c2, c3, c4 = st.columns(4)
-    with c1: st.metric("Produtos únicos", f"{df[prod_col].nunique():,}" if prod_col else "—")
+    approximated = []
+    with c1:
+        if prod_col:
+            approximated.append(distinct_metric("Produtos únicos", ds, df, prod_col))
+        else:
+            st.metric("Produtos únicos", "—")
     with c2: 
-        if sales_col: st.metric("Vendas (total)", f"{df[sales_col].sum():,.2f}")
+        if sales_col: st.metric("Vendas (total)", f"{agg_src[sales_col].sum():,.2f}")
     with c3: 
-        if profit_col: st.metric("Profit (total)", f"{df[profit_col].sum():,.2f}")
+        if profit_col: st.metric("Profit (total)", f"{agg_src[profit_col].sum():,.2f}")
     with c4: 
-        if qty_col: st.metric("Qtd. total vendida", f"{df[qty_col].sum():,}")
+        if qty_col: st.metric("Qtd. total vendida", f"{agg_src[qty_col].sum():,}")
+    approx_caption(approximated)
 
     st.divider()
 
-    # Barras empilhadas por segmento (3 gráficos)
+    # cada seção é um fragment: mexer no Top-N do ranking não recalcula o Pareto nem a coorte
+    segment_section(agg_src, segment_col, cat_col, subcat_col, sales_col, profit_col)
+    st.divider()
+    pareto_section(df, prod_col, sales_col, profit_col, qty_col)
+    st.divider()
+    rankings_section(df, prod_col, profit_col)
+    st.divider()
+    cohort_section(df, ds, customer_col, sales_col)
+
+@st.fragment
+@timed("products.segment_section")
+def segment_section(agg_src, segment_col, cat_col, subcat_col, sales_col, profit_col):
+    """Barras empilhadas por segmento (3 gráficos)."""
     if segment_col and cat_col and subcat_col and sales_col:
-        segs = df[segment_col].dropna().unique().tolist()
+        segs = agg_src[segment_col].dropna().unique().tolist()
         segs = sorted(segs)
         if len(segs) == 0:
             st.info("Nenhum segmento encontrado após os filtros.")
         else:
             cols = st.columns(min(3, len(segs)))
             for i, seg in enumerate(segs):
-                sub = df[df[segment_col] == seg]
+                sub = agg_src[agg_src[segment_col] == seg]
                 if sub.empty:
                     continue
                 t = (
-                    sub.groupby([cat_col, subcat_col], as_index=False)[[c for c in [sales_col, profit_col] if c]].sum()
+                    sub.groupby([cat_col, subcat_col], as_index=False, observed=True)[[c for c in [sales_col, profit_col] if c]].sum()
                     .sort_values(sales_col, ascending=False)
                 )
-                with cols[i % 3]:
+                def build(t=t, seg=seg):
                     fig = px.bar(
                         t,
                         x=cat_col,
@@ -84,134 +107,164 @@ def main(df=None):
                         hover_data=[profit_col] if profit_col else None
                     )
                     fig.update_layout(legend_title_text="Sub-Category")
-                    st.plotly_chart(fig, use_container_width=True)
+                    return fig
+                with cols[i % 3]:
+                    st.plotly_chart(cached_figure("products:segment", t, build, segment=seg),
+                                    use_container_width=True)
     else:
         st.info("Para as barras empilhadas por segmento, verifique se existem 'segment', 'category', 'sub_category' e 'sales'.")
 
-    st.divider()
-
-    # Pareto (ABC) — slider com TODOS + filtro de grupos
+@st.fragment
+@timed("products.pareto_section")
+def pareto_section(df, prod_col, sales_col, profit_col, qty_col):
+    """Pareto (ABC) — slider com TODOS + filtro de grupos."""
+    # (Pareto de todas as métricas calculado 1x por estado de filtros; Top-N/grupos só fatiam)
     if prod_col and sales_col:
-        pareto_full, sales_total = build_pareto_full(df, sales_col, prod_col)
-        if sales_total == 0 or pareto_full.empty:
+        metrics = [c for c in [sales_col, profit_col, qty_col] if c]
+        paretos = filtered_aggregate(
+            f"pareto:{prod_col}:" + ",".join(metrics),
+            lambda: build_paretos(df, prod_col, metrics),
+        )
+        metric_labels = {sales_col: "Vendas", profit_col: "Profit", qty_col: "Quantidade"}
+        metric = st.selectbox("Métrica do Pareto", metrics, format_func=lambda c: metric_labels.get(c, c))
+        pareto = paretos[metric]
+        if pareto.total == 0 or len(pareto) == 0:
             st.caption("Sem dados suficientes para o Pareto de produtos.")
         else:
-            pareto_full["abc"] = pareto_full["cum_share"].apply(abc_class)
-            n_products = pareto_full.shape[0]
+            n_products = len(pareto)
             default_n = min(30, n_products)
             top_n = st.slider(
-                "Exibir Top-N produtos por Vendas (ordem decrescente)",
+                f"Exibir Top-N produtos por {metric_labels.get(metric, metric)} (ordem decrescente)",
                 min_value=1,
                 max_value=int(n_products),
                 value=int(default_n),
                 step=1
             )
+            lim_a, lim_b = st.slider(
+                "Limites ABC (% acumulado): A até o 1º, B até o 2º",
+                min_value=1, max_value=99,
+                value=(int(ABC_THRESHOLDS[0] * 100), int(ABC_THRESHOLDS[1] * 100)),
+                step=1
+            )
             group_sel = st.multiselect(
                 "Grupos ABC a exibir",
                 options=["A", "B", "C"],
                 default=["A", "B", "C"],
                 help="Selecione as classes que deseja visualizar no gráfico e na tabela."
             )
-            pareto_view = pareto_full.head(top_n).copy()
-            if group_sel:
-                pareto_view = pareto_view[pareto_view["abc"].isin(group_sel)]
-
-            fig = px.bar(
-                pareto_view,
-                x=prod_col,
-                y=sales_col,
-                color="abc",
-                title=f"Pareto de Produtos por Vendas — Top {top_n} (ABC)",
-                color_discrete_map={"A": "#1f77b4", "B": "#ff7f0e", "C": "#2ca02c"},
-            )
-            fig.add_scatter(
-                x=pareto_view[prod_col],
-                y=(pareto_view["cum_share"] * 100.0),
-                mode="lines+markers",
-                name="Cumulativo (%)",
-                yaxis="y2"
-            )
-            fig.update_layout(
-                yaxis=dict(title="Vendas"),
-                yaxis2=dict(title="Cumulativo (%)", overlaying="y", side="right", range=[0, 100]),
-                legend_title_text="Classe ABC"
-            )
+            pareto_view = pareto.frame(top_n, group_sel, thresholds=(lim_a / 100.0, lim_b / 100.0))
+
+            def build():
+                fig = px.bar(
+                    pareto_view,
+                    x=prod_col,
+                    y=metric,
+                    color="abc",
+                    title=f"Pareto de Produtos por {metric_labels.get(metric, metric)} — Top {top_n} (ABC)",
+                    color_discrete_map={"A": "#1f77b4", "B": "#ff7f0e", "C": "#2ca02c"},
+                )
+                fig.add_scatter(
+                    x=pareto_view[prod_col],
+                    y=(pareto_view["cum_share"] * 100.0),
+                    mode="lines+markers",
+                    name="Cumulativo (%)",
+                    yaxis="y2"
+                )
+                fig.update_layout(
+                    yaxis=dict(title=metric_labels.get(metric, metric)),
+                    yaxis2=dict(title="Cumulativo (%)", overlaying="y", side="right", range=[0, 100]),
+                    legend_title_text="Classe ABC"
+                )
+                return fig
+            fig = cached_figure("products:pareto", pareto_view, build, top_n=top_n)
             st.plotly_chart(fig, use_container_width=True)
 
             st.subheader("Tabela (com classificação ABC)")
             tmp = pareto_view.copy()
             tmp["share"] = (tmp["share"] * 100).round(2)
             tmp["cum_share"] = (tmp["cum_share"] * 100).round(2)
-            st.dataframe(tmp[[prod_col, sales_col, "share", "cum_share", "abc"]], use_container_width=True)
+            st.dataframe(tmp[[prod_col, metric, "share", "cum_share", "abc"]], use_container_width=True)
     else:
         st.info("Para o Pareto de produtos, verifique se existem 'product_name'/'product' e 'sales'.")
 
-    st.divider()
-
-    # Rankings por Profit
+@st.fragment
+@timed("products.rankings_section")
+def rankings_section(df, prod_col, profit_col):
+    """Rankings por Profit."""
     if prod_col and profit_col:
         top_k = st.slider("Top-N ranking por Profit", min_value=5, max_value=50, value=20, step=5)
-        agg = df.groupby(prod_col, as_index=False)[profit_col].sum()
-        gains = agg.sort_values(profit_col, ascending=False).head(top_k)
+        rank = filtered_aggregate(
+            f"rank:{prod_col}:{profit_col}",
+            lambda: build_rankings(df, prod_col, [profit_col]),
+        )[profit_col]
+        gains, losses = rank.ends(top_k)
         if not gains.empty:
-            st.plotly_chart(px.bar(gains, x=prod_col, y=profit_col, title=f"Top {top_k} Produtos por Profit"),
+            st.plotly_chart(cached_figure("products:top_profit", gains,
+                                          lambda: px.bar(gains, x=prod_col, y=profit_col,
+                                                         title=f"Top {top_k} Produtos por Profit"),
+                                          top_k=top_k),
                             use_container_width=True)
-        losses = agg.sort_values(profit_col, ascending=True).head(top_k)
         if not losses.empty:
-            st.plotly_chart(px.bar(losses, x=prod_col, y=profit_col, title=f"Maiores Prejuízos por Produto (Top {top_k})"),
+            st.plotly_chart(cached_figure("products:top_losses", losses,
+                                          lambda: px.bar(losses, x=prod_col, y=profit_col,
+                                                         title=f"Maiores Prejuízos por Produto (Top {top_k})"),
+                                          top_k=top_k),
                             use_container_width=True)
 
-    st.divider()
-
-    # Cohort (APENAS CONTAGEM)
-    st.subheader("Cohort de clientes (contagem)")
+@st.fragment
+@timed("products.cohort_section")
+def cohort_section(df, ds, customer_col, sales_col):
+    """Cohort (contagem, receita ou retenção). Só calcula quando a seção é aberta."""
     if not customer_col:
         st.info("Para a análise de cohort é necessário ter uma coluna de cliente (ex.: 'customer_name' ou 'customer_id').")
         return
 
-    base = ensure_month_col(df)
-    if "order_month" not in base.columns or base["order_month"].isna().all():
-        st.info("Não foi possível determinar o mês de pedido para construir a coorte (faltam 'order_date' ou 'month_year').")
+    box, is_open = lazy_section("Cohort de clientes", key="products_cohort")
+    if not is_open:
         return
+    with box:
+        # sem filtros: coorte da atividade gravada no pré-processamento; com filtros, das linhas filtradas
+        stored = ds.cohort
+        if is_unfiltered(get_filter_state()) and stored is not None and stored[1] == customer_col:
+            cohort = stored[0]
+        else:
+            cohort = filtered_aggregate(
+                f"cohort:{customer_col}:{sales_col}",
+                lambda: build_cohort(df, customer_col, value_col=sales_col),
+            )
 
-    normalize = st.checkbox("Exibir como % da coorte (normalizado por linha)", value=True)
+        if cohort.empty:
+            st.caption("Sem dados suficientes para construir a coorte com os filtros selecionados (faltam mês do pedido ou clientes).")
+            return
 
-    pivot, cohort_sizes = build_customer_cohort_count(
-        base, customer_col=customer_col, date_col_month="order_month"
-    )
+        views = {
+            "retention": ("Retenção (% da coorte)", "%", " — retenção (%)", ".1f"),
+            "count": ("Clientes (contagem)", "Clientes", " — clientes (contagem)", ".0f"),
+            "revenue": ("Receita", "Receita", " — receita", ".0f"),
+        }
+        if cohort.revenue is None:
+            views.pop("revenue")
+        value = st.radio("Valor exibido", list(views), format_func=lambda v: views[v][0], horizontal=True)
+        _, colorbar_title, title_suffix, text_fmt = views[value]
 
-    if pivot.empty:
-        st.caption("Sem dados suficientes para construir a coorte com os filtros selecionados.")
-        return
+        to_show = cohort.matrix(value)  # já em ordem de mês
 
-    to_show = pivot.copy()
-    if normalize:
-        denom = to_show[0].replace({0: np.nan})
-        to_show = (to_show.T / denom).T * 100.0
-        colorbar_title = "%"
-        title_suffix = " (normalizado)"
-        text_fmt = ".1f"
-    else:
-        colorbar_title = "Clientes"
-        title_suffix = ""
-        text_fmt = ".0f"
-
-    to_show = to_show.sort_index()
-
-    fig = px.imshow(
-        to_show,
-        labels=dict(x="Meses desde a coorte", y="Mês da coorte", color=colorbar_title),
-        text_auto=text_fmt,
-        aspect="auto",
-        title=f"Cohort por mês de 1ª compra — Clientes (contagem){title_suffix}"
-    )
-    fig.update_xaxes(type="category")
-    fig.update_layout(height=900)
-    fig.update_traces(textfont_size=12)
-    st.plotly_chart(fig, use_container_width=True)
-
-    with st.expander("Ver tabela da coorte"):
-        st.dataframe(to_show, use_container_width=True)
+        def build():
+            fig = px.imshow(
+                to_show,
+                labels=dict(x="Meses desde a coorte", y="Mês da coorte", color=colorbar_title),
+                text_auto=text_fmt,
+                aspect="auto",
+                title=f"Cohort por mês de 1ª compra{title_suffix}"
+            )
+            fig.update_xaxes(type="category")
+            fig.update_layout(height=900)
+            fig.update_traces(textfont_size=12)
+            return fig
+        st.plotly_chart(cached_figure("products:cohort", to_show, build, value=value), use_container_width=True)
+
+        if st.toggle("Ver tabela da coorte"):  # expanders não podem ser aninhados
+            st.dataframe(to_show, use_container_width=True)
 
 # Execução
 main()
@@ -40,6 +40,7 @@ def main():
 | `order_date`     | data          | Data do pedido.                                                            |
 | `ship_date`      | data          | Data de envio.                                                             |
 | `month_year`     | texto         | Mês/Ano derivado de `order_date` no formato `YYYY-MM`.                    |
+| `month_code`     | inteiro       | Código do mês: `ano*12 + (mês-1)` (ordenável, usado em cálculos).        |
 | `sales`          | numérico      | Valor de venda **líquida** registrada na linha.                            |
 | `profit`         | numérico      | Lucro da linha (pode ser negativo).                                       |
 | `total_cost`     | numérico      | **Custo total** da linha: `total_cost = sales - profit`.                  |
@@ -48,6 +49,8 @@ def main():
 | `segment`        | texto         | Segmento do cliente (ex.: Consumer, Corporate, Home Office).              |
 | `country`        | texto         | País.                                                                      |
 | `state`          | texto         | Estado/Província.                                                          |
+| `state_code`     | categoria     | Sigla do estado dos EUA (ex.: CA), derivada de `state`; vazia se não houver. |
+| `is_usa`         | booleano      | Linha de país EUA (derivado de `country`).                                 |
 | `city`           | texto         | Cidade.                                                                    |
 | `postal_code`    | texto         | CEP/Código postal.                                                         |
 | `region`         | texto         | Região (ex.: West, East etc., se existir).                                |
@@ -73,12 +76,20 @@ def main():
   Se `profit` for negativo, `total_cost` fica **maior** que `sales` (venda com prejuízo).
 
 - **Período (mês/ano)**:  
-  `month_year = to_period(order_date, 'M') → 'YYYY-MM'`
+  `month_year = 'YYYY-MM'` do mês de `order_date` (código inteiro do mês → rótulo, montado só para os meses distintos)
+
+- **Datas**:  
+  `order_date`/`ship_date` são convertidas com formato explícito (ex.: `%m/%d/%Y`), detectado uma vez por amostra do RAW e registrado no manifesto; valores fora do formato passam por inferência e, se inválidos, a linha é descartada.
 
 - **Nomes de colunas**:  
   Todos os nomes são convertidos para **snake_case** (minúsculas, `_` como separador).  
   Exemplos: `"Order Date" → "order_date"`, `"Sub-Category" → "sub_category"`.
 
+- **Tipos compactos** (`utils/dtypes.py`):  
+  dimensões de texto (segmento, categoria, estado, cidade, produto, cliente…) são gravadas como `category`;  
+  `row_id` → `int32`, `quantity` → `int16`, `discount`/`postal_code` → `float32`.  
+  Valores monetários seguem em `float64` para não alterar os centavos dos totais.
+
 - **Tratamento de faltantes**:  
   Após as transformações, é aplicado `dropna()` → **remove linhas** que contenham qualquer `NaN`.  
   *Impacto*: conjuntos com muitos valores ausentes podem reduzir de tamanho.
@@ -0,0 +1,89 @@
+# pages/6_performance.py — Performance (spans de tempo/memória por etapa)
+# -------------------------------------------------------------------------
+# Página oculta: só entra na navegação com DASHBOARD_PERF ligado (ver utils/perf.py).
+# Mostra p50/p95 por etapa (pré-processamento, filtros, agregados, figuras,
+# seções das páginas) a partir dos spans guardados em memória neste processo.
+import streamlit as st
+import plotly.express as px
+import pandas as pd
+
+from utils.perf import get_store, summarize, traces_memory, session_id, PERF_MAX_SPANS
+from utils.filter_cache import get_filter_cache
+from utils.figure_cache import get_figure_cache
+
+def main():
+    st.title("⏱️ Performance")
+    store = get_store()
+    spans = store.frame()
+
+    st.caption(
+        f"{len(spans):,} spans guardados (últimos {PERF_MAX_SPANS:,}, por processo) • "
+        + ("tempo, linhas e bytes alocados (DASHBOARD_PERF=mem)" if traces_memory()
+           else "tempo e linhas (DASHBOARD_PERF=mem mede também bytes alocados)")
+    )
+
+    c1, c2, c3 = st.columns([2, 1, 1])
+    with c1:
+        prefix = st.text_input("Etapas começando com", placeholder="ex.: clients., aggregate., pre_process.")
+    with c2:
+        only_mine = st.toggle("Só esta sessão", value=False)
+    with c3:
+        if st.button("Limpar spans"):
+            store.clear()
+            st.rerun()
+
+    if prefix:
+        spans = spans[spans["name"].str.startswith(prefix)]
+    if only_mine:
+        spans = spans[spans["session"] == session_id()]
+    # o próprio rerun desta página não interessa
+    spans = spans[spans["name"] != "page.Performance"]
+
+    if spans.empty:
+        st.info("Nenhum span registrado ainda: navegue pelas páginas do dashboard e volte aqui.")
+        return
+
+    summary = summarize(spans)
+
+    st.subheader("Por etapa (ordenado por p95)")
+    st.dataframe(
+        summary,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "name": "Etapa",
+            "spans": st.column_config.NumberColumn("Spans", format="%d"),
+            "p50_ms": st.column_config.NumberColumn("p50 (ms)", format="%.1f"),
+            "p95_ms": st.column_config.NumberColumn("p95 (ms)", format="%.1f"),
+            "max_ms": st.column_config.NumberColumn("máx (ms)", format="%.1f"),
+            "total_ms": st.column_config.NumberColumn("total (ms)", format="%.0f"),
+            "rows_in": st.column_config.NumberColumn("linhas (entrada)", format="%.0f"),
+            "rows_out": st.column_config.NumberColumn("linhas (saída)", format="%.0f"),
+            "alloc_mb": st.column_config.NumberColumn("alocado (MiB)", format="%.2f"),
+        },
+    )
+
+    top = summary.head(20).iloc[::-1]
+    fig = px.bar(
+        top.melt(id_vars="name", value_vars=["p50_ms", "p95_ms"], var_name="percentil", value_name="ms"),
+        x="ms", y="name", color="percentil", barmode="group", orientation="h",
+        title="p50 / p95 das 20 etapas mais lentas (ms)",
+    )
+    fig.update_layout(height=max(400, 28 * len(top)), yaxis_title=None, legend_title_text=None)
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("Spans recentes")
+    recent = spans.tail(200).iloc[::-1].copy()
+    recent["start"] = pd.to_datetime(recent["start"], unit="s").dt.strftime("%H:%M:%S.%f").str[:-3]
+    st.dataframe(recent.drop(columns=["session"]), use_container_width=True, hide_index=True)
+
+    st.subheader("Caches")
+    k1, k2 = st.columns(2)
+    with k1:
+        st.markdown("**Filtros/agregados** (`utils/filter_cache.py`)")
+        st.json(get_filter_cache().stats())
+    with k2:
+        st.markdown("**Figuras** (`utils/figure_cache.py`)")
+        st.json(get_figure_cache().stats())
+
+main()
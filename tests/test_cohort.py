@@ -0,0 +1,64 @@
+# tests/test_cohort.py — coorte e atividade de clientes contra pandas puro
+# ----------------------------------------------------------------------
+# Rode a partir da raiz do projeto: python -m pytest -q
+import numpy as np
+import pandas as pd
+
+from utils.cohort import (
+    build_cohort, build_activity, merge_activity, write_activity, read_activity, cohort_from_activity,
+)
+
+
+def _frame(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2016-01-01") + pd.to_timedelta(rng.integers(0, 720, n), unit="D")
+    return pd.DataFrame({
+        "customer_name": rng.choice([f"C{i:03d}" for i in range(80)], n),
+        "order_date": dates,
+        "total_net_sales": rng.gamma(2.0, 50.0, n).round(2),
+    })
+
+
+def _expected(df):
+    d = df.assign(month=df["order_date"].dt.year * 12 + df["order_date"].dt.month - 1)
+    d["cohort"] = d.groupby("customer_name")["month"].transform("min")
+    d["offset"] = d["month"] - d["cohort"]
+    counts = d.groupby(["cohort", "offset"])["customer_name"].nunique().unstack(fill_value=0)
+    revenue = d.groupby(["cohort", "offset"])["total_net_sales"].sum().unstack(fill_value=0.0)
+    return counts, revenue
+
+
+def _check(cohort, df):
+    counts, revenue = _expected(df)
+    got = cohort.matrix("count")
+    assert (cohort.cohort_codes == counts.index.to_numpy()).all()
+    assert got.shape[1] == counts.columns.max() + 1
+    exp = counts.reindex(columns=range(got.shape[1]), fill_value=0).to_numpy()
+    assert (got.to_numpy() == exp).all()
+    exp = revenue.reindex(columns=range(got.shape[1]), fill_value=0.0).to_numpy()
+    np.testing.assert_allclose(cohort.matrix("revenue").to_numpy(), exp)
+    np.testing.assert_allclose(cohort.matrix("retention").to_numpy()[:, 0], 100.0)
+
+
+def test_build_cohort_matches_pandas():
+    df = _frame()
+    _check(build_cohort(df, "customer_name", value_col="total_net_sales"), df)
+    assert build_cohort(df.iloc[:0], "customer_name").empty
+
+
+def test_merged_activity_equals_activity_of_all_rows(tmp_path):
+    df = _frame()
+    parts = [build_activity(df.iloc[:250]), build_activity(df.iloc[250:])]
+    merged = merge_activity(parts)
+    whole = build_activity(df)
+
+    key = ["customer_name", "month_code"]
+    a = merged.astype({"customer_name": str}).sort_values(key).reset_index(drop=True)
+    b = whole.astype({"customer_name": str}).sort_values(key).reset_index(drop=True)
+    pd.testing.assert_frame_equal(a, b)
+
+    # gravada e relida (com first_month), a coorte é a mesma das linhas
+    write_activity(merged, tmp_path / "processed.parquet")
+    cohort, col = cohort_from_activity(read_activity(tmp_path / "processed.parquet"))
+    assert col == "customer_name"
+    _check(cohort, df)
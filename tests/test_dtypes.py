@@ -0,0 +1,45 @@
+# tests/test_dtypes.py — state_code com esquema fixo entre blocos
+# ---------------------------------------------------------------
+# Rode a partir da raiz do projeto: python -m pytest -q
+import pandas as pd
+
+from utils.dtypes import optimize_dtypes, STATE_CODE_DTYPE
+from utils.pre_process import update_processed
+from utils.store import StoreWriter, read_store
+
+RAW_TEMPLATE = "data/raw/dataset_ruido.csv"
+
+
+def test_state_code_dtype_is_fixed_without_us_rows():
+    df = optimize_dtypes(pd.DataFrame({"country": ["Canada"], "state": ["Ontario"], "sales": [1.0]}))
+    assert df["state_code"].dtype == STATE_CODE_DTYPE
+    assert df["state_code"].isna().all()
+    assert not df["is_usa"].any()
+
+
+def test_store_accepts_us_chunk_after_non_us_chunk(tmp_path):
+    canada = optimize_dtypes(pd.DataFrame({"country": ["Canada"], "state": ["Ontario"], "sales": [1.0]}))
+    usa = optimize_dtypes(pd.DataFrame({"country": ["United States"], "state": ["Texas"], "sales": [2.0]}))
+    path = tmp_path / "processed.parquet"
+    with StoreWriter(path) as w:
+        w.write(canada)
+        w.write(usa)
+    out = read_store(path)
+    assert out["state_code"].isna().tolist() == [True, False]
+    assert out["state_code"].iloc[1] == "TX"
+
+
+def test_streaming_build_non_us_chunk_then_us_chunk(tmp_path):
+    raw = pd.read_csv(RAW_TEMPLATE, encoding="latin1", nrows=40).dropna()
+    canada = raw.head(3).assign(Country="Canada", State="Ontario")
+    usa = raw.iloc[3:6]
+    raw_path = tmp_path / "raw.csv"
+    pd.concat([canada, usa]).to_csv(raw_path, index=False)
+
+    # blocos de 3 linhas: o 1º só tem linhas do Canadá
+    update_processed(raw_path, tmp_path / "processed.parquet", chunksize=3, workers=1)
+    out = read_store(tmp_path / "processed.parquet")
+    assert len(out) == 6
+    assert out["state_code"].iloc[:3].isna().all()
+    assert out["state_code"].iloc[3:].notna().all()
+    assert out["is_usa"].tolist() == [False] * 3 + [True] * 3
@@ -0,0 +1,62 @@
+# tests/test_filter_cache.py — cache LRU de posições/agregados dos filtros
+# ----------------------------------------------------------------------
+# Rode a partir da raiz do projeto: python -m pytest -q
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.filter_cache import FilterCache, state_key
+from utils.filter_engine import FilterIndex
+from utils.lateral_filters import sidebar_filters
+
+STATE = {"date": None, "dims": {"segment": ["Consumer"]}, "ranges": {}}
+
+
+def test_state_key_includes_the_index_identity():
+    assert state_key("v1", STATE, "a") == state_key("v1", dict(reversed(list(STATE.items()))), "a")
+    assert state_key("v1", STATE, "a") != state_key("v1", STATE, "b")
+    assert state_key("v1", STATE, "a") != state_key("v2", STATE, "a")
+
+    df = pd.DataFrame({"segment": ["Consumer", "Corporate"]})
+    ia, ib = FilterIndex(df), FilterIndex(df.copy())
+    assert ia.key != ib.key
+    assert FilterIndex(df, key=("dataset", "v1")).key == ("dataset", "v1")
+
+
+def test_positions_and_aggregates_match_pandas():
+    df = pd.DataFrame({"segment": ["Consumer", "Corporate", "Consumer", "Home Office"],
+                       "sales": [1.0, 2.0, 3.0, 4.0]})
+    idx = FilterIndex(df)
+    cache = FilterCache()
+    key = state_key("v1", STATE, idx.key)
+
+    assert cache.get_positions(key) is None
+    cache.put_positions(key, idx.positions(idx.dim_bitmap("segment", ["Consumer"])))
+    sub = df.take(cache.get_positions(key))
+    pd.testing.assert_frame_equal(sub, df[df["segment"] == "Consumer"])
+
+    calls = []
+    total = lambda: calls.append(1) or float(sub["sales"].sum())
+    assert cache.aggregate(key, "sum:sales", total) == 4.0
+    assert cache.aggregate(key, "sum:sales", total) == 4.0
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+
+def test_lru_eviction_by_bytes():
+    cache = FilterCache(max_bytes=3 * 800)
+    for k in "abc":
+        cache.put_positions(k, np.arange(100, dtype=np.int64))  # 800 bytes cada
+    cache.get_positions("a")  # 'a' passa a ser o mais recente
+    cache.put_positions("d", np.arange(100, dtype=np.int64))
+
+    assert cache.get_positions("b") is None
+    assert all(cache.get_positions(k) is not None for k in "acd")
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 3 * 800
+
+
+def test_sidebar_filters_rejects_an_index_of_other_rows():
+    df = pd.DataFrame({"segment": ["Consumer", "Corporate", "Consumer"]})
+    with pytest.raises(ValueError):
+        sidebar_filters(df.head(2), index=FilterIndex(df))
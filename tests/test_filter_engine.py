@@ -0,0 +1,76 @@
+# tests/test_filter_engine.py — índice de bitmaps dos filtros contra pandas puro
+# ----------------------------------------------------------------------------
+# Rode a partir da raiz do projeto: python -m pytest -q
+import numpy as np
+import pandas as pd
+
+from utils.filter_engine import FilterIndex
+from utils.lateral_filters import get_filter_index
+
+
+def _frame(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2016-01-01") + pd.to_timedelta(rng.integers(0, 900, n), unit="D")
+    return pd.DataFrame({
+        "category": pd.Categorical(rng.choice(["Furniture", "Office Supplies", "Technology"], n)),
+        "segment": rng.choice(["Consumer", "Corporate", "Home Office"], n),
+        "country": rng.choice(["United States", "Canada", None], n, p=[0.6, 0.3, 0.1]),
+        "sales": rng.gamma(2.0, 100.0, n).round(2),
+        "profit": rng.normal(20.0, 50.0, n).round(2),
+        "order_date": dates,
+        "month_year": pd.Categorical(dates.strftime("%Y-%m")),
+    })
+
+
+def test_dim_and_range_bitmaps_match_pandas():
+    df = _frame()
+    idx = FilterIndex(df)
+
+    got = idx.to_bool(idx.dim_bitmap("segment", ["Consumer", "Home Office"]))
+    assert (got == df["segment"].isin(["Consumer", "Home Office"]).to_numpy()).all()
+
+    got = idx.to_bool(idx.dim_bitmap("country", ["Canada", "Atlantis"]))
+    assert (got == (df["country"] == "Canada").to_numpy()).all()
+
+    got = idx.to_bool(idx.range_bitmap("sales", 50.0, 250.0))
+    assert (got == df["sales"].between(50.0, 250.0).to_numpy()).all()
+
+    lo, hi = pd.Timestamp("2016-06-01"), pd.Timestamp("2017-02-15")
+    got = idx.to_bool(idx.range_bitmap("order_date", lo, hi))
+    assert (got == df["order_date"].between(lo, hi).to_numpy()).all()
+
+    codes = (df["order_date"].dt.year * 12 + df["order_date"].dt.month - 1).to_numpy()
+    got = idx.to_bool(idx.range_bitmap("month_code", 2016 * 12 + 3, 2017 * 12))
+    assert (got == ((codes >= 2016 * 12 + 3) & (codes <= 2017 * 12))).all()
+
+
+def test_queries_under_a_mask_match_pandas():
+    df = _frame()
+    idx = FilterIndex(df)
+    bitmap = idx.dim_bitmap("category", ["Technology"]) & idx.range_bitmap("profit", 0.0, 1e9)
+    sub = df[(df["category"] == "Technology") & (df["profit"] >= 0.0)]
+
+    assert (idx.positions(bitmap) == np.flatnonzero(df.index.isin(sub.index))).all()
+    assert idx.options("segment", bitmap) == sorted(sub["segment"].unique())
+    assert idx.options("country", bitmap) == sorted(sub["country"].dropna().unique())
+    assert idx.min_max("sales", bitmap) == (sub["sales"].min(), sub["sales"].max())
+    assert idx.min_max("sales", np.zeros_like(bitmap)) == (None, None)
+
+    edges = np.linspace(df["sales"].min(), df["sales"].max(), 11)
+    expected = np.histogram(sub["sales"], bins=edges)[0]
+    assert (idx.histogram("sales", edges, bitmap) == expected).all()
+    assert (idx.histogram("sales", edges) == np.histogram(df["sales"], bins=edges)[0]).all()
+
+
+def test_fallback_index_is_keyed_on_the_frame_not_its_length():
+    a = _frame(seed=1)
+    b = _frame(seed=2)  # mesmo nº de linhas, outros valores
+    ia, ib = get_filter_index(a), get_filter_index(b)
+    assert ia is not ib and ia.key != ib.key
+    assert get_filter_index(a) is ia
+
+    got = ib.to_bool(ib.dim_bitmap("segment", ["Consumer"]))
+    assert (got == (b["segment"] == "Consumer").to_numpy()).all()
+
+    # outra seleção de colunas do mesmo tamanho também é outro índice
+    assert get_filter_index(a[["segment", "sales"]]) is not ia
@@ -0,0 +1,61 @@
+# tests/test_incremental.py — modo incremental (append) e impressão digital do RAW
+# ------------------------------------------------------------------------------
+# Rode a partir da raiz do projeto: python -m pytest -q
+import pandas as pd
+
+from utils.pre_process import update_processed, FINGERPRINT_BYTES
+from utils.store import read_store
+
+RAW_TEMPLATE = "data/raw/dataset_ruido.csv"
+
+
+def _raw_lines(n):
+    with open(RAW_TEMPLATE, "rb") as f:
+        return [f.readline() for _ in range(n)]
+
+
+def _build(raw_path, processed_path):
+    return update_processed(raw_path, processed_path, chunksize=400, workers=1)
+
+
+def _frame(path):
+    df = read_store(path)
+    return df.astype({c: "object" for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)}) \
+        .sort_values("row_id").reset_index(drop=True)
+
+
+def test_append_only_equals_full_rebuild(tmp_path):
+    lines = _raw_lines(2001)
+    raw = tmp_path / "raw.csv"
+    raw.write_bytes(b"".join(lines[:1501]))
+    _build(raw, tmp_path / "inc" / "processed.parquet")
+
+    raw.write_bytes(b"".join(lines))
+    inc = _build(raw, tmp_path / "inc" / "processed.parquet")
+    full = _build(raw, tmp_path / "full" / "processed.parquet")
+
+    assert inc["last_mode"] == "append"
+    assert inc["rows"] == full["rows"]
+    pd.testing.assert_frame_equal(_frame(tmp_path / "inc" / "processed.parquet"),
+                                  _frame(tmp_path / "full" / "processed.parquet"))
+
+
+def test_edit_then_append_triggers_full_rebuild(tmp_path):
+    lines = _raw_lines(2001)
+    raw = tmp_path / "raw.csv"
+    raw.write_bytes(b"".join(lines[:1501]))
+    processed = tmp_path / "processed.parquet"
+    _build(raw, processed)
+    assert raw.stat().st_size < FINGERPRINT_BYTES
+
+    # edita (mesmo tamanho em bytes) uma linha mantida, longe da cauda conferida
+    kept = read_store(processed)
+    row_id = int(kept.loc[kept["ship_mode"] == "Standard Class", "row_id"].min())
+    i = next(i for i, l in enumerate(lines[1:1501], 1) if l.startswith(b"%d," % row_id))
+    lines[i] = lines[i].replace(b",Standard Class,", b",Standard Clasz,")
+
+    raw.write_bytes(b"".join(lines))
+    manifest = _build(raw, processed)
+
+    assert manifest["last_mode"] == "full"
+    assert (read_store(processed)["ship_mode"] == "Standard Clasz").sum() == 1
@@ -0,0 +1,64 @@
+# tests/test_pareto.py — motor de Pareto / ABC contra pandas puro
+# --------------------------------------------------------------
+# Rode a partir da raiz do projeto: python -m pytest -q
+import numpy as np
+import pandas as pd
+
+from utils.pareto import build_paretos, abc_classes, ABC_THRESHOLDS
+
+
+def _frame(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    products = [f"P{i:03d}" for i in range(60)]
+    return pd.DataFrame({
+        # categoria com valores não observados (devem ficar de fora)
+        "product_name": pd.Categorical(rng.choice(products[:50], n), categories=products),
+        "total_net_sales": rng.gamma(1.5, 200.0, n).round(2),
+        "quantity": rng.integers(1, 10, n),
+    })
+
+
+def _expected(df, key, col):
+    g = df.groupby(key, observed=True)[col].sum().sort_values(ascending=False, kind="stable")
+    share = g / g.sum()
+    cum = share.cumsum()
+    abc = cum.apply(lambda v: "A" if v <= ABC_THRESHOLDS[0] else ("B" if v <= ABC_THRESHOLDS[1] else "C"))
+    return pd.DataFrame({key: g.index.astype(object), col: g.to_numpy(dtype=float), "share": share.to_numpy(),
+                         "cum_share": cum.to_numpy(), "abc": abc.to_numpy(dtype=object)})
+
+
+def test_pareto_matches_pandas():
+    df = _frame()
+    paretos = build_paretos(df, "product_name", ("total_net_sales", "quantity", "missing"))
+    assert set(paretos) == {"total_net_sales", "quantity"}
+
+    for col, p in paretos.items():
+        exp = _expected(df, "product_name", col)
+        got = p.frame()
+        assert len(p) == df["product_name"].nunique() == 50
+        assert p.total == float(df[col].sum())
+        # empates podem trocar a ordem das chaves: valores e acumulados não
+        np.testing.assert_allclose(got[col], exp[col])
+        np.testing.assert_allclose(got["share"], exp["share"])
+        np.testing.assert_allclose(got["cum_share"], exp["cum_share"])
+        assert got["abc"].tolist() == exp["abc"].tolist()
+        assert set(got["product_name"]) == set(exp["product_name"])
+
+
+def test_top_n_and_groups_slice_the_full_pareto():
+    df = _frame()
+    p = build_paretos(df, "product_name", ("total_net_sales",))["total_net_sales"]
+    full = p.frame()
+
+    pd.testing.assert_frame_equal(p.frame(top_n=10), full.head(10))
+    b = p.frame(groups=["B"])
+    pd.testing.assert_frame_equal(b, full[full["abc"] == "B"].reset_index(drop=True))
+    assert p.frame(top_n=0).empty
+
+
+def test_abc_classes_boundaries_and_zero_total():
+    assert abc_classes([0.5, 0.8, 0.81, 0.95, 0.96, 1.0]).tolist() == ["A", "A", "B", "B", "C", "C"]
+
+    df = pd.DataFrame({"product_name": ["x", "y"], "total_net_sales": [0.0, 0.0]})
+    p = build_paretos(df, "product_name", ("total_net_sales",))["total_net_sales"]
+    assert p.total == 0 and (p.frame()["cum_share"] == 0).all()
@@ -0,0 +1,55 @@
+# tests/test_perf.py — spans de tempo/linhas por etapa e o resumo p50/p95
+# ----------------------------------------------------------------------
+# Rode a partir da raiz do projeto: python -m pytest -q
+import pandas as pd
+import pytest
+
+from utils import perf
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(perf, "_ENABLED", True)
+    monkeypatch.setattr(perf, "_TRACE_MEMORY", False)
+    s = perf.SpanStore(max_spans=5)
+    monkeypatch.setattr(perf, "_STORE", s)
+    return s
+
+
+def test_nested_spans_and_timed_rows(store):
+    @perf.timed("page.filter")
+    def head(df, n):
+        return df.head(n)
+
+    df = pd.DataFrame({"x": range(10)})
+    with perf.span("page.section", rows_in=len(df)) as s:
+        s.rows_out = len(head(df, 3))
+
+    spans = store.frame()
+    assert spans["name"].tolist() == ["page.filter", "page.section"]
+    assert spans["parent"].iloc[0] == "page.section" and pd.isna(spans["parent"].iloc[1])
+    assert spans["rows_in"].tolist() == [10.0, 10.0]
+    assert spans["rows_out"].tolist() == [3.0, 3.0]
+    assert (spans["ms"] >= 0).all()
+
+
+def test_store_keeps_the_last_spans_and_summary_matches_pandas(store):
+    for i in range(8):
+        with perf.span("a" if i % 2 else "b"):
+            pass
+    spans = store.frame()
+    assert len(spans) == 5  # circular: só os últimos
+
+    summary = store.summary().set_index("name")
+    g = spans.groupby("name")["ms"]
+    assert summary["spans"].to_dict() == g.size().to_dict()
+    pd.testing.assert_series_equal(summary["p95_ms"].sort_index(), g.quantile(0.95).sort_index(),
+                                   check_names=False)
+    assert perf.summarize(spans.iloc[:0]).empty
+
+
+def test_disabled_records_nothing(store, monkeypatch):
+    monkeypatch.setattr(perf, "_ENABLED", False)
+    with perf.span("off"):
+        pass
+    assert store.frame().empty
@@ -0,0 +1,63 @@
+# tests/test_sketches.py — sketches HLL e sua combinação contra nunique() do pandas
+# -------------------------------------------------------------------------------
+# Rode a partir da raiz do projeto: python -m pytest -q
+import numpy as np
+import pandas as pd
+
+from utils.sketches import (
+    build_sketches, merge_sketches, write_sketches, read_sketches, standard_error, SKETCH_DIMS,
+)
+
+
+def _frame(n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "month_code": rng.integers(2016 * 12, 2016 * 12 + 6, n),
+        "category": pd.Categorical(rng.choice(["Furniture", "Office Supplies", "Technology"], n)),
+        "segment": rng.choice(["Consumer", "Corporate", "Home Office"], n),
+        "order_id": [f"O-{i}" for i in rng.integers(0, 12000, n)],
+        "customer_name": pd.Categorical(rng.choice([f"C{i:04d}" for i in range(3000)], n)),
+        "city": rng.choice([f"City {i}" for i in range(150)] + [None], n),
+    })
+
+
+def _registers_by_cell(sk, col):
+    cells = [tuple(r) for r in sk.cells[list(SKETCH_DIMS)].astype(str).itertuples(index=False)]
+    return dict(zip(cells, sk.registers[col]))
+
+
+def test_counts_are_close_to_nunique():
+    df = _frame()
+    sk = build_sketches(df)
+    tol = 4 * standard_error()
+    everything = sk.cell_mask(None)
+    for col in ("order_id", "customer_name", "city"):
+        exact = df[col].nunique()
+        assert abs(sk.count(col, everything) - exact) <= tol * exact
+
+    state = {"date": None, "dims": {"segment": ["Consumer"], "category": ["Technology"]}, "ranges": {}}
+    sub = df[(df["segment"] == "Consumer") & (df["category"] == "Technology")]
+    exact = sub["customer_name"].nunique()
+    assert abs(sk.count("customer_name", sk.cell_mask(state)) - exact) <= tol * exact
+
+    # faixas numéricas não cabem nas células; coluna sem sketch -> None
+    assert sk.cell_mask({"date": None, "dims": {}, "ranges": {"sales": (0, 1)}}) is None
+    assert sk.count("product_name", everything) is None
+    assert sk.count("city", np.zeros(len(sk), dtype=bool)) == 0
+
+
+def test_merge_of_parts_equals_sketch_of_all_rows(tmp_path):
+    df = _frame()
+    whole = build_sketches(df)
+    merged = merge_sketches([build_sketches(df.iloc[:7000]), build_sketches(df.iloc[7000:15000]),
+                             build_sketches(df.iloc[15000:])])
+    assert len(merged) == len(whole)
+    for col in whole.registers:
+        a, b = _registers_by_cell(whole, col), _registers_by_cell(merged, col)
+        assert a.keys() == b.keys()
+        assert all((a[k] == b[k]).all() for k in a)
+
+    write_sketches(merged, tmp_path / "processed.parquet")
+    back = read_sketches(tmp_path / "processed.parquet")
+    for col in whole.registers:
+        assert back.count(col, back.cell_mask(None)) == whole.count(col, whole.cell_mask(None))
@@ -0,0 +1,27 @@
+# tests/test_workers.py — nº de processos do pré-processamento (DASHBOARD_WORKERS)
+# -------------------------------------------------------------------------------
+# Rode a partir da raiz do projeto: python -m pytest -q
+import os
+
+import pytest
+
+from utils.pre_process import default_workers, main, WORKERS_ENV
+
+
+@pytest.mark.parametrize("value, expected", [("", 1), ("3", 3), ("-2", 1), ("auto", os.cpu_count() or 1)])
+def test_default_workers(monkeypatch, value, expected):
+    monkeypatch.setenv(WORKERS_ENV, value)
+    assert default_workers() == expected
+
+
+def test_invalid_workers_env_falls_back_to_one(monkeypatch):
+    monkeypatch.setenv(WORKERS_ENV, "four")
+    with pytest.warns(UserWarning, match=WORKERS_ENV):
+        assert default_workers() == 1
+
+
+def test_cli_does_not_read_workers_env_on_check(monkeypatch, tmp_path):
+    monkeypatch.setenv(WORKERS_ENV, "four")
+    # artefatos ausentes -> código 1, sem ValueError ao montar o argparse
+    assert main(["check", "--raw", str(tmp_path / "raw.csv"),
+                 "--processed", str(tmp_path / "processed.parquet")]) == 1
@@ -9,7 +9,7 @@ def get_paths(project_root):
         "DATA_RAW_DIR": data_dir / "raw",
         "DATA_PROCESSED_DIR": data_dir / "processed",
         "RAW_PATH": data_dir / "raw" / "dataset_ruido.csv",      # ajuste se necessário
-        "PROCESSED_PATH": data_dir / "processed" / "processed.csv",
+        "PROCESSED_PATH": data_dir / "processed" / "processed.parquet",
     }
     return paths
 
@@ -0,0 +1,210 @@
+# utils/cohort.py — motor de cohort (mês da 1ª compra) em NumPy
+# -------------------------------------------------------------
+# Trabalha só com inteiros: month_code (ano*12 + mês-1) e códigos de cliente
+# (categorias/factorize). A 1ª compra de cada cliente sai de uma passada
+# (np.minimum.at); a matriz coorte × meses-desde-a-coorte é montada com
+# np.bincount — sem cópia do DataFrame, merge, .dt ou groupby/nunique/pivot.
+# Saídas: contagem de clientes, receita e retenção (% da coorte).
+#
+# No pré-processamento é gravada a "atividade" dos clientes
+# (processed.cohort.parquet): pares distintos (cliente, month_code) com a
+# receita do par e o mês da 1ª compra do cliente. Ela é bem menor que as
+# linhas, é atualizada por soma no modo incremental e basta para a coorte sem
+# filtros (a mesma conta de build_cohort, sobre os pares).
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from utils.dates import month_codes_from_labels
+
+# valores possíveis da matriz (Cohort.matrix)
+COHORT_VALUES = ("count", "revenue", "retention")
+
+# chave de cliente e métrica de receita da atividade gravada (1ª existente)
+COHORT_KEYS = ("customer_name", "customer_id", "customer")
+COHORT_VALUE_COLS = ("total_net_sales", "sales")
+
+
+def month_codes(df):
+    """month_code por linha (int64) a partir de month_code/order_date/month_year; None se não houver."""
+    if "month_code" in df.columns:
+        return df["month_code"].to_numpy(dtype="int64")
+    if "order_date" in df.columns and pd.api.types.is_datetime64_any_dtype(df["order_date"]):
+        d = df["order_date"]
+        return (d.dt.year * 12 + d.dt.month - 1).to_numpy(dtype="int64")
+    if "month_year" in df.columns:
+        # rótulos 'YYYY-MM': converte só os valores distintos
+        return month_codes_from_labels(df["month_year"])
+    return None
+
+
+def month_starts(codes):
+    """month_code -> Timestamp do 1º dia do mês."""
+    codes = np.asarray(codes, dtype="int64")
+    return pd.to_datetime(pd.DataFrame({"year": codes // 12, "month": codes % 12 + 1, "day": 1}))
+
+
+def _customer_codes(s):
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.codes.to_numpy(dtype="int64"), len(s.cat.categories)
+    codes, labels = pd.factorize(s)
+    return codes.astype("int64"), len(labels)
+
+
+class Cohort:
+    """Matrizes da coorte (linhas = meses de coorte com clientes; colunas = meses desde a coorte)."""
+
+    def __init__(self, cohort_codes, counts, revenue=None):
+        self.cohort_codes = cohort_codes  # month_code de cada linha
+        self.counts = counts              # clientes distintos ativos (int)
+        self.revenue = revenue            # soma da métrica de receita (float) ou None
+
+    @property
+    def empty(self):
+        return len(self.cohort_codes) == 0
+
+    @property
+    def sizes(self):
+        """Tamanho de cada coorte (clientes no mês 0)."""
+        return self.counts[:, 0] if not self.empty else np.zeros(0, dtype="int64")
+
+    @property
+    def nbytes(self):
+        """Bytes dos arrays (para o limite de memória do filter_cache)."""
+        n = self.cohort_codes.nbytes + self.counts.nbytes
+        return int(n + (self.revenue.nbytes if self.revenue is not None else 0))
+
+    def matrix(self, value="count"):
+        """
+        DataFrame da coorte: 'count' (clientes), 'revenue' (receita) ou
+        'retention' (% dos clientes da coorte ativos em cada mês).
+        """
+        if self.empty:
+            return pd.DataFrame()
+        if value == "count":
+            data = self.counts
+        elif value == "revenue":
+            if self.revenue is None:
+                raise ValueError("Cohort sem métrica de receita (value_col).")
+            data = self.revenue
+        elif value == "retention":
+            data = self.counts / self.sizes[:, None] * 100.0
+        else:
+            raise ValueError(f"value deve ser um de {COHORT_VALUES}: {value!r}")
+        index = pd.DatetimeIndex(month_starts(self.cohort_codes), name="cohort_month")
+        columns = pd.RangeIndex(data.shape[1], name="cohort_index")
+        return pd.DataFrame(data, index=index, columns=columns)
+
+
+def build_cohort(df, customer_col, value_col=None):
+    """
+    Cohort por mês da 1ª compra. 'value_col' (opcional) é somado por célula
+    para a matriz de receita. Retorna Cohort (vazio se faltar mês/cliente).
+    """
+    months = month_codes(df)
+    if months is None or customer_col not in df.columns or len(df) == 0:
+        return Cohort(np.zeros(0, dtype="int64"), np.zeros((0, 0), dtype="int64"))
+
+    cust, n_cust = _customer_codes(df[customer_col])
+    valid = cust >= 0
+    cust, months = cust[valid], months[valid]
+    if len(cust) == 0:
+        return Cohort(np.zeros(0, dtype="int64"), np.zeros((0, 0), dtype="int64"))
+
+    # 1ª compra por cliente (uma passada)
+    first = np.full(n_cust, np.iinfo("int64").max, dtype="int64")
+    np.minimum.at(first, cust, months)
+
+    base = months.min()
+    row = first[cust] - base                 # linha da coorte (relativa ao 1º mês)
+    offset = months - first[cust]            # meses desde a coorte
+    n_rows = int(row.max()) + 1
+    n_off = int(offset.max()) + 1
+
+    # clientes distintos por célula: pares (cliente, offset) únicos
+    pairs = np.unique(cust * n_off + offset)
+    p_cust, p_off = pairs // n_off, pairs % n_off
+    cells = (first[p_cust] - base) * n_off + p_off
+    counts = np.bincount(cells, minlength=n_rows * n_off).reshape(n_rows, n_off)
+
+    revenue = None
+    if value_col is not None and value_col in df.columns:
+        w = np.nan_to_num(df[value_col].to_numpy(dtype="float64", na_value=np.nan)[valid])
+        revenue = np.bincount(row * n_off + offset, weights=w, minlength=n_rows * n_off).reshape(n_rows, n_off)
+
+    # só meses que têm coorte (algum cliente com 1ª compra nele)
+    keep = counts[:, 0] > 0
+    return Cohort(
+        np.arange(n_rows, dtype="int64")[keep] + base,
+        counts[keep],
+        revenue[keep] if revenue is not None else None,
+    )
+
+
+# ---------------------------
+# Atividade por cliente × mês (gravada no pré-processamento)
+# ---------------------------
+def _first_col(df, candidates):
+    return next((c for c in candidates if c in df.columns), None)
+
+
+def activity_path(store_path):
+    """Caminho da atividade de clientes associada ao Parquet processado."""
+    p = Path(store_path)
+    return p.with_name(p.stem + ".cohort.parquet")
+
+
+def build_activity(df):
+    """
+    Pares distintos (cliente, month_code) de um DataFrame (ou bloco) com a
+    soma da receita. None se faltar cliente ou mês.
+    """
+    key = _first_col(df, COHORT_KEYS)
+    months = month_codes(df)
+    if key is None or months is None:
+        return None
+    value = _first_col(df, COHORT_VALUE_COLS)
+    revenue = df[value].to_numpy(dtype="float64") if value else np.zeros(len(df))
+    d = pd.DataFrame({key: df[key].array, "month_code": months.astype("int32"), "revenue": revenue})
+    d[key] = d[key].astype("category")
+    return d.groupby([key, "month_code"], observed=True, sort=False)["revenue"].sum().reset_index()
+
+
+def merge_activity(parts):
+    """Soma atividades parciais (blocos, ou gravada + cauda nova) numa só."""
+    parts = [p.drop(columns="first_month", errors="ignore") for p in parts if p is not None and not p.empty]
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    allp = pd.concat(parts, ignore_index=True)
+    key = _first_col(allp, COHORT_KEYS)
+    allp[key] = allp[key].astype("category")  # categorias diferentes entre partes
+    return allp.groupby([key, "month_code"], observed=True, sort=False)["revenue"].sum().reset_index()
+
+
+def write_activity(activity, store_path):
+    """Grava a atividade (com o mês da 1ª compra de cada cliente) ao lado do processado."""
+    key = _first_col(activity, COHORT_KEYS)
+    activity = activity.assign(
+        first_month=activity.groupby(key, observed=True)["month_code"].transform("min").astype("int32")
+    )
+    p = activity_path(store_path)
+    tmp = p.with_suffix(p.suffix + ".tmp")
+    activity.to_parquet(tmp, index=False)
+    tmp.replace(p)
+    return p
+
+
+def read_activity(store_path):
+    """Lê a atividade gravada (None se ainda não existir)."""
+    p = activity_path(store_path)
+    if not p.exists():
+        return None
+    return pd.read_parquet(p)
+
+
+def cohort_from_activity(activity):
+    """Coorte sem filtros a partir da atividade: (Cohort, coluna de cliente)."""
+    key = _first_col(activity, COHORT_KEYS)
+    return build_cohort(activity, key, value_col="revenue"), key
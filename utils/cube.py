@@ -0,0 +1,114 @@
+# utils/cube.py — cubo mensal pré-agregado (month × category × ... × state)
+# ------------------------------------------------------------------------
+# Gerado no pré-processamento (processed.cube.parquet). Cada célula guarda
+# somas das métricas e a contagem de linhas. Quando os filtros ativos cabem
+# na granularidade do cubo (meses inteiros, dimensões do cubo, sem faixas
+# numéricas), as páginas agregam o cubo em vez das linhas: O(células).
+import pandas as pd
+from pathlib import Path
+
+# Dimensões (na ordem do groupby) e métricas somadas
+# (state_code/is_usa dependem de state/country: não criam células novas)
+CUBE_DIMS = ("month_code", "month_year", "category", "sub_category", "segment", "region", "state", "country",
+             "state_code", "is_usa")
+CUBE_MEASURES = ("total_net_sales", "sales", "profit", "total_cost", "quantity",
+                 "total_gross_sale", "total_gross_sales")
+
+
+def cube_path(store_path):
+    """Caminho do cubo associado ao Parquet processado."""
+    p = Path(store_path)
+    return p.with_name(p.stem + ".cube.parquet")
+
+
+def build_cube(df):
+    """Agrega um DataFrame (ou bloco) de linhas na granularidade do cubo."""
+    dims = [c for c in CUBE_DIMS if c in df.columns]
+    measures = [c for c in CUBE_MEASURES if c in df.columns]
+    # dropna=False: células com dimensão ausente (p.ex. state_code fora dos EUA) continuam no cubo
+    g = df.groupby(dims, observed=True, sort=False, dropna=False)
+    cube = g[measures].sum()
+    cube["n_rows"] = g.size()
+    return cube.reset_index()
+
+
+def merge_cubes(cubes):
+    """Soma cubos parciais (de blocos/partições) num único cubo."""
+    cubes = [c for c in cubes if c is not None and not c.empty]
+    if not cubes:
+        return pd.DataFrame()
+    if len(cubes) == 1:
+        return cubes[0]
+    allc = pd.concat(cubes, ignore_index=True)
+    dims = [c for c in CUBE_DIMS if c in allc.columns]
+    for c in dims:
+        # blocos com categorias diferentes: concat volta como texto
+        if not (pd.api.types.is_numeric_dtype(allc[c]) or pd.api.types.is_bool_dtype(allc[c])):
+            allc[c] = allc[c].astype("category")
+    return allc.groupby(dims, observed=True, sort=False, dropna=False).sum().reset_index()
+
+
+def write_cube(cube, store_path):
+    """Grava o cubo ao lado do processado."""
+    p = cube_path(store_path)
+    tmp = p.with_suffix(p.suffix + ".tmp")
+    cube.to_parquet(tmp, index=False)
+    tmp.replace(p)
+    return p
+
+
+def read_cube(store_path):
+    """Lê o cubo (None se ainda não existir)."""
+    p = cube_path(store_path)
+    if not p.exists():
+        return None
+    return pd.read_parquet(p)
+
+
+# ---------------------------
+# Consulta com o estado dos filtros
+# ---------------------------
+def _month_bounds(date_state):
+    """
+    Converte o filtro de período em (mês inicial, mês final) em month_code,
+    ou None se ele cortar algum mês ao meio (não expressável no cubo).
+    """
+    start, end = date_state["start"], date_state["end"]
+    if date_state.get("monthly"):
+        # slider de month_year: sempre meses inteiros
+        return start.year * 12 + start.month - 1, end.year * 12 + end.month - 1
+    if not date_state.get("start_is_min") and start.day != 1:
+        return None
+    if not date_state.get("end_is_max") and end.day != end.days_in_month:
+        return None
+    return start.year * 12 + start.month - 1, end.year * 12 + end.month - 1
+
+
+def query_cube(cube, state):
+    """
+    Filtra o cubo conforme o estado dos filtros laterais (ver
+    lateral_filters.get_filter_state). Retorna o cubo filtrado ou None
+    quando algum filtro ativo não cabe na granularidade do cubo.
+    """
+    if cube is None or cube.empty or state is None:
+        return None
+    if any(v is not None for v in state.get("ranges", {}).values()):
+        return None
+
+    mask = pd.Series(True, index=cube.index)
+
+    date_state = state.get("date")
+    if date_state and not date_state.get("full"):
+        bounds = _month_bounds(date_state)
+        if bounds is None or "month_code" not in cube.columns:
+            return None
+        mask &= cube["month_code"].between(bounds[0], bounds[1])
+
+    for col, sel in state.get("dims", {}).items():
+        if sel is None:
+            continue
+        if col not in cube.columns:
+            return None
+        mask &= cube[col].isin(sel)
+
+    return cube[mask]
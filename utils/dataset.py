@@ -0,0 +1,85 @@
+# utils/dataset.py — handle único (por processo) do dataset processado
+# --------------------------------------------------------------------
+# Antes, cada página tinha seu get_df() com @st.cache_data: a cada acerto de
+# cache o Streamlit devolve uma CÓPIA (pickle/unpickle) do DataFrame — com
+# várias sessões, dezenas de cópias do mesmo dado em memória.
+# Aqui o processado é carregado uma vez por versão (st.cache_resource, sem
+# cópia) junto com o índice de filtros, o cubo mensal, a coorte e os sketches de únicos, e compartilhado por
+# todas as páginas e sessões. É SOMENTE LEITURA: páginas não devem alterar
+# o DataFrame in-place (use .copy() antes de modificar).
+import streamlit as st
+from pathlib import Path
+
+from utils.store import read_store, read_manifest, manifest_path
+from utils.cube import read_cube
+from utils.cohort import read_activity, cohort_from_activity
+from utils.sketches import read_sketches
+from utils.filter_engine import FilterIndex
+from utils.perf import span
+
+
+class Dataset:
+    """DataFrame processado + índice de filtros + cubo (somente leitura)."""
+
+    def __init__(self, processed_path, version=None):
+        self.path = Path(processed_path)
+        self.version = version
+        self.df = read_store(self.path)
+        self.cube = read_cube(self.path)
+        self.activity = read_activity(self.path)
+        # sketches HLL por célula mês × categoria × segmento (contagens distintas aproximadas)
+        self.sketches = read_sketches(self.path)
+        manifest = read_manifest(manifest_path(self.path)) or {}
+        # limites fixos dos bins dos histogramas (utils/histograms.py), por coluna
+        self.hist_edges = manifest.get("histograms", {}).get("edges", {})
+        self._index = None
+        self._cohort = None
+
+    @property
+    def index(self):
+        """
+        Índice de bitmaps dos filtros, montado na 1ª vez que é pedido (uma vez
+        por processo; não é gravado em disco, nem no modo só pré-gerado).
+        """
+        if self._index is None:
+            with span("filter_engine.build_index", rows_in=len(self.df)):
+                self._index = FilterIndex(self.df, key=("dataset", str(self.path), self.version))
+        return self._index
+
+    @property
+    def cohort(self):
+        """
+        Coorte sem filtros, (Cohort, coluna de cliente), a partir da atividade
+        gravada no pré-processamento; None se ela não existir.
+        """
+        if self._cohort is None and self.activity is not None:
+            self._cohort = cohort_from_activity(self.activity)
+        return self._cohort
+
+    def frame(self, columns=None):
+        """
+        DataFrame com as colunas pedidas (as ausentes são ignoradas). Com
+        Copy-on-Write (padrão no pandas 3) a seleção não copia os dados.
+        """
+        if columns is None:
+            return self.df
+        return self.df[[c for c in dict.fromkeys(columns) if c in self.df.columns]]
+
+
+@st.cache_resource(show_spinner="Carregando dados...", max_entries=2)
+def load_dataset(processed_path, version=None):
+    """Dataset compartilhado ('version' muda quando o processado é atualizado)."""
+    with span("dataset.load") as s:
+        ds = Dataset(processed_path, version)
+        s.rows_out = len(ds.df)
+    return ds
+
+
+def get_dataset():
+    """Dataset do processado atual (caminho/versão compartilhados pelo main.py)."""
+    paths = st.session_state.get("PATHS", {})
+    processed = paths.get(
+        "PROCESSED_PATH",
+        str(Path(__file__).resolve().parents[1] / "data" / "processed" / "processed.parquet")
+    )
+    return load_dataset(processed, version=st.session_state.get("DATA_VERSION"))
@@ -0,0 +1,128 @@
+# utils/dates.py — parse de datas do RAW (formato explícito + cache de valores)
+# ----------------------------------------------------------------------------
+# As datas do RAW (ex.: 11/8/2016) se repetem muito entre as linhas de pedido:
+# - o formato é decidido UMA vez, por amostra (detect_date_format), e o parse
+#   usa esse formato explícito (sem inferência elemento a elemento)
+# - só os valores DISTINTOS são convertidos; o resultado fica em cache
+#   (DateParser) e é reaproveitado bloco a bloco no streaming
+# - month_year ('YYYY-MM') sai do código inteiro do mês: o texto é montado
+#   apenas para os meses distintos, não linha a linha (to_period + astype(str))
+# Valores fora do formato detectado ainda passam por inferência (format="mixed");
+# os que não virarem data ficam NaT (e a linha sai no dropna do pipeline).
+import numpy as np
+import pandas as pd
+
+from utils.dtypes import month_code_from_dates
+
+# colunas de data do RAW (já em snake_case)
+DATE_COLS = ("order_date", "ship_date")
+
+# formatos candidatos, na ordem de preferência (empate -> o primeiro; o RAW é americano)
+DATE_FORMATS = (
+    "%m/%d/%Y", "%d/%m/%Y", "%Y-%m-%d", "%Y/%m/%d", "%m-%d-%Y", "%d-%m-%Y", "%d.%m.%Y",
+    "%m/%d/%y", "%d/%m/%y", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S",
+)
+
+# valores distintos usados na detecção e fração mínima que o formato precisa interpretar
+DATE_SAMPLE_VALUES = 2000
+DATE_FORMAT_MIN_SHARE = 0.95
+
+
+def detect_date_format(values, formats=DATE_FORMATS, sample=DATE_SAMPLE_VALUES):
+    """
+    Formato (strftime) que interpreta a maior fração dos valores distintos de
+    uma amostra. None se nenhum chegar a DATE_FORMAT_MIN_SHARE (o parse
+    volta à inferência) ou se a coluna já for datetime.
+    """
+    s = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return None
+    uniq = pd.Index(pd.unique(s.dropna().astype(str)))[:sample]
+    if uniq.empty:
+        return None
+    best, share = None, 0.0
+    for fmt in formats:
+        ok = float(pd.to_datetime(uniq, format=fmt, errors="coerce").notna().mean())
+        if ok > share:
+            best, share = fmt, ok
+        if ok == 1.0:
+            break
+    return best if share >= DATE_FORMAT_MIN_SHARE else None
+
+
+def _parse(values, fmt):
+    """Parse de valores distintos: formato explícito e inferência só para o que sobrar."""
+    if fmt is None:
+        return pd.Series(pd.to_datetime(values, format="mixed", errors="coerce"))
+    out = pd.Series(pd.to_datetime(values, format=fmt, errors="coerce"))
+    bad = out.isna().to_numpy() & pd.notna(values)
+    if bad.any():
+        out[bad] = pd.to_datetime(values[bad], format="mixed", errors="coerce").astype(out.dtype)
+    return out
+
+
+class DateParser:
+    """
+    Converte uma coluna de datas com formato explícito ('fmt'; None = inferência),
+    parseando só os valores distintos. O cache texto -> data vale para todos os
+    blocos passados ao mesmo parser.
+    """
+
+    def __init__(self, fmt=None):
+        self.fmt = fmt
+        self._known = pd.Series([], index=pd.Index([], dtype=object), dtype="datetime64[us]")
+
+    def __call__(self, s):
+        if pd.api.types.is_datetime64_any_dtype(s):
+            return s
+        codes, uniques = pd.factorize(s)  # ausentes -> código -1
+        uniques = pd.Index(np.asarray(uniques, dtype=object))
+        pos = self._known.index.get_indexer(uniques)
+        if (pos < 0).any():
+            new = uniques[pos < 0]
+            self._known = pd.concat([self._known, pd.Series(_parse(new, self.fmt).to_numpy(), index=new)])
+            pos = self._known.index.get_indexer(uniques)
+        # posição extra com NaT: código -1 (valor ausente) cai nela
+        values = np.append(self._known.to_numpy()[pos], np.array(["NaT"], dtype=self._known.dtype))
+        return pd.Series(values[codes], index=s.index)
+
+
+def date_parsers(formats, cols=DATE_COLS):
+    """Um DateParser por coluna de data ({col: formato | None})."""
+    return {c: DateParser((formats or {}).get(c)) for c in cols}
+
+
+def detect_date_formats(df, cols=DATE_COLS):
+    """Formatos das colunas de data presentes em df ({col: formato | None})."""
+    return {c: detect_date_format(df[c]) for c in cols if c in df.columns}
+
+
+def month_labels(codes):
+    """Rótulos 'YYYY-MM' de códigos de mês (ano*12 + mês-1)."""
+    return ["{:04d}-{:02d}".format(int(c) // 12, int(c) % 12 + 1) for c in codes]
+
+
+def month_codes_from_labels(month_year):
+    """
+    month_code por linha (int64) a partir de rótulos 'YYYY-MM' — aritmética só
+    sobre os rótulos distintos, sem PeriodIndex. Ausente -> -1.
+    """
+    s = month_year if isinstance(month_year.dtype, pd.CategoricalDtype) else month_year.astype("category")
+    labels = pd.Index(s.cat.categories.astype(str))
+    per_label = labels.str.slice(0, 4).astype("int64") * 12 + labels.str.slice(5, 7).astype("int64") - 1
+    return np.append(per_label.to_numpy(dtype="int64"), -1)[s.cat.codes.to_numpy()]
+
+
+def month_year_from_dates(dates):
+    """
+    month_year ('YYYY-MM', category) a partir de uma série datetime: código
+    inteiro do mês por linha e rótulos só dos meses distintos. NaT -> ausente.
+    """
+    valid = dates.notna().to_numpy()
+    codes = np.full(len(dates), -1, dtype="int64")
+    if valid.any():
+        months, inv = np.unique(month_code_from_dates(dates[valid]).to_numpy(), return_inverse=True)
+        codes[valid] = inv
+    else:
+        months = np.array([], dtype="int64")
+    return pd.Series(pd.Categorical.from_codes(codes, categories=month_labels(months)), index=dates.index)
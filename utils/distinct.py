@@ -0,0 +1,73 @@
+# utils/distinct.py — KPIs de contagem distinta (exata ou aproximada)
+# -------------------------------------------------------------------
+# Chave na barra lateral: no modo aproximado, os KPIs de "únicos" saem dos
+# sketches HyperLogLog do pré-processamento (utils/sketches.py) quando os
+# filtros cabem nas células mês × categoria × segmento; caso contrário (ou no
+# modo exato) fazem nunique() nas linhas filtradas, em cache por estado de filtros.
+import streamlit as st
+
+from utils.lateral_filters import get_filter_state
+from utils.filter_cache import filtered_aggregate
+from utils.sketches import standard_error, SKETCH_DIMS
+from utils.perf import span
+
+APPROX_KEY = "APPROX_DISTINCT"
+
+
+def keep_approx_state():
+    """
+    Mantém o valor da chave entre páginas: o Streamlit descarta o estado de um
+    widget no rerun em que ele não é desenhado (p.ex. no Dicionário de Dados).
+    Chamado pelo main.py a cada rerun.
+    """
+    if APPROX_KEY in st.session_state:
+        st.session_state[APPROX_KEY] = st.session_state[APPROX_KEY]
+
+
+def approx_toggle():
+    """Desenha a chave do modo aproximado (o valor vale para todas as páginas da sessão)."""
+    st.session_state.setdefault(APPROX_KEY, False)
+    return st.sidebar.toggle(
+        "Contagens distintas aproximadas (HLL)",
+        key=APPROX_KEY,
+        help="Estima os KPIs de únicos com sketches HyperLogLog pré-calculados, "
+             "sem percorrer as linhas filtradas.",
+    )
+
+
+def count_distinct(ds, df, col):
+    """
+    (contagem, aproximada?) de valores distintos de 'col' nas linhas
+    filtradas 'df'. Aproximada só no modo HLL, com sketch para 'col' e
+    filtros expressáveis nas células.
+    """
+    if st.session_state.get(APPROX_KEY) and ds.sketches is not None:
+        with span(f"kpi.distinct_hll.{col}"):
+            mask = ds.sketches.cell_mask(get_filter_state())
+            n = ds.sketches.count(col, mask) if mask is not None else None
+        if n is not None:
+            return n, True
+    return filtered_aggregate(f"nunique:{col}", lambda: int(df[col].nunique())), False
+
+
+def distinct_metric(label, ds, df, col):
+    """st.metric de valores distintos; estimativas vêm com '≈'. Retorna se foi aproximada."""
+    n, approx = count_distinct(ds, df, col)
+    if approx:
+        st.metric(label, f"≈{n:,}", help=f"Estimativa HyperLogLog (erro padrão ±{standard_error():.1%})")
+    else:
+        st.metric(label, f"{n:,}")
+    return approx
+
+
+def approx_caption(approximated):
+    """Legenda abaixo dos KPIs: limite de erro das estimativas, ou por que ficaram exatas."""
+    if not st.session_state.get(APPROX_KEY):
+        return
+    se = standard_error()
+    if any(approximated):
+        st.caption(f"≈ Contagens aproximadas (HyperLogLog): erro padrão ±{se:.1%} "
+                   f"(±{2 * se:.1%} com ~95% de confiança). Desligue a chave na barra lateral para valores exatos.")
+    else:
+        st.caption("Modo aproximado ativo, mas os filtros atuais não cabem nas células dos sketches "
+                   f"({' × '.join(SKETCH_DIMS)}, meses inteiros, sem faixas) ou não há sketches: contagens exatas.")
@@ -0,0 +1,114 @@
+# utils/dtypes.py — otimização de tipos (memória) do dataset processado
+# ---------------------------------------------------------------------
+# Etapa do pipeline (depois do _prepare) que deixa o DataFrame compacto:
+# - dimensões textuais -> 'category'
+# - numéricos -> tipos menores (int32/int16; float32 onde a precisão permite)
+# - month_code (int) = ano*12 + (mês-1), código inteiro do mês do pedido
+# - state_code (sigla do estado nos EUA) e is_usa (país normalizado), calculados
+#   sobre as CATEGORIAS (poucos valores), não linha a linha
+# Os mapas são FIXOS (não dependem dos valores do bloco), então a mesma
+# conversão vale bloco a bloco no streaming e o esquema do Parquet não muda.
+import numpy as np
+import pandas as pd
+
+from utils.aux_functions import names_to_us_abbrev, US_STATE_TO_ABBR
+
+# Dimensões gravadas como dicionário (category)
+CATEGORY_COLS = (
+    "ship_mode", "segment", "country", "region", "state", "city",
+    "category", "sub_category", "product_name", "month_year",
+    "customer_id", "customer_name", "product_id", "state_code",
+)
+
+# state_code com níveis FIXOS (siglas dos EUA): o dtype não depende do bloco —
+# um bloco sem estado americano não pode virar category de float no Parquet
+STATE_CODE_DTYPE = pd.CategoricalDtype(sorted(set(US_STATE_TO_ABBR.values())))
+
+# Grafias do país que contam como EUA (comparação em maiúsculas)
+USA_ALIASES = frozenset({"UNITED STATES", "UNITED STATES OF AMERICA", "USA", "US", "U.S.", "U.S.A."})
+
+# Inteiros que cabem em tipos menores
+INT_COLS = {
+    "row_id": "int32",
+    "quantity": "int16",
+}
+
+# Sempre em float32: percentuais e códigos (exatos em float32)
+FLOAT32_COLS = ("discount", "postal_code")
+
+# Valores monetários: float32 só sob demanda (money_float32=True). Com ~7 dígitos
+# significativos, totais na casa do milhão já mudam nos centavos dos KPIs.
+MONEY_COLS = ("total_gross_sale", "total_net_sales", "total_cost", "profit", "sales")
+
+
+def month_code_from_dates(dates):
+    """Código inteiro do mês (ano*12 + mês-1) a partir de uma série datetime."""
+    return (dates.dt.year * 12 + dates.dt.month - 1).astype("int32")
+
+
+def add_geo_codes(df):
+    """
+    Cria (in-place) 'is_usa' (bool) a partir de 'country' e 'state_code'
+    (sigla de 2 letras, dtype fixo STATE_CODE_DTYPE; ausente se não mapeável)
+    a partir de 'state'.
+    """
+    if "country" in df.columns:
+        s = df["country"].astype("category")
+        flags = s.cat.categories.astype(str).str.upper().isin(USA_ALIASES)
+        codes = s.cat.codes.to_numpy()
+        df["is_usa"] = np.where(codes >= 0, flags[codes], False)
+    if "state" in df.columns:
+        s = df["state"].astype("category")
+        abbr = names_to_us_abbrev(pd.Series(s.cat.categories)).str.upper()
+        abbr = abbr.where(abbr.isin(STATE_CODE_DTYPE.categories))
+        codes = STATE_CODE_DTYPE.categories.get_indexer(abbr)  # fora das siglas -> -1 (ausente)
+        # posição extra -1: estado ausente na linha (código -1) continua ausente
+        df["state_code"] = pd.Categorical.from_codes(np.append(codes, -1)[s.cat.codes.to_numpy()],
+                                                     dtype=STATE_CODE_DTYPE)
+    return df
+
+
+def optimize_dtypes(df, money_float32=False):
+    """
+    Converte as colunas conhecidas para tipos compactos (in-place) e cria
+    'month_code' (quando houver 'order_date') e os códigos geográficos
+    (add_geo_codes). Devolve o próprio df.
+    """
+    for c in CATEGORY_COLS:
+        if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype("category")
+
+    add_geo_codes(df)
+
+    for c, dtype in INT_COLS.items():
+        if c in df.columns and pd.api.types.is_integer_dtype(df[c]):
+            df[c] = df[c].astype(dtype)
+
+    float32_cols = FLOAT32_COLS + (MONEY_COLS if money_float32 else ())
+    for c in float32_cols:
+        if c in df.columns and pd.api.types.is_float_dtype(df[c]):
+            df[c] = df[c].astype("float32")
+
+    if "order_date" in df.columns and pd.api.types.is_datetime64_any_dtype(df["order_date"]):
+        df["month_code"] = month_code_from_dates(df["order_date"])
+
+    return df
+
+
+def memory_report(before, after):
+    """
+    Compara uso de memória por coluna entre dois DataFrames (antes/depois).
+    Retorna DataFrame: column, dtype_before, dtype_after, bytes_before, bytes_after.
+    """
+    mb = before.memory_usage(deep=True, index=False)
+    ma = after.memory_usage(deep=True, index=False)
+    rows = []
+    for c in after.columns:
+        rows.append({
+            "column": c,
+            "dtype_before": str(before[c].dtype) if c in before.columns else "",
+            "dtype_after": str(after[c].dtype),
+            "bytes_before": int(mb.get(c, 0)),
+            "bytes_after": int(ma.get(c, 0)),
+        })
+    return pd.DataFrame(rows)
@@ -0,0 +1,147 @@
+# utils/figure_cache.py — cache (por processo) de figuras Plotly
+# --------------------------------------------------------------
+# Todo rerun reconstruía todas as figuras (px.line/bar/choropleth/imshow),
+# mesmo quando o agregado de entrada não mudou (p.ex. mexer no seletor da
+# coorte refazia o Pareto e os rankings). Aqui cada figura fica guardada por
+# (id do gráfico, hash dos dados de entrada, opções de layout), num LRU com
+# número máximo de entradas E orçamento de bytes (arrays dos traces): o
+# scatter linha a linha pode ter centenas de milhares de pontos por figura.
+# Obs.: o st.plotly_chart ainda converte a figura para JSON a cada rerun; o
+# que se economiza é a montagem da figura (px.* processa o DataFrame inteiro).
+# As figuras devolvidas são compartilhadas: não as modifique depois do cache.
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.perf import span
+
+FIGURE_CACHE_MAX_ENTRIES = 128
+# orçamento (estimado) de bytes das figuras guardadas; figura maior que isso não entra
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def figure_nbytes(fig):
+    """Estimativa de bytes de uma figura: arrays e textos dos traces (x, y, customdata, marker...)."""
+
+    def size(obj):
+        if isinstance(obj, np.ndarray):
+            if obj.dtype == object:
+                return int(pd.Series(obj.ravel()).memory_usage(deep=True, index=False))
+            return int(obj.nbytes)
+        if isinstance(obj, dict):
+            return sum(size(v) for v in obj.values())
+        if isinstance(obj, (list, tuple)):
+            return sum(size(v) for v in obj)
+        if isinstance(obj, str):
+            return len(obj)
+        return 8
+
+    return sum(size(trace.to_plotly_json()) for trace in getattr(fig, "data", ()))
+
+
+def data_hash(data):
+    """Hash estável do conteúdo (DataFrame/Series/ndarray/tupla/lista/dict/escalares)."""
+    h = hashlib.sha1()
+
+    def feed(obj):
+        if isinstance(obj, pd.DataFrame):
+            h.update(repr((list(obj.columns), [str(t) for t in obj.dtypes])).encode("utf-8"))
+            h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+        elif isinstance(obj, pd.Series):
+            h.update(repr((obj.name, str(obj.dtype))).encode("utf-8"))
+            h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+        elif isinstance(obj, np.ndarray):
+            h.update(repr((obj.dtype.str, obj.shape)).encode("utf-8"))
+            h.update(np.ascontiguousarray(obj).tobytes() if obj.dtype != object else repr(obj.tolist()).encode("utf-8"))
+        elif isinstance(obj, (tuple, list)):
+            h.update(b"[")
+            for o in obj:
+                feed(o)
+            h.update(b"]")
+        elif isinstance(obj, dict):
+            for k in sorted(obj, key=str):
+                h.update(str(k).encode("utf-8"))
+                feed(obj[k])
+        else:
+            h.update(json.dumps(obj, default=str).encode("utf-8"))
+
+    feed(data)
+    return h.hexdigest()
+
+
+class FigureCache:
+    """LRU de figuras limitado por entradas e por bytes, com contadores de acerto/falta."""
+
+    def __init__(self, max_entries=FIGURE_CACHE_MAX_ENTRIES, max_bytes=FIGURE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (figura, bytes)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.skipped = 0
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        fig = build()  # fora do lock: pode ser caro
+        n = figure_nbytes(fig)
+        with self._lock:
+            if n > self.max_bytes:
+                self.skipped += 1  # sozinha estouraria o orçamento: não guarda
+                return fig
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (fig, n)
+            self.bytes += n
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, freed) = self._entries.popitem(last=False)
+                self.bytes -= freed
+                self.evictions += 1
+        return fig
+
+    def stats(self):
+        """Contadores para diagnóstico."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "evictions": self.evictions,
+                "skipped": self.skipped,
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache():
+    """Instância única (por processo) do cache de figuras."""
+    return FigureCache()
+
+
+def cached_figure(chart_id, data, build, **layout):
+    """
+    Figura do gráfico 'chart_id' para os dados 'data' (o que build() usa) e as
+    opções 'layout' (títulos, modos, limites...): build() só roda se essa
+    combinação ainda não estiver no cache.
+    """
+    with span(f"figure.{chart_id}"):
+        key = (chart_id, data_hash(data), json.dumps(layout, sort_keys=True, default=str))
+        return get_figure_cache().get_or_build(key, build)
@@ -0,0 +1,145 @@
+# utils/filter_cache.py — cache (por processo) do resultado dos filtros
+# --------------------------------------------------------------------
+# Todas as páginas chamam sidebar_filters com o mesmo dataset. Com o mesmo
+# estado de filtros, o conjunto de linhas é o mesmo em qualquer página — então
+# guardamos, por (versão dos dados, estado dos filtros, índice das linhas):
+# - as posições das linhas filtradas
+# - agregados compartilhados (groupbys caros usados pelas páginas)
+# Despejo LRU limitado por memória (bytes) e contadores de acerto/falta.
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.perf import span
+
+# teto de memória do cache (posições + agregados)
+FILTER_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _sizeof(obj):
+    """Estimativa de bytes de um resultado (DataFrame/Series/ndarray/tupla/dict)."""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        mem = obj.memory_usage(deep=True)
+        return int(mem.sum() if hasattr(mem, "sum") else mem)
+    if isinstance(obj, np.ndarray) or hasattr(obj, "nbytes"):
+        return int(obj.nbytes)
+    if isinstance(obj, (tuple, list)):
+        return sum(_sizeof(o) for o in obj)
+    if isinstance(obj, dict):
+        return sum(_sizeof(o) for o in obj.values())
+    return 64
+
+
+def state_key(version, state, index_key=None):
+    """
+    Hash canônico de (versão dos dados, estado dos filtros, identidade do índice).
+    'index_key' = FilterIndex.key: as posições só valem para as linhas daquele índice.
+    """
+    payload = json.dumps({"version": version, "state": state, "index": index_key},
+                         sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class FilterCache:
+    """LRU limitado por bytes; cada entrada = posições + agregados nomeados."""
+
+    def __init__(self, max_bytes=FILTER_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> {"positions", "aggs", "bytes"}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _touch(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _add_bytes(self, entry, n):
+        entry["bytes"] += n
+        self.bytes += n
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            _, old = self._entries.popitem(last=False)
+            self.bytes -= old["bytes"]
+            self.evictions += 1
+
+    def get_positions(self, key):
+        """Posições das linhas filtradas (None se não estiver em cache)."""
+        with self._lock:
+            entry = self._touch(key)
+            if entry is None or entry["positions"] is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry["positions"]
+
+    def put_positions(self, key, positions):
+        with self._lock:
+            entry = self._touch(key)
+            if entry is None:
+                entry = self._entries[key] = {"positions": None, "aggs": {}, "bytes": 0}
+            if entry["positions"] is None:
+                entry["positions"] = positions
+                self._add_bytes(entry, _sizeof(positions))
+
+    def aggregate(self, key, name, fn):
+        """
+        Agregado 'name' para o estado 'key': calcula com fn() na 1ª vez e
+        reaproveita depois (em qualquer página/sessão). Não modifique o retorno.
+        """
+        with self._lock:
+            entry = self._touch(key)
+            if entry is not None and name in entry["aggs"]:
+                self.hits += 1
+                return entry["aggs"][name]
+            self.misses += 1
+        value = fn()  # fora do lock: pode ser caro
+        with self._lock:
+            entry = self._touch(key)
+            if entry is None:
+                entry = self._entries[key] = {"positions": None, "aggs": {}, "bytes": 0}
+            if name not in entry["aggs"]:
+                entry["aggs"][name] = value
+                self._add_bytes(entry, _sizeof(value))
+        return value
+
+    def stats(self):
+        """Contadores para diagnóstico."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def get_filter_cache():
+    """Instância única (por processo) do cache de filtros."""
+    return FilterCache()
+
+
+def filtered_aggregate(name, fn):
+    """
+    Agregado compartilhado para o estado de filtros atual da sessão (definido
+    pelo último sidebar_filters). 'name' deve identificar o cálculo e suas
+    colunas, p.ex. "sum:city:total_net_sales".
+    """
+    key = st.session_state.get("FILTER_KEY")
+    with span(f"aggregate.{name}"):
+        if key is None:
+            return fn()
+        return get_filter_cache().aggregate(key, name, fn)
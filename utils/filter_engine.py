@@ -0,0 +1,127 @@
+# utils/filter_engine.py — motor de filtros por bitmaps (usado pelo sidebar_filters)
+# ---------------------------------------------------------------------------------
+# Em vez de copiar o DataFrame e aplicar máscaras booleanas em sequência (cada
+# uma materializando um novo DataFrame), o índice é montado UMA vez por dataset:
+# - dimensões (category, sub_category, segment, country): um bitmap compactado
+#   (np.packbits) por valor; seleção = OR dos bitmaps, filtros = AND entre si
+# - datas e faixas numéricas: ordem de classificação (argsort) + searchsorted,
+#   então uma faixa vira um bitmap sem varrer a coluna
+# As linhas só são materializadas no final (df.take das posições).
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from utils.dates import month_codes_from_labels
+
+DIM_COLS = ("category", "sub_category", "segment", "country")
+RANGE_COLS = ("order_date", "month_code", "sales", "profit", "total_cost", "total_gross_sales", "discount")
+
+
+class FilterIndex:
+    """
+    Índice de filtros de um DataFrame (somente leitura; posições = ordem das linhas).
+    'key' identifica as linhas indexadas (p.ex. a versão do dataset); sem ela,
+    cada índice recebe uma identidade própria.
+    """
+
+    def __init__(self, df, dims=DIM_COLS, ranges=RANGE_COLS, key=None):
+        self.n = len(df)
+        self.key = key if key is not None else uuid.uuid4().hex
+        self.codes = {}      # col -> códigos inteiros por linha (-1 = ausente)
+        self.labels = {}     # col -> rótulos ordenados (código -> valor)
+        self.bitmaps = {}    # col -> lista de bitmaps compactados (um por código)
+        self.sorted = {}     # col -> (ordem das linhas, valores ordenados)
+
+        for c in dims:
+            if c not in df.columns:
+                continue
+            s = df[c]
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                codes, labels = s.cat.codes.to_numpy(), s.cat.categories
+            else:
+                codes, labels = pd.factorize(s, sort=True)
+            self.codes[c] = np.asarray(codes)
+            self.labels[c] = list(labels)
+            self.bitmaps[c] = [np.packbits(self.codes[c] == k) for k in range(len(labels))]
+
+        for c in ranges:
+            if c not in df.columns:
+                if c == "month_code" and "month_year" in df.columns:
+                    s = pd.Series(month_codes_from_labels(df["month_year"]), index=df.index)
+                else:
+                    continue
+            else:
+                s = df[c]
+            if not (pd.api.types.is_numeric_dtype(s) or pd.api.types.is_datetime64_any_dtype(s)):
+                continue
+            vals = s.to_numpy()
+            order = np.argsort(vals, kind="stable")
+            self.sorted[c] = (order, vals[order])
+
+    # ---------------------------
+    # Bitmaps
+    # ---------------------------
+    def all(self):
+        """Bitmap com todas as linhas."""
+        return np.packbits(np.ones(self.n, dtype=bool))
+
+    def to_bool(self, bitmap):
+        """Bitmap compactado -> máscara booleana por linha."""
+        return np.unpackbits(bitmap, count=self.n).view(bool)
+
+    def dim_bitmap(self, col, values):
+        """Linhas cujo 'col' está em 'values' (OR dos bitmaps de cada valor)."""
+        pos = {v: i for i, v in enumerate(self.labels[col])}
+        out = np.zeros((self.n + 7) // 8, dtype=np.uint8)
+        for v in values:
+            k = pos.get(v)
+            if k is not None:
+                out |= self.bitmaps[col][k]
+        return out
+
+    def range_bitmap(self, col, lo, hi):
+        """Linhas com lo <= col <= hi (busca binária na ordem pré-calculada)."""
+        order, svals = self.sorted[col]
+        if svals.dtype.kind == "M":
+            lo, hi = pd.Timestamp(lo).to_datetime64(), pd.Timestamp(hi).to_datetime64()
+        i = np.searchsorted(svals, lo, side="left")
+        j = np.searchsorted(svals, hi, side="right")
+        m = np.zeros(self.n, dtype=bool)
+        m[order[i:j]] = True
+        return np.packbits(m)
+
+    # ---------------------------
+    # Consultas sob uma máscara (para montar os widgets em cascata)
+    # ---------------------------
+    def options(self, col, bitmap):
+        """Valores de 'col' presentes nas linhas do bitmap (ordenados)."""
+        present = np.unique(self.codes[col][self.to_bool(bitmap)])
+        labels = self.labels[col]
+        return [labels[k] for k in present if k >= 0]
+
+    def min_max(self, col, bitmap):
+        """(min, max) de 'col' nas linhas do bitmap; (None, None) se vazio."""
+        order, svals = self.sorted[col]
+        m = self.to_bool(bitmap)[order]
+        if not m.any():
+            return None, None
+        # valores já estão ordenados: 1º e último True são o min e o max
+        return svals[np.argmax(m)], svals[len(m) - 1 - np.argmax(m[::-1])]
+
+    def histogram(self, col, edges, bitmap=None):
+        """
+        Contagens por bin (limites 'edges', último bin fechado) das linhas do
+        bitmap (todas, se None): busca binária dos limites na ordem pré-calculada.
+        """
+        order, svals = self.sorted[col]
+        cuts = np.searchsorted(svals, edges, side="left")
+        cuts[-1] = np.searchsorted(svals, edges[-1], side="right")
+        if bitmap is None:
+            return np.diff(cuts)
+        cum = np.concatenate([[0], np.cumsum(self.to_bool(bitmap)[order])])
+        return np.diff(cum[cuts])
+
+    def positions(self, bitmap):
+        """Posições (inteiras) das linhas selecionadas."""
+        return np.flatnonzero(self.to_bool(bitmap))
@@ -0,0 +1,59 @@
+# utils/histograms.py — histogramas calculados no servidor
+# --------------------------------------------------------
+# Em vez de mandar a coluna inteira ao Plotly (px.histogram agrupa no
+# navegador), os limites dos bins são fixados no pré-processamento (faixa
+# min–max de cada coluna, gravada no manifesto) e as contagens saem do índice
+# de filtros (valores já ordenados + bitmap das linhas filtradas). O gráfico
+# recebe O(bins) números, não O(linhas).
+import numpy as np
+
+# colunas com histograma e nº de bins
+HIST_COLS = ("discount", "total_cost")
+HIST_BINS = 40
+
+
+def update_ranges(ranges, df, cols=HIST_COLS):
+    """Atualiza (in-place) {col: [min, max]} com os valores de um bloco."""
+    for c in cols:
+        if c not in df.columns or df.empty:
+            continue
+        lo, hi = float(df[c].min()), float(df[c].max())
+        if np.isnan(lo):
+            continue
+        if c in ranges:
+            lo, hi = min(lo, ranges[c][0]), max(hi, ranges[c][1])
+        ranges[c] = [lo, hi]
+    return ranges
+
+
+def merge_ranges(parts):
+    """Une faixas {col: [min, max]} parciais (blocos/partições) numa só."""
+    out = {}
+    for ranges in parts:
+        for c, (lo, hi) in (ranges or {}).items():
+            out[c] = [min(lo, out[c][0]), max(hi, out[c][1])] if c in out else [lo, hi]
+    return out
+
+
+def ranges_from_edges(edges):
+    """Faixas {col: [min, max]} a partir de limites já gravados (modo incremental)."""
+    return {c: [e[0], e[-1]] for c, e in (edges or {}).items()}
+
+
+def bin_edges(ranges, bins=HIST_BINS):
+    """Limites dos bins {col: [b0, ..., bn]} (iguais aos de np.histogram na faixa)."""
+    return {c: np.linspace(lo, hi if hi > lo else lo + 1.0, bins + 1).tolist()
+            for c, (lo, hi) in ranges.items()}
+
+
+def histogram_counts(df, col, edges, index=None, bitmap=None):
+    """
+    Contagens por bin de 'col' (último bin fechado, como np.histogram). Com o
+    índice de filtros (utils/filter_engine.py) e o bitmap das linhas filtradas,
+    usa os valores pré-ordenados; senão, np.histogram nas linhas de df.
+    """
+    edges = np.asarray(edges, dtype="float64")
+    if index is not None and col in index.sorted:
+        return index.histogram(col, edges, bitmap)
+    values = df[col].to_numpy(dtype="float64", na_value=np.nan)
+    return np.histogram(values[~np.isnan(values)], bins=edges)[0]
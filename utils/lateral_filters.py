@@ -1,26 +1,98 @@
 # utils/lateral_filters.py — filtros da barra lateral (período como slider)
 # -----------------------------------------------------------------------
+# Os filtros são avaliados sobre um índice de bitmaps (utils/filter_engine.py),
+# montado uma vez por dataset; o DataFrame filtrado é materializado uma única vez.
+# As posições filtradas ficam num cache por processo (utils/filter_cache.py),
+# chaveado pelo estado dos filtros e pelo índice — compartilhado entre páginas e sessões.
 import streamlit as st
 import pandas as pd
-from utils.aux_functions import range_from_series, unique_sorted
+from utils.filter_engine import FilterIndex
+from utils.filter_cache import get_filter_cache, state_key
+from utils.perf import span, timed
 
-def sidebar_filters(df):
+# colunas que os filtros podem usar (as páginas leem estas + as suas)
+FILTER_COLUMNS = (
+    "order_date", "month_year", "month_code", "category", "sub_category", "segment", "country",
+    "sales", "profit", "total_cost", "total_gross_sales",
+)
+
+# multiselects (coluna, rótulo) e faixas numéricas (coluna, rótulo), na ordem da barra lateral
+DIM_FILTERS = (
+    ("category", "Category"),
+    ("sub_category", "Sub-Category"),
+    ("segment", "Segment"),
+    ("country", "Country"),
+)
+RANGE_FILTERS = (
+    ("sales", "Sales (faixa)"),
+    ("profit", "Profit (faixa)"),
+    ("total_cost", "Total Cost (faixa)"),
+    ("total_gross_sales", "Total Gross Sales (faixa)"),
+)
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+@timed("filter_engine.build_index")
+def _build_index(_df, key):
+    # o DataFrame fica junto do índice: enquanto a entrada existir, id(df) não é reaproveitado
+    return _df, FilterIndex(_df, key=key)
+
+def get_filter_index(df):
+    """
+    Índice de filtros de um DataFrame avulso (as páginas usam o índice do
+    dataset compartilhado, utils/dataset.py; este é o fallback). A chave é a
+    identidade do DataFrame (id + colunas + nº de linhas), não só o tamanho.
+    """
+    key = ("frame", st.session_state.get("DATA_VERSION"), id(df), tuple(df.columns), len(df))
+    return _build_index(df, key)[1]
+
+def get_filter_state():
+    """
+    Estado dos filtros aplicados no último sidebar_filters desta sessão:
+      {'date': {...} | None, 'dims': {col: [valores] | None}, 'ranges': {col: (lo, hi) | None}}
+    None em 'dims'/'ranges' = filtro sem efeito (tudo selecionado / faixa completa).
+    """
+    return st.session_state.get("FILTER_STATE")
+
+def get_filter_bitmap():
+    """Bitmap (filter_engine) das linhas filtradas nesta sessão; None = todas as linhas."""
+    return st.session_state.get("FILTER_BITMAP")
+
+def is_unfiltered(state):
+    """True se nenhum filtro do estado restringe linhas (período completo, tudo selecionado)."""
+    if state is None:
+        return True
+    date = state.get("date")
+    if date and not date.get("full"):
+        return False
+    return all(v is None for v in state.get("dims", {}).values()) and \
+        all(v is None for v in state.get("ranges", {}).values())
+
+@timed("filters.sidebar")
+def sidebar_filters(df, index=None):
     """
     Desenha filtros na barra lateral e devolve o DataFrame filtrado.
+    'index' = FilterIndex já montado para as linhas de df (mesma ordem); se
+    omitido, usa get_filter_index(df).
     Período é slider:
       - Se existir 'order_date' (datetime) -> slider de datas
       - Senão, se existir 'month_year' (YYYY-MM) -> slider com 1º dia do mês
+    O estado resultante fica em st.session_state["FILTER_STATE"] (ver get_filter_state)
+    e sua chave canônica em st.session_state["FILTER_KEY"] (ver filter_cache).
     """
     st.sidebar.markdown("### 🔎 Filtros")
 
-    df_filtered = df.copy()
+    idx = index if index is not None else get_filter_index(df)
+    if idx.n != len(df):
+        raise ValueError(f"index tem {idx.n:,} linhas; df tem {len(df):,}")
+    mask = idx.all()
+    active = False  # algum filtro restringiu linhas?
+    state = {"date": None, "dims": {}, "ranges": {}}
 
     # =========================
     # Período (slider)
     # =========================
-    if "order_date" in df_filtered.columns and pd.api.types.is_datetime64_any_dtype(df_filtered["order_date"]):
-        min_d = pd.to_datetime(df_filtered["order_date"].min())
-        max_d = pd.to_datetime(df_filtered["order_date"].max())
+    if "order_date" in idx.sorted and pd.api.types.is_datetime64_any_dtype(df["order_date"]):
+        min_d, max_d = (pd.to_datetime(v) for v in idx.min_max("order_date", mask))
         if pd.notna(min_d) and pd.notna(max_d) and min_d <= max_d:
             start_date, end_date = st.sidebar.slider(
                 "Período (Order Date)",
@@ -30,95 +102,85 @@ def sidebar_filters(df):
             )
             start_date = pd.to_datetime(start_date)
             end_date = pd.to_datetime(end_date)
-            df_filtered = df_filtered[(df_filtered["order_date"] >= start_date) & (df_filtered["order_date"] <= end_date)]
+            full = start_date <= min_d and end_date >= max_d
+            state["date"] = {
+                "col": "order_date", "start": start_date, "end": end_date,
+                "start_is_min": start_date <= min_d, "end_is_max": end_date >= max_d,
+                "full": full,
+            }
+            if not full:
+                mask &= idx.range_bitmap("order_date", start_date, end_date)
+                active = True
 
-    elif "month_year" in df_filtered.columns:
-        try:
-            period_idx = pd.PeriodIndex(df_filtered["month_year"], freq="M")
-            month_start = period_idx.to_timestamp(how="start")
-            df_filtered["_month_start_tmp"] = month_start
-
-            min_m = month_start.min()
-            max_m = month_start.max()
-            if pd.notna(min_m) and pd.notna(max_m) and min_m <= max_m:
-                start_m, end_m = st.sidebar.slider(
-                    "Período (Month-Year)",
-                    min_value=min_m.to_pydatetime(),
-                    max_value=max_m.to_pydatetime(),
-                    value=(min_m.to_pydatetime(), max_m.to_pydatetime()),
-                )
-                start_p = pd.Period(pd.to_datetime(start_m), freq="M")
-                end_p = pd.Period(pd.to_datetime(end_m), freq="M")
-                cur_p = pd.PeriodIndex(df_filtered["month_year"], freq="M")
-                mask = (cur_p >= start_p) & (cur_p <= end_p)
-                df_filtered = df_filtered.loc[mask].copy()
-        except Exception:
-            pass
-        finally:
-            if "_month_start_tmp" in df_filtered.columns:
-                df_filtered.drop(columns=["_month_start_tmp"], inplace=True, errors="ignore")
+    elif "month_code" in idx.sorted:
+        lo, hi = idx.min_max("month_code", mask)
+        if lo is not None:
+            min_m = pd.Timestamp(year=int(lo) // 12, month=int(lo) % 12 + 1, day=1)
+            max_m = pd.Timestamp(year=int(hi) // 12, month=int(hi) % 12 + 1, day=1)
+            start_m, end_m = st.sidebar.slider(
+                "Período (Month-Year)",
+                min_value=min_m.to_pydatetime(),
+                max_value=max_m.to_pydatetime(),
+                value=(min_m.to_pydatetime(), max_m.to_pydatetime()),
+            )
+            start_m, end_m = pd.to_datetime(start_m), pd.to_datetime(end_m)
+            full = start_m <= min_m and end_m >= max_m
+            state["date"] = {
+                "col": "month_year", "monthly": True,
+                "start": start_m, "end": end_m, "full": full,
+            }
+            if not full:
+                mask &= idx.range_bitmap("month_code",
+                                         start_m.year * 12 + start_m.month - 1,
+                                         end_m.year * 12 + end_m.month - 1)
+                active = True
 
     # =========================
     # Dimensões de negócio
     # =========================
-    if "category" in df_filtered.columns:
-        opts = unique_sorted(df_filtered["category"])
-        if opts:
-            sel = st.sidebar.multiselect("Category", opts, default=opts)
-            if sel:
-                df_filtered = df_filtered[df_filtered["category"].isin(sel)]
-
-    if "sub_category" in df_filtered.columns:
-        opts = unique_sorted(df_filtered["sub_category"])
-        if opts:
-            sel = st.sidebar.multiselect("Sub-Category", opts, default=opts)
-            if sel:
-                df_filtered = df_filtered[df_filtered["sub_category"].isin(sel)]
-
-    if "segment" in df_filtered.columns:
-        opts = unique_sorted(df_filtered["segment"])
-        if opts:
-            sel = st.sidebar.multiselect("Segment", opts, default=opts)
-            if sel:
-                df_filtered = df_filtered[df_filtered["segment"].isin(sel)]
-
-    if "country" in df_filtered.columns:
-        opts = unique_sorted(df_filtered["country"])
+    for col, label in DIM_FILTERS:
+        if col not in idx.codes:
+            continue
+        opts = idx.options(col, mask)
         if opts:
-            sel = st.sidebar.multiselect("Country", opts, default=opts)
-            if sel:
-                df_filtered = df_filtered[df_filtered["country"].isin(sel)]
+            sel = st.sidebar.multiselect(label, opts, default=opts)
+            state["dims"][col] = list(sel) if sel and len(sel) < len(opts) else None
+            if state["dims"][col] is not None:
+                mask &= idx.dim_bitmap(col, sel)
+                active = True
 
     # =========================
     # Faixas numéricas
     # =========================
-    if "sales" in df_filtered.columns:
-        vmin, vmax = range_from_series(df_filtered["sales"])
-        if vmin < vmax:
-            sel = st.sidebar.slider("Sales (faixa)", min_value=float(vmin), max_value=float(vmax),
-                                    value=(float(vmin), float(vmax)))
-            df_filtered = df_filtered[(df_filtered["sales"] >= sel[0]) & (df_filtered["sales"] <= sel[1])]
-
-    if "profit" in df_filtered.columns:
-        vmin, vmax = range_from_series(df_filtered["profit"])
-        if vmin < vmax:
-            sel = st.sidebar.slider("Profit (faixa)", min_value=float(vmin), max_value=float(vmax),
-                                    value=(float(vmin), float(vmax)))
-            df_filtered = df_filtered[(df_filtered["profit"] >= sel[0]) & (df_filtered["profit"] <= sel[1])]
-
-    if "total_cost" in df_filtered.columns:
-        vmin, vmax = range_from_series(df_filtered["total_cost"])
-        if vmin < vmax:
-            sel = st.sidebar.slider("Total Cost (faixa)", min_value=float(vmin), max_value=float(vmax),
-                                    value=(float(vmin), float(vmax)))
-            df_filtered = df_filtered[(df_filtered["total_cost"] >= sel[0]) & (df_filtered["total_cost"] <= sel[1])]
+    for col, label in RANGE_FILTERS:
+        if col not in idx.sorted:
+            continue
+        vmin, vmax = idx.min_max(col, mask)
+        if vmin is not None and vmin < vmax:
+            vmin, vmax = float(vmin), float(vmax)
+            sel = st.sidebar.slider(label, min_value=vmin, max_value=vmax, value=(vmin, vmax))
+            state["ranges"][col] = None if (sel[0] <= vmin and sel[1] >= vmax) else tuple(sel)
+            if state["ranges"][col] is not None:
+                mask &= idx.range_bitmap(col, sel[0], sel[1])
+                active = True
 
-    if "total_gross_sales" in df_filtered.columns:
-        vmin, vmax = range_from_series(df_filtered["total_gross_sales"])
-        if vmin < vmax:
-            sel = st.sidebar.slider("Total Gross Sales (faixa)", min_value=float(vmin), max_value=float(vmax),
-                                    value=(float(vmin), float(vmax)))
-            df_filtered = df_filtered[(df_filtered["total_gross_sales"] >= sel[0]) & (df_filtered["total_gross_sales"] <= sel[1])]
+    # materializa as linhas uma única vez (posições reaproveitadas do cache, se houver)
+    # as posições valem para as linhas deste índice: a identidade dele entra na chave
+    key = state_key(st.session_state.get("DATA_VERSION"), state, idx.key)
+    if active:
+        with span("filters.materialize", rows_in=len(df)) as s:
+            cache = get_filter_cache()
+            positions = cache.get_positions(key)
+            if positions is None:
+                positions = idx.positions(mask)
+                cache.put_positions(key, positions)
+            df_filtered = df.take(positions)
+            s.rows_out = len(df_filtered)
+    else:
+        df_filtered = df
 
+    st.session_state["FILTER_STATE"] = state
+    st.session_state["FILTER_KEY"] = key
+    st.session_state["FILTER_BITMAP"] = mask if active else None
     st.sidebar.caption(f"Linhas após filtros: {len(df_filtered):,}")
     return df_filtered
@@ -4,6 +4,8 @@
 import streamlit as st
 from pathlib import Path
 
+from utils.perf import enabled as perf_enabled
+
 def build_navigation(project_root):
     pages_dir = Path(project_root) / "pages"
 
@@ -34,8 +36,17 @@ def build_navigation(project_root):
         icon="📚",
     )
 
-    nav = st.navigation({
+    sections = {
         "Dashboard": [home, sales, clients, products],
         "Ajuda": [data_dict],
-    })
+    }
+    # página oculta: só aparece com a instrumentação ligada (DASHBOARD_PERF, ver utils/perf.py)
+    if perf_enabled():
+        sections["Diagnóstico"] = [st.Page(
+            str(pages_dir / "6_performance.py"),
+            title="Performance",
+            icon="⏱️",
+        )]
+
+    nav = st.navigation(sections)
     return nav
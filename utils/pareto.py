@@ -0,0 +1,87 @@
+# utils/pareto.py — motor de Pareto / ABC vetorizado
+# --------------------------------------------------
+# Uma única passada sobre as linhas (topk.group_sums: np.bincount nos códigos
+# da chave) soma TODAS as métricas pedidas; para cada métrica a ordenação, a
+# participação e o acumulado ficam em arrays. A classe ABC sai de um np.searchsorted nos
+# limites (sem .apply linha a linha). Com o resultado em cache por estado de
+# filtros (filter_cache.filtered_aggregate), Top-N e grupos ABC só fatiam arrays.
+import numpy as np
+import pandas as pd
+
+from utils.topk import group_sums
+
+# Limites ABC (acumulado): A ≤ 80%, B ≤ 95%, C > 95%
+ABC_THRESHOLDS = (0.80, 0.95)
+ABC_LABELS = ("A", "B", "C")
+
+# Métricas candidatas ao Pareto (as ausentes no DataFrame são ignoradas)
+PARETO_METRICS = ("total_net_sales", "sales", "profit", "quantity")
+
+
+def abc_classes(cum_share, thresholds=ABC_THRESHOLDS, labels=ABC_LABELS):
+    """Classe ABC de cada acumulado (vetorizado; acumulado ≤ limite entra na classe)."""
+    k = np.searchsorted(np.asarray(thresholds, dtype=float), np.asarray(cum_share, dtype=float), side="left")
+    return np.asarray(labels, dtype=object)[k]
+
+
+class Pareto:
+    """Pareto completo de uma métrica (ordem decrescente; somente leitura)."""
+
+    def __init__(self, key_col, value_col, keys, values):
+        order = np.argsort(-values, kind="stable")
+        self.key_col = key_col
+        self.value_col = value_col
+        self.keys = keys[order]
+        self.values = values[order]
+        self.total = float(self.values.sum())
+        if self.total == 0:
+            self.share = np.zeros(len(self.values))
+            self.cum_share = np.zeros(len(self.values))
+        else:
+            self.share = self.values / self.total
+            self.cum_share = np.cumsum(self.share)
+        self._abc = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self):
+        """Bytes dos arrays (para o limite de memória do filter_cache)."""
+        return int(self.keys.nbytes + self.values.nbytes + self.share.nbytes + self.cum_share.nbytes)
+
+    def abc(self, thresholds=ABC_THRESHOLDS):
+        """Classes ABC (memorizadas por conjunto de limites)."""
+        thresholds = tuple(thresholds)
+        if thresholds not in self._abc:
+            self._abc[thresholds] = abc_classes(self.cum_share, thresholds)
+        return self._abc[thresholds]
+
+    def frame(self, top_n=None, groups=None, thresholds=ABC_THRESHOLDS):
+        """
+        DataFrame dos Top-N (ordem decrescente) com share, cum_share e abc,
+        opcionalmente restrito aos grupos ABC em 'groups'. Só fatia os arrays.
+        """
+        n = len(self) if top_n is None else max(0, min(int(top_n), len(self)))
+        abc = self.abc(thresholds)[:n]
+        sel = slice(0, n)
+        if groups:
+            sel = np.flatnonzero(np.isin(abc, list(groups)))
+            abc = abc[sel]
+        return pd.DataFrame({
+            self.key_col: self.keys[sel],
+            self.value_col: self.values[sel],
+            "share": self.share[sel],
+            "cum_share": self.cum_share[sel],
+            "abc": abc,
+        })
+
+
+def build_paretos(df, key_col, value_cols=PARETO_METRICS):
+    """
+    Pareto por 'key_col' para cada métrica de 'value_cols' presente em df.
+    Retorna {métrica: Pareto}. Chaves sem linhas (categorias não observadas)
+    ficam de fora, como no groupby(observed=True).
+    """
+    keys, sums = group_sums(df, key_col, value_cols)
+    return {c: Pareto(key_col, c, keys, v) for c, v in sums.items()}
@@ -0,0 +1,191 @@
+# utils/perf.py — instrumentação leve (spans de tempo/linhas/memória por etapa)
+# ----------------------------------------------------------------------------
+# Cada etapa instrumentada (pré-processamento, filtros, agregados, figuras,
+# seções das páginas) abre um span: duração, linhas de entrada/saída e — no
+# modo "mem" — bytes alocados (pico do tracemalloc acima do início do span).
+# Os spans vão para um armazenamento circular em memória (por processo), lido
+# pela página oculta "Performance" (pages/6_performance.py), com p50/p95 por etapa.
+#
+# Opt-in pela variável de ambiente DASHBOARD_PERF:
+#   DASHBOARD_PERF=1    -> tempo + linhas (custo ~µs por span)
+#   DASHBOARD_PERF=mem  -> + bytes alocados (tracemalloc: deixa tudo mais lento)
+# Desligado (padrão), span() e timed() não registram nada.
+import functools
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # pré-processamento fora do app
+    get_script_run_ctx = None
+
+PERF_ENV = "DASHBOARD_PERF"
+PERF_MAX_SPANS = 5000
+
+_MODE = os.environ.get(PERF_ENV, "").strip().lower()
+_ENABLED = _MODE not in ("", "0", "false", "no", "off")
+_TRACE_MEMORY = _MODE == "mem"
+
+# spans abertos na thread atual (cada sessão do Streamlit roda na sua thread)
+_local = threading.local()
+
+
+def enabled():
+    """A instrumentação está ligada (DASHBOARD_PERF)?"""
+    return _ENABLED
+
+
+def traces_memory():
+    """Os spans medem bytes alocados (DASHBOARD_PERF=mem)?"""
+    return _ENABLED and _TRACE_MEMORY
+
+
+class SpanStore:
+    """Armazenamento circular (últimos 'max_spans') e thread-safe dos spans concluídos."""
+
+    def __init__(self, max_spans=PERF_MAX_SPANS):
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self._spans.append(record)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    def frame(self):
+        """Spans guardados (mais antigos primeiro) como DataFrame."""
+        with self._lock:
+            records = list(self._spans)
+        df = pd.DataFrame.from_records(records, columns=[
+            "name", "parent", "start", "ms", "rows_in", "rows_out", "alloc_bytes", "session",
+        ])
+        for c in ("rows_in", "rows_out", "alloc_bytes"):
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype("float64")  # None -> NaN
+        return df
+
+    def summary(self):
+        """Resumo por etapa de todos os spans guardados (ver summarize)."""
+        return summarize(self.frame())
+
+
+def summarize(df):
+    """Por etapa: nº de spans, p50/p95/máx (ms), linhas médias e alocação média (MiB)."""
+    if df.empty:
+        return pd.DataFrame(columns=["name", "spans", "p50_ms", "p95_ms", "max_ms", "total_ms",
+                                     "rows_in", "rows_out", "alloc_mb"])
+    g = df.groupby("name", sort=False)
+    out = pd.DataFrame({
+        "spans": g.size(),
+        "p50_ms": g["ms"].median(),
+        "p95_ms": g["ms"].quantile(0.95),
+        "max_ms": g["ms"].max(),
+        "total_ms": g["ms"].sum(),
+        "rows_in": g["rows_in"].mean(),
+        "rows_out": g["rows_out"].mean(),
+        "alloc_mb": g["alloc_bytes"].mean() / 2**20,
+    })
+    return out.sort_values("p95_ms", ascending=False).reset_index()
+
+
+_STORE = SpanStore()
+
+
+def get_store():
+    """Armazenamento de spans do processo."""
+    return _STORE
+
+
+def session_id():
+    """Id da sessão do Streamlit que está executando (None fora do app)."""
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    return ctx.session_id if ctx is not None else None
+
+
+class span:
+    """
+    Context manager de um span:
+        with span("filters.sidebar", rows_in=len(df)) as s:
+            ...
+            s.rows_out = len(out)
+    """
+
+    __slots__ = ("name", "rows_in", "rows_out", "_t0", "_mem0", "_peak", "_parent")
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+
+    def __enter__(self):
+        if not _ENABLED:
+            return self
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self._parent = stack[-1].name if stack else None
+        self._mem0 = None
+        if _TRACE_MEMORY:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            cur, peak = tracemalloc.get_traced_memory()
+            if stack:  # guarda o pico visto até aqui pelo span de fora antes de zerar
+                stack[-1]._peak = max(stack[-1]._peak, peak)
+            tracemalloc.reset_peak()
+            self._mem0, self._peak = cur, cur
+        stack.append(self)
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not _ENABLED:
+            return False
+        ms = (time.perf_counter() - self._t0) * 1000.0
+        stack = _local.stack
+        stack.pop()
+        alloc = None
+        if self._mem0 is not None:
+            peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            alloc = max(0, peak - self._mem0)
+            if stack:
+                stack[-1]._peak = max(stack[-1]._peak, peak)
+        _STORE.add({
+            "name": self.name, "parent": self._parent, "start": time.time() - ms / 1000.0, "ms": ms,
+            "rows_in": self.rows_in, "rows_out": self.rows_out, "alloc_bytes": alloc,
+            "session": session_id(),
+        })
+        return False
+
+
+def _rows(obj):
+    """Nº de linhas de um DataFrame/Series/ndarray (None para o resto)."""
+    if isinstance(obj, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(obj)
+    return None
+
+
+def timed(name):
+    """
+    Decorator: cada chamada vira um span 'name'. Linhas de entrada = do 1º
+    argumento DataFrame; de saída = do retorno, se for DataFrame/Series/array.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return fn(*args, **kwargs)
+            rows_in = next((_rows(a) for a in args if isinstance(a, pd.DataFrame)), None)
+            with span(name, rows_in=rows_in) as s:
+                out = fn(*args, **kwargs)
+                s.rows_out = _rows(out)
+            return out
+        return wrapper
+    return deco
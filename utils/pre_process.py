@@ -1,33 +1,158 @@
 # utils/pre_process.py — pré-processamento (sem Discount/Gross Sale) + month_year + snake_case
 # -------------------------------------------------------------------------------------------
 # O que este módulo faz:
-# - Lê o CSV bruto com tolerância de encoding
+# - Lê o CSV bruto com tolerância de encoding (decidido uma vez, por amostra de bytes)
 # - Converte TODOS os nomes de colunas para snake_case (minúsculas, _)
-# - Faz parse de datas (order_date e ship_date, se existirem)
+# - Faz parse de datas (order_date e ship_date, se existirem) com formato explícito,
+#   detectado uma vez por amostra, só sobre os valores distintos (ver utils/dates.py)
 # - Cria:
 #     * month_year = mês/ano (YYYY-MM) a partir de order_date
 # - Remove linhas com dados faltantes (df.dropna())
-# - Salva o CSV processado (processed.csv)
-# - Expõe helpers cacheados para o app
-import streamlit as st
+# - Salva o processado em Parquet (processed.parquet; ver utils/store.py)
+# - Processamento incremental: se o RAW só recebeu linhas novas no fim,
+#   apenas a "cauda" é lida e anexada ao processado (ver manifesto)
+# - Leitura em streaming (blocos de CHUNK_ROWS linhas): o RAW não precisa caber na RAM
+# - Multi-core opcional: o RAW é dividido em faixas de bytes (em quebras de linha),
+#   preparadas num pool de processos e concatenadas na ordem do arquivo; cubo,
+#   coorte, sketches e faixas dos histogramas parciais são somados (DASHBOARD_WORKERS / --workers)
+# - Gera o cubo mensal pré-agregado usado pelas páginas (ver utils/cube.py)
+# - Gera sketches HyperLogLog para contagens distintas aproximadas (ver utils/sketches.py)
+# - Expõe helpers cacheados para o app e um modo "só pré-gerado" (check_prebuilt/load_prebuilt)
+# - CLI para gerar os artefatos fora do app (deploy/cron):
+#     python -m utils.pre_process build [--raw ...] [--processed ...] [--workers N] [--force]
+#     python -m utils.pre_process check   (código 1 se ausentes/desatualizados)
+# O Streamlit é opcional aqui: sem ele, os helpers do app ficam sem cache.
+import argparse
+import io
+import os
+import sys
+import tempfile
+import warnings
 import pandas as pd
 import numpy as np
+import codecs
+import hashlib
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from pathlib import Path
 
+import pyarrow.parquet as pq
+
+try:
+    import streamlit as st
+except ImportError:  # CLI/job de pré-processamento sem o Streamlit instalado
+    st = None
+
+from utils.dtypes import optimize_dtypes, memory_report
+from utils.dates import DATE_COLS, date_parsers, detect_date_formats, month_year_from_dates
+from utils.app_paths import get_paths
+from utils.cube import build_cube, merge_cubes, write_cube, read_cube, cube_path
+from utils.cohort import build_activity, merge_activity, write_activity, read_activity, activity_path
+from utils.sketches import build_sketches, merge_sketches, write_sketches, read_sketches, sketch_path
+from utils.histograms import update_ranges, merge_ranges, ranges_from_edges, bin_edges, HIST_BINS
+from utils.perf import span, timed
+from utils.store import (
+    StoreWriter, write_store, read_store, append_store, read_manifest, write_manifest, manifest_path,
+)
+
+# bytes usados para identificar o início do RAW e o ponto onde paramos da última vez
+FINGERPRINT_BYTES = 1024 * 1024
+TAIL_CHECK_BYTES = 64 * 1024
+
+# linhas por bloco na leitura em streaming (limita o pico de memória)
+CHUNK_ROWS = 200_000
+# muda quando o pipeline passa a gerar colunas/arquivos diferentes: força reprocessamento completo
+PIPELINE_VERSION = 4  # 4: esquema embutido no Parquet (utils/store.py)
+
+# processos do pré-processamento (1 = tudo no processo atual; 0/auto = todos os núcleos)
+WORKERS_ENV = "DASHBOARD_WORKERS"
+# partição mínima (bytes): abaixo disso o custo de subir processos não compensa
+PARTITION_MIN_BYTES = 16 * 1024 * 1024
+
+# linhas do início do RAW usadas para detectar o formato das datas
+DATE_SAMPLE_ROWS = 10_000
+
+# amostra (bytes) usada para decidir o encoding antes de ler o arquivo
+ENCODING_SAMPLE_BYTES = 1024 * 1024
+
+# decisões de encoding já tomadas: (caminho, tamanho, mtime) -> info
+_ENCODING_CACHE = {}
+
 
 # ---------------------------
 # Utilidades internas
 # ---------------------------
-def _read_csv_robusto(path):
-    """Lê CSV tentando encodings comuns (utf-8, latin1, cp1252)."""
+def detect_encoding(path, sample_bytes=ENCODING_SAMPLE_BYTES):
+    """
+    Decide o encoding do CSV olhando só uma amostra de bytes (uma vez por arquivo):
+      - BOM UTF-8 -> 'utf-8-sig'
+      - amostra decodifica como UTF-8 -> 'utf-8'
+      - senão, decodifica como cp1252 -> 'cp1252'; caso contrário 'latin1'
+    A decisão fica em cache por (caminho, tamanho, mtime). Retorna um dict com
+    'encoding', 'reason', 'seconds' (tempo de detecção) e 'sample_bytes'.
+    """
+    p = Path(path).resolve()
+    st_ = p.stat()
+    key = (str(p), st_.st_size, st_.st_mtime_ns)
+    if key in _ENCODING_CACHE:
+        return _ENCODING_CACHE[key]
+
+    t0 = time.perf_counter()
+    with open(p, "rb") as f:
+        sample = f.read(sample_bytes)
+    truncated = len(sample) < st_.st_size
+
+    if sample.startswith(codecs.BOM_UTF8):
+        enc, reason = "utf-8-sig", "BOM UTF-8"
+    else:
+        try:
+            # final=False tolera um caractere multibyte cortado no fim da amostra
+            codecs.getincrementaldecoder("utf-8")().decode(sample, final=not truncated)
+            enc, reason = "utf-8", "amostra UTF-8 válida"
+        except UnicodeDecodeError as e:
+            try:
+                sample.decode("cp1252")
+                enc = "cp1252"
+            except UnicodeDecodeError:
+                enc = "latin1"
+            reason = "byte inválido p/ UTF-8 na posição {}".format(e.start)
+
+    info = {
+        "encoding": enc,
+        "reason": reason,
+        "seconds": round(time.perf_counter() - t0, 6),
+        "sample_bytes": len(sample),
+        "path": str(p),
+    }
+    _ENCODING_CACHE[key] = info
+    return info
+
+
+def encoding_stats():
+    """Decisões de encoding tomadas neste processo (para diagnóstico)."""
+    return list(_ENCODING_CACHE.values())
+
+
+def _encoding_attempts(path):
+    """
+    Encoding detectado + latin1 como rede de segurança: um byte inválido
+    depois da amostra custa no máximo uma releitura (latin1 nunca falha).
+    """
+    enc = detect_encoding(path)["encoding"]
+    return [enc] if enc == "latin1" else [enc, "latin1"]
+
+
+def _read_csv_robusto(path, **kwargs):
+    """Lê CSV com o encoding detectado por amostra (ver detect_encoding)."""
     p = Path(path)
-    for enc in ("utf-8", "latin1", "cp1252"):
+    attempts = _encoding_attempts(p)
+    for enc in attempts[:-1]:
         try:
-            return pd.read_csv(p, encoding=enc)
-        except Exception:
+            return pd.read_csv(p, encoding=enc, **kwargs)
+        except UnicodeDecodeError:
             continue
-    return pd.read_csv(p)
+    return pd.read_csv(p, encoding=attempts[-1], **kwargs)
 
 def _to_snake_case(name):
     """Converte um nome de coluna para snake_case (minúsculas com underscore)."""
@@ -38,54 +163,474 @@ def _to_snake_case(name):
     s = re.sub(r"_+", "_", s)            # múltiplos "_" -> um só
     return s.strip("_")
 
+def _hash_range(path, start, length):
+    """SHA-1 de um trecho do arquivo (start, length)."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        f.seek(max(0, start))
+        h.update(f.read(max(0, length)))
+    return h.hexdigest()
+
+def raw_fingerprint(raw_path):
+    """
+    Impressão digital barata do RAW: tamanho, mtime, hash do 1º MiB,
+    hash dos últimos 64 KiB e se termina em quebra de linha.
+    """
+    p = Path(raw_path)
+    st_ = p.stat()
+    size = st_.st_size
+    tail_start = max(0, size - TAIL_CHECK_BYTES)
+    with open(p, "rb") as f:
+        f.seek(max(0, size - 1))
+        last = f.read(1)
+    return {
+        "size": size,
+        "mtime_ns": st_.st_mtime_ns,
+        "head_hash": _hash_range(p, 0, min(size, FINGERPRINT_BYTES)),
+        "tail_hash": _hash_range(p, tail_start, size - tail_start),
+        "ends_with_newline": last in (b"\n", b"\r"),
+    }
+
+
+def default_workers():
+    """
+    Nº de processos do pré-processamento (DASHBOARD_WORKERS; padrão 1, '0'/'auto'
+    = todos os núcleos). Valor inválido -> 1, com aviso.
+    """
+    value = os.environ.get(WORKERS_ENV, "").strip().lower()
+    if value in ("", "1"):
+        return 1
+    if value in ("0", "auto"):
+        return os.cpu_count() or 1
+    try:
+        n = int(value)
+    except ValueError:
+        warnings.warn("{}={!r} não é um número de processos; usando 1.".format(WORKERS_ENV, value))
+        return 1
+    return max(1, n)
+
+
+def _data_start(raw_path):
+    """Byte onde começam os dados (logo após a linha de cabeçalho)."""
+    with open(raw_path, "rb") as f:
+        f.readline()
+        return f.tell()
+
+
+def partition_ranges(raw_path, start, parts, min_bytes=None):
+    """
+    Divide o RAW a partir do byte 'start' em até 'parts' faixas (início, fim)
+    de tamanho parecido, cada uma começando logo após uma quebra de linha.
+    Faixas menores que 'min_bytes' (padrão PARTITION_MIN_BYTES) não são criadas
+    (arquivo pequeno = 1 faixa).
+    Supõe um registro por linha (sem quebras dentro de campos entre aspas).
+    """
+    size = Path(raw_path).stat().st_size
+    min_bytes = PARTITION_MIN_BYTES if min_bytes is None else min_bytes
+    parts = max(1, min(int(parts), (size - start) // max(1, min_bytes)))
+    bounds = [start]
+    with open(raw_path, "rb") as f:
+        for i in range(1, parts):
+            pos = start + (size - start) * i // parts
+            f.seek(max(bounds[-1], pos - 1))
+            f.readline()  # avança até o início da próxima linha
+            if bounds[-1] < f.tell() < size:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+class _ByteRange(io.RawIOBase):
+    """Leitura de no máximo 'length' bytes de um arquivo já posicionado (uma partição do RAW)."""
+
+    def __init__(self, f, length):
+        self._f = f
+        self._left = length
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), self._left)
+        if n <= 0:
+            return 0
+        got = self._f.readinto(memoryview(b)[:n])
+        self._left -= got
+        return got
+
 
 # ---------------------------
 # Pipeline principal
 # ---------------------------
-def load_and_prepare(raw_path, processed_path=None):
+def sniff_date_formats(raw_path, nrows=DATE_SAMPLE_ROWS):
+    """Formatos das colunas de data ({col: formato | None}) por amostra do início do RAW."""
+    sample = _read_csv_robusto(raw_path, nrows=nrows, dtype=str)
+    sample.columns = [_to_snake_case(c) for c in sample.columns]
+    return detect_date_formats(sample)
+
+
+def _prepare(df, parsers=None):
     """
-    Lê o CSV bruto e aplica transformações essenciais:
+    Transformações essenciais sobre um DataFrame bruto (já lido):
       1) Renomeia colunas para snake_case
       2) Parse de datas: order_date / ship_date (se existirem)
-      3) total_cost = sales - profit
-      4) month_year = YYYY-MM derivado de order_date
-      5) Remove linhas com qualquer dado faltante
-      6) (Opcional) salva em processed_path
+      3) month_year = YYYY-MM derivado de order_date
+      4) Remove linhas com qualquer dado faltante
+    'parsers' = {col: DateParser} reaproveitados entre blocos (utils/dates.py);
+    se omitido, o formato é detectado no próprio df.
     """
-    df = _read_csv_robusto(raw_path)
-
     # 1) Colunas em snake_case
     df.columns = [_to_snake_case(c) for c in df.columns]
 
-    # 2) Parse de datas (se existirem)
-    for col in ("order_date", "ship_date"):
+    # 2) Parse de datas (se existirem): formato explícito, só valores distintos
+    if parsers is None:
+        parsers = date_parsers(detect_date_formats(df))
+    for col in DATE_COLS:
         if col in df.columns:
-            try:
-                df[col] = pd.to_datetime(df[col])
-            except Exception:
-                pass
+            df[col] = parsers[col](df[col])
 
-    # 3) Cria a coluna month_year
-    df["month_year"] = df["order_date"].dt.to_period("M").astype(str)
+    # 3) Cria a coluna month_year (rótulos só dos meses distintos)
+    df["month_year"] = month_year_from_dates(df["order_date"])
 
     # 4) Remover linhas com QUALQUER dado faltante
-    df = df.dropna().reset_index(drop=True)
+    return df.dropna().reset_index(drop=True)
+
+
+@timed("pre_process.load_and_prepare")
+def load_and_prepare(raw_path, processed_path=None):
+    """
+    Lê o CSV bruto e aplica transformações essenciais:
+      1) Renomeia colunas para snake_case
+      2) Parse de datas: order_date / ship_date (se existirem)
+      3) total_cost = sales - profit
+      4) month_year = YYYY-MM derivado de order_date
+      5) Remove linhas com qualquer dado faltante
+      6) Tipos compactos (utils/dtypes.optimize_dtypes) + month_code
+      7) (Opcional) salva em processed_path (Parquet)
+    """
+    df = optimize_dtypes(_prepare(_read_csv_robusto(raw_path)))
 
     # 5) Salvar processado (opcional)
     if processed_path:
         try:
-            Path(processed_path).parent.mkdir(parents=True, exist_ok=True)
-            df.to_csv(processed_path, index=False)
+            write_store(df, processed_path)
         except Exception:
             pass
 
     return df
 
 
-@st.cache_data(show_spinner="Preparando dados...")
+def _can_append(old, new):
+    """O RAW atual é o antigo + linhas anexadas no fim?"""
+    if not old or new["size"] <= old["size"] or not old.get("ends_with_newline"):
+        return False
+    # RAW antigo pequeno: o head_hash dele cobre o arquivo todo e não se compara
+    # com o do novo (comparado contra o trecho antigo em update_processed)
+    if old["size"] >= FINGERPRINT_BYTES and new["head_hash"] != old["head_hash"]:
+        return False
+    return True
+
+
+def _prepared_chunks(raw_path, encoding, chunksize, offset=0, end=None, names=None, min_row_id=None,
+                     stats=None, date_formats=None):
+    """
+    Lê o RAW em blocos de 'chunksize' linhas (do byte 'offset' até 'end') e
+    devolve cada bloco já preparado (_prepare + optimize_dtypes). Com 'min_row_id',
+    descarta linhas já processadas. 'stats' acumula linhas, maior row_id,
+    memória por coluna antes/depois da otimização de tipos, o cubo mensal
+    (utils/cube.py), a atividade de clientes (utils/cohort.py), os sketches de
+    únicos (utils/sketches.py) e a faixa min–max das colunas com histograma
+    (utils/histograms.py) das linhas lidas. 'date_formats' = {col: formato}
+    das datas (sniff_date_formats); os mesmos parsers servem a todos os blocos.
+    """
+    parsers = date_parsers(date_formats) if date_formats is not None else None
+    with open(raw_path, "rb") as f:
+        f.seek(offset)
+        src = f if end is None else io.BufferedReader(_ByteRange(f, end - offset))
+        kwargs = {"header": None, "names": names} if names is not None else {}
+        for chunk in pd.read_csv(src, encoding=encoding, chunksize=chunksize, **kwargs):
+            with span("pre_process.prepare_chunk", rows_in=len(chunk)) as s:
+                chunk = _prepare(chunk, parsers)
+                before = chunk.copy(deep=False) if stats is not None else None
+                chunk = optimize_dtypes(chunk)
+                if stats is not None:
+                    _accumulate_memory(stats, memory_report(before, chunk))
+                if min_row_id is not None and "row_id" in chunk.columns:
+                    chunk = chunk[chunk["row_id"] > min_row_id].reset_index(drop=True)
+                s.rows_out = len(chunk)
+            if stats is not None:
+                stats["rows"] = stats.get("rows", 0) + len(chunk)
+                stats["row_watermark"] = _max_row_id(chunk, stats.get("row_watermark"))
+                if not chunk.empty:
+                    with span("pre_process.aggregate_chunk", rows_in=len(chunk)):
+                        stats["cube"] = merge_cubes([stats.get("cube"), build_cube(chunk)])
+                        stats["activity"] = merge_activity([stats.get("activity"), build_activity(chunk)])
+                        stats["sketches"] = merge_sketches([stats.get("sketches"), build_sketches(chunk)])
+                        update_ranges(stats.setdefault("ranges", {}), chunk)
+            yield chunk
+
+
+def _accumulate_memory(stats, report):
+    """Soma o relatório de memória de um bloco ao acumulado em stats['memory']."""
+    mem = stats.setdefault("memory", {})
+    for r in report.to_dict("records"):
+        m = mem.setdefault(r["column"], {"dtype_before": r["dtype_before"], "dtype_after": r["dtype_after"],
+                                         "bytes_before": 0, "bytes_after": 0})
+        m["bytes_before"] += r["bytes_before"]
+        m["bytes_after"] += r["bytes_after"]
+
+
+def _prepare_partition(raw_path, encoding, start, end, names, min_row_id, chunksize, part_path, date_formats):
+    """
+    Tarefa de um processo do pool: prepara a faixa [start, end) do RAW em
+    blocos, grava as linhas num Parquet temporário ('part_path') e devolve os
+    agregados parciais (mesmo formato de 'stats' em _prepared_chunks).
+    """
+    stats = {"rows": 0, "row_watermark": None}
+    with StoreWriter(part_path) as w:
+        for chunk in _prepared_chunks(raw_path, encoding, chunksize, offset=start, end=end, names=names,
+                                      min_row_id=min_row_id, stats=stats, date_formats=date_formats):
+            w.write(chunk)
+    return stats
+
+
+def _merge_stats(stats, part):
+    """Soma em 'stats' os agregados de uma partição (linhas, marca d'água, cubo, coorte, sketches, faixas, memória)."""
+    stats["rows"] = stats.get("rows", 0) + part["rows"]
+    if part.get("row_watermark") is not None:
+        current = stats.get("row_watermark")
+        stats["row_watermark"] = part["row_watermark"] if current is None else max(int(current),
+                                                                                    part["row_watermark"])
+    if part.get("cube") is not None:
+        stats["cube"] = merge_cubes([stats.get("cube"), part["cube"]])
+    if part.get("activity") is not None:
+        stats["activity"] = merge_activity([stats.get("activity"), part["activity"]])
+    if part.get("sketches") is not None:
+        stats["sketches"] = merge_sketches([stats.get("sketches"), part["sketches"]])
+    if part.get("ranges"):
+        stats["ranges"] = merge_ranges([stats.get("ranges"), part["ranges"]])
+    mem = stats.setdefault("memory", {})
+    for col, m in part.get("memory", {}).items():
+        acc = mem.setdefault(col, dict(m, bytes_before=0, bytes_after=0))
+        acc["bytes_before"] += m["bytes_before"]
+        acc["bytes_after"] += m["bytes_after"]
+
+
+def _partitioned_chunks(raw_path, encoding, chunksize, ranges, names, workers, tmp_dir, min_row_id=None,
+                        stats=None, date_formats=None):
+    """
+    Prepara as faixas de bytes do RAW ('ranges', ver partition_ranges) num
+    pool de 'workers' processos — cada um grava a sua partição num Parquet
+    temporário em 'tmp_dir' — e devolve as linhas como tabelas Arrow (um row
+    group por bloco), na ordem do arquivo. Os agregados de cada partição são
+    somados em 'stats' à medida que as partições são consumidas.
+    """
+    with tempfile.TemporaryDirectory(dir=tmp_dir, prefix=".partitions-") as tmp:
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(ranges)))
+        try:
+            futures = [
+                pool.submit(_prepare_partition, str(raw_path), encoding, start, end, names, min_row_id,
+                            chunksize, str(Path(tmp) / "part-{:05d}.parquet".format(i)), date_formats)
+                for i, (start, end) in enumerate(ranges)
+            ]
+            for i, fut in enumerate(futures):
+                with span("pre_process.wait_partition"):
+                    part = fut.result()
+                if stats is not None:
+                    _merge_stats(stats, part)
+                if part["rows"]:
+                    with pq.ParquetFile(Path(tmp) / "part-{:05d}.parquet".format(i)) as src:
+                        for g in range(src.num_row_groups):
+                            yield src.read_row_group(g)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _chunk_source(raw_path, encoding, chunksize, offset, names, workers, tmp_dir, min_row_id=None, stats=None,
+                  date_formats=None):
+    """
+    Blocos preparados do RAW a partir de 'offset': em paralelo por partições
+    quando 'workers' > 1 e o trecho rende mais de uma partição; senão, em
+    sequência no processo atual. 'names' = colunas do RAW (o trecho não tem cabeçalho).
+    """
+    ranges = partition_ranges(raw_path, offset, workers) if workers > 1 else []
+    if stats is not None:
+        stats["partitions"] = max(1, len(ranges))
+    if len(ranges) > 1:
+        return _partitioned_chunks(raw_path, encoding, chunksize, ranges, names, workers, tmp_dir,
+                                   min_row_id=min_row_id, stats=stats, date_formats=date_formats)
+    return _prepared_chunks(raw_path, encoding, chunksize, offset=offset, names=names,
+                            min_row_id=min_row_id, stats=stats, date_formats=date_formats)
+
+
+@timed("pre_process.stream_prepare")
+def stream_prepare(raw_path, processed_path, chunksize=CHUNK_ROWS, workers=1, date_formats=None):
+    """
+    Versão em streaming de load_and_prepare: lê o RAW em blocos, aplica as
+    mesmas etapas por bloco e grava o Parquet incrementalmente. O pico de
+    memória é limitado pelo tamanho do bloco, não pelo tamanho do arquivo.
+    Com 'workers' > 1, as partições do RAW são preparadas em paralelo (ver _chunk_source).
+    'date_formats' omitido = detectado por amostra (sniff_date_formats).
+    Retorna {'rows', 'row_watermark', 'encoding', 'partitions', 'date_formats', ...}.
+    """
+    names = list(_read_csv_robusto(raw_path, nrows=0).columns) if workers > 1 else None
+    offset = _data_start(raw_path) if workers > 1 else 0
+    if date_formats is None:
+        date_formats = sniff_date_formats(raw_path)
+    for enc in _encoding_attempts(raw_path):
+        stats = {"rows": 0, "row_watermark": None, "encoding": enc, "date_formats": date_formats}
+        try:
+            with StoreWriter(processed_path) as w:
+                for chunk in _chunk_source(raw_path, enc, chunksize, offset, names, workers,
+                                           Path(processed_path).parent, stats=stats,
+                                           date_formats=date_formats):
+                    with span("pre_process.write_chunk", rows_in=len(chunk)):
+                        w.write(chunk)
+            return stats
+        except UnicodeDecodeError:
+            continue  # byte inválido além da amostra: o StoreWriter descarta o .tmp e tenta latin1
+    raise ValueError("Não foi possível decodificar o RAW: {}".format(raw_path))
+
+
+@timed("pre_process.stream_append")
+def _stream_append(raw_path, processed_path, offset, names, min_row_id, cube=None, activity=None,
+                   sketches=None, ranges=None, chunksize=CHUNK_ROWS, workers=1, date_formats=None):
+    """
+    Anexa ao Parquet apenas as linhas a partir de 'offset' (em blocos; em
+    partições paralelas se 'workers' > 1); soma ao 'cube', à 'activity'
+    (clientes × mês), aos 'sketches' e às faixas dos histogramas existentes.
+    'date_formats' = formatos usados na carga anterior (mantém o parse consistente).
+    """
+    if date_formats is None:
+        date_formats = sniff_date_formats(raw_path)
+    for enc in _encoding_attempts(raw_path):
+        stats = {"rows": 0, "row_watermark": min_row_id, "encoding": enc, "cube": cube, "activity": activity,
+                 "sketches": sketches, "ranges": dict(ranges or {}), "date_formats": date_formats}
+        try:
+            append_store(
+                _chunk_source(raw_path, enc, chunksize, offset, names, workers, Path(processed_path).parent,
+                              min_row_id=min_row_id, stats=stats, date_formats=date_formats),
+                processed_path,
+            )
+            return stats
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("Não foi possível decodificar o RAW: {}".format(raw_path))
+
+
+@timed("pre_process.update_processed")
+def update_processed(raw_path, processed_path, chunksize=CHUNK_ROWS, workers=None):
+    """
+    Garante o processado em dia com o RAW, do jeito mais barato possível:
+      - RAW inalterado (mesma impressão digital) -> nada a fazer
+      - RAW só cresceu no fim -> lê a cauda, filtra row_id > marca d'água e anexa
+      - qualquer outra mudança -> reprocessa tudo
+    Em ambos os casos a leitura é em blocos de 'chunksize' linhas, e o cubo
+    mensal (processed.cube.parquet), a atividade de clientes da coorte
+    (processed.cohort.parquet) e os sketches de únicos (processed.sketch.parquet)
+    são atualizados junto. 'workers' = processos para preparar o RAW em
+    partições (None = default_workers()).
+    Retorna o manifesto gravado ao lado do processado.
+    """
+    workers = default_workers() if workers is None else max(1, int(workers))
+    raw_path = Path(raw_path)
+    processed_path = Path(processed_path)
+    mpath = manifest_path(processed_path)
+
+    old = read_manifest(mpath) if processed_path.exists() else None
+    fp = raw_fingerprint(raw_path)
+
+    if (old and old.get("raw") == fp and old.get("pipeline") == PIPELINE_VERSION
+            and all(p.exists() for p in artifact_paths(processed_path).values())):
+        return old
+    if old and old.get("pipeline") != PIPELINE_VERSION:
+        old = None  # processado de outra versão do pipeline: reprocessa tudo
+
+    mode = "full"
+    old_cube = read_cube(processed_path) if old else None
+    old_activity = read_activity(processed_path) if old else None
+    old_sketches = read_sketches(processed_path) if old else None
+    if (old and old_cube is not None and old_activity is not None and old_sketches is not None
+            and "histograms" in old and _can_append(old.get("raw"), fp)):
+        prev = old["raw"]
+        # o trecho que já havíamos processado continua idêntico?
+        tail_start = max(0, prev["size"] - TAIL_CHECK_BYTES)
+        same = _hash_range(raw_path, tail_start, prev["size"] - tail_start) == prev["tail_hash"]
+        # RAW antigo menor que FINGERPRINT_BYTES: o head_hash cobria o arquivo inteiro
+        if same and prev["size"] < FINGERPRINT_BYTES:
+            same = _hash_range(raw_path, 0, prev["size"]) == prev["head_hash"]
+        if same:
+            mode = "append"
+
+    if mode == "append":
+        raw_columns = old["raw_columns"]
+        stats = _stream_append(raw_path, processed_path, old["raw"]["size"], raw_columns,
+                               old.get("row_watermark"), cube=old_cube, activity=old_activity,
+                               sketches=old_sketches,
+                               ranges=ranges_from_edges(old.get("histograms", {}).get("edges")),
+                               chunksize=chunksize, workers=workers, date_formats=old.get("date_formats"))
+        rows = old["rows"] + stats["rows"]
+    else:
+        raw_columns = list(_read_csv_robusto(raw_path, nrows=0).columns)
+        stats = stream_prepare(raw_path, processed_path, chunksize=chunksize, workers=workers)
+        rows = stats["rows"]
+
+    # cubo, atividade e sketches são independentes: gravados em paralelo (o pyarrow libera o GIL)
+    with span("pre_process.write_aux"):
+        writes = [(fn, stats.get(k)) for k, fn in (("cube", write_cube), ("activity", write_activity),
+                                                   ("sketches", write_sketches))]
+        with ThreadPoolExecutor(max_workers=len(writes)) as pool:
+            for f in [pool.submit(fn, obj, processed_path) for fn, obj in writes if obj is not None]:
+                f.result()
+
+    manifest = {
+        "raw": fp,
+        "raw_columns": raw_columns,
+        "rows": rows,
+        "row_watermark": stats["row_watermark"],
+        "last_mode": mode,
+        "last_rows_added": stats["rows"],
+        "workers": workers,
+        "partitions": stats.get("partitions", 1),
+        "encoding": dict(detect_encoding(raw_path), used=stats["encoding"]),
+        # formato (strftime) detectado de cada coluna de data; None = inferência
+        "date_formats": stats.get("date_formats"),
+        # memória por coluna antes/depois da otimização de tipos (última carga)
+        "memory": stats.get("memory", {}),
+        # limites fixos dos bins dos histogramas (faixa de todas as linhas)
+        "histograms": {"bins": HIST_BINS, "edges": bin_edges(stats.get("ranges", {}))},
+        "pipeline": PIPELINE_VERSION,
+        "version": "{}-{}-{}".format(PIPELINE_VERSION, fp["size"], fp["mtime_ns"]),
+    }
+    write_manifest(mpath, manifest)
+    return manifest
+
+
+def _max_row_id(df, current):
+    """Maior row_id visto até agora (marca d'água para o modo incremental)."""
+    if "row_id" not in df.columns or df.empty:
+        return current
+    m = int(df["row_id"].max())
+    return m if current is None else max(m, int(current))
+
+
+def _cache_data(**kwargs):
+    """st.cache_data dentro do app; fora dele (CLI, benchmarks, sem Streamlit) a função roda sem cache."""
+    if st is None or not st.runtime.exists():
+        return lambda fn: fn
+    return st.cache_data(**kwargs)
+
+
+@_cache_data(show_spinner="Preparando dados...")
+def _run_preprocessing_cached(raw_path, processed_path, raw_size, raw_mtime_ns):
+    return update_processed(raw_path, processed_path)
+
+
 def run_preprocessing(raw_path, processed_path):
     """
-    Wrapper cacheado que lê e processa o RAW e garante o processed.csv em disco.
+    Garante o processado em disco (incremental). O cache é chaveado pelo
+    tamanho/mtime do RAW: reruns não tocam no disco além de um stat().
+    Retorna o manifesto (inclui 'version', usado como chave de cache nas páginas).
     """
     raw_path = Path(raw_path)
     processed_path = Path(processed_path)
@@ -93,15 +638,146 @@ def run_preprocessing(raw_path, processed_path):
     if not raw_path.exists():
         raise FileNotFoundError("RAW não encontrado: {}".format(raw_path))
 
-    df = load_and_prepare(str(raw_path), str(processed_path))
-    try:
-        df.to_csv(processed_path, index=False)
-    except Exception:
-        pass
-    return df
+    st_ = raw_path.stat()
+    return _run_preprocessing_cached(str(raw_path), str(processed_path), st_.st_size, st_.st_mtime_ns)
+
+
+# ---------------------------
+# Modo "só pré-gerado" (o app não roda ETL)
+# ---------------------------
+def artifact_paths(processed_path):
+    """Arquivos que o app lê: processado, cubo, atividade da coorte, sketches e manifesto."""
+    p = Path(processed_path)
+    return {
+        "processed": p,
+        "cube": cube_path(p),
+        "activity": activity_path(p),
+        "sketches": sketch_path(p),
+        "manifest": manifest_path(p),
+    }
+
+
+def check_prebuilt(raw_path, processed_path):
+    """
+    Os artefatos pré-gerados existem e correspondem ao RAW atual?
+    Retorna (ok, motivos, manifesto). Se o RAW não existir (deploy só com os
+    artefatos), vale o que foi gerado; se existir, tamanho e hashes de início
+    e fim precisam bater com o manifesto (o mtime sozinho não conta: cópias
+    de deploy mudam o mtime).
+    """
+    reasons = []
+    paths = artifact_paths(processed_path)
+    missing = [str(p) for p in paths.values() if not p.exists()]
+    if missing:
+        return False, ["artefato ausente: {}".format(m) for m in missing], None
+
+    manifest = read_manifest(paths["manifest"])
+    if manifest is None:
+        return False, ["manifesto ilegível: {}".format(paths["manifest"])], None
+    if manifest.get("pipeline") != PIPELINE_VERSION:
+        reasons.append("gerado pelo pipeline {} (atual: {})".format(manifest.get("pipeline"), PIPELINE_VERSION))
+
+    raw_path = Path(raw_path) if raw_path else None
+    if raw_path is not None and raw_path.exists():
+        old = manifest.get("raw") or {}
+        st_ = raw_path.stat()
+        if st_.st_size != old.get("size"):
+            reasons.append("RAW mudou de tamanho ({} -> {} bytes)".format(old.get("size"), st_.st_size))
+        elif st_.st_mtime_ns != old.get("mtime_ns"):
+            fp = raw_fingerprint(raw_path)
+            if fp["head_hash"] != old.get("head_hash") or fp["tail_hash"] != old.get("tail_hash"):
+                reasons.append("conteúdo do RAW mudou desde a geração")
+    return not reasons, reasons, manifest
+
+
+@_cache_data(show_spinner=False)
+def _load_prebuilt_cached(raw_path, processed_path, manifest_mtime_ns, raw_stat):
+    ok, reasons, manifest = check_prebuilt(raw_path, processed_path)
+    if not ok:
+        raise RuntimeError(
+            "Artefatos pré-gerados ausentes ou desatualizados ({}):\n- {}\n"
+            "Gere-os com: python -m utils.pre_process build".format(processed_path, "\n- ".join(reasons))
+        )
+    return manifest
+
+
+def load_prebuilt(raw_path, processed_path):
+    """
+    Modo só pré-gerado: devolve o manifesto dos artefatos já gerados, sem
+    processar nada. Falha na hora (RuntimeError) se estiverem ausentes ou
+    desatualizados em relação ao RAW. O índice de bitmaps dos filtros não é
+    um artefato: é montado em memória no 1º uso (Dataset.index).
+    """
+    mpath = manifest_path(processed_path)
+    m_mtime = mpath.stat().st_mtime_ns if mpath.exists() else None
+    raw = Path(raw_path) if raw_path else None
+    raw_stat = (raw.stat().st_size, raw.stat().st_mtime_ns) if raw is not None and raw.exists() else None
+    return _load_prebuilt_cached(str(raw_path) if raw_path else None, str(processed_path), m_mtime, raw_stat)
+
+
+@_cache_data(show_spinner=False)
+def load_processed(processed_path, columns=None, version=None):
+    """
+    Lê o processado (para uso nas páginas).
+    - Parquet: tipos preservados; 'columns' limita a leitura às colunas pedidas
+    - CSV (legado): leitura robusta completa
+    'version' só entra na chave do cache (muda quando o processado é atualizado).
+    """
+    if Path(processed_path).suffix.lower() == ".csv":
+        df = _read_csv_robusto(processed_path)
+        if columns is not None:
+            df = df[[c for c in dict.fromkeys(columns) if c in df.columns]]
+        return df
+    return read_store(processed_path, columns=list(columns) if columns else None)
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv=None):
+    """python -m utils.pre_process {build,check}: gera/verifica os artefatos fora do app."""
+    defaults = get_paths(Path(__file__).resolve().parents[1])
+    p = argparse.ArgumentParser(prog="python -m utils.pre_process",
+                                description="Pré-processamento do dashboard fora do Streamlit.")
+    sub = p.add_subparsers(dest="command", required=True)
+    for name, help_ in (("build", "gera/atualiza processado, cubo, coorte e sketches"),
+                        ("check", "verifica se os artefatos existem e estão em dia com o RAW")):
+        c = sub.add_parser(name, help=help_)
+        c.add_argument("--raw", default=str(defaults["RAW_PATH"]))
+        c.add_argument("--processed", default=str(defaults["PROCESSED_PATH"]))
+    b = sub.choices["build"]
+    b.add_argument("--chunksize", type=int, default=CHUNK_ROWS, help="linhas por bloco na leitura")
+    b.add_argument("--workers", type=int, default=None,
+                   help="processos para preparar o RAW em partições (0 = todos os núcleos; padrão: ${})".format(WORKERS_ENV))
+    b.add_argument("--force", action="store_true", help="ignora o manifesto e reprocessa tudo")
+    args = p.parse_args(argv)
+
+    if args.command == "check":
+        ok, reasons, manifest = check_prebuilt(args.raw, args.processed)
+        if ok:
+            print("Artefatos em dia (versão {}, {} linhas).".format(manifest["version"], manifest["rows"]))
+            return 0
+        print("Artefatos ausentes ou desatualizados:\n- " + "\n- ".join(reasons))
+        return 1
+
+    Path(args.processed).parent.mkdir(parents=True, exist_ok=True)
+    if args.force:
+        manifest_path(args.processed).unlink(missing_ok=True)
+    before = read_manifest(manifest_path(args.processed))
+    t0 = time.perf_counter()
+    # sem --workers: update_processed resolve DASHBOARD_WORKERS (default_workers)
+    workers = args.workers if args.workers is None or args.workers > 0 else (os.cpu_count() or 1)
+    manifest = update_processed(args.raw, args.processed, chunksize=args.chunksize, workers=workers)
+    if manifest == before:
+        print("RAW inalterado: artefatos já em dia (versão {}).".format(manifest["version"]))
+    else:
+        print("Modo: {} • {} linhas ({} novas) • {} partição(ões) / {} processo(s) • versão {} • {:.1f}s".format(
+            manifest["last_mode"], manifest["rows"], manifest["last_rows_added"], manifest["partitions"],
+            manifest["workers"], manifest["version"], time.perf_counter() - t0))
+    for name, path in artifact_paths(args.processed).items():
+        print("  {:<10} {}".format(name, path))
+    return 0
 
 
-@st.cache_data(show_spinner=False)
-def load_processed(processed_path):
-    """Lê o CSV processado (para uso nas páginas)."""
-    return _read_csv_robusto(processed_path)
+if __name__ == "__main__":
+    sys.exit(main())
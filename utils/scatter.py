@@ -0,0 +1,88 @@
+# utils/scatter.py — redução de pontos para gráficos de dispersão grandes
+# ----------------------------------------------------------------------
+# px.scatter manda UM ponto por linha ao navegador (com hover), o que gera
+# payloads de megabytes. Acima de um limite de linhas, a página usa:
+# - "sample": amostra estratificada (por segmento, p.ex.) que SEMPRE mantém
+#   os extremos (maiores/menores valores de x e y: lucros e prejuízos)
+# - "density": contagens numa grade 2D (np.histogram2d) desenhadas como
+#   heatmap — o navegador recebe O(bins²) números, não O(linhas)
+import numpy as np
+import pandas as pd
+
+# limite padrão de pontos enviados ao navegador
+SCATTER_MAX_POINTS = 5000
+# quantos extremos manter em cada ponta de x e de y (no modo amostra)
+SCATTER_EXTREMES = 50
+# bins por eixo no modo densidade
+SCATTER_BINS = 60
+
+# "auto": todos os pontos até o limite; acima dele, amostra
+SCATTER_MODES = ("auto", "sample", "density", "all")
+
+
+def resolve_mode(mode, n_rows, max_points=SCATTER_MAX_POINTS):
+    """Modo efetivo ('all', 'sample' ou 'density') para n_rows linhas."""
+    if mode not in SCATTER_MODES:
+        raise ValueError(f"mode deve ser um de {SCATTER_MODES}: {mode!r}")
+    if mode == "auto":
+        return "all" if n_rows <= max_points else "sample"
+    return mode
+
+
+def _extreme_positions(values, k):
+    """Posições dos k menores e k maiores valores (seleção parcial, sem ordenar tudo)."""
+    n = len(values)
+    if 2 * k >= n:
+        return np.arange(n)
+    lo = np.argpartition(values, k)[:k]
+    hi = np.argpartition(values, n - k)[n - k:]
+    return np.concatenate([lo, hi])
+
+
+def sample_positions(df, x, y, max_points=SCATTER_MAX_POINTS, strata=None,
+                     extremes=SCATTER_EXTREMES, seed=0):
+    """
+    Posições (ordenadas) de até 'max_points' linhas para o gráfico: os extremos
+    de x e y + amostra aleatória estratificada por 'strata' (proporcional ao
+    tamanho de cada grupo). Reprodutível para o mesmo 'seed'.
+    """
+    n = len(df)
+    if n <= max_points:
+        return np.arange(n)
+
+    xv = np.nan_to_num(df[x].to_numpy(dtype="float64", na_value=np.nan))
+    yv = np.nan_to_num(df[y].to_numpy(dtype="float64", na_value=np.nan))
+    k = max(0, min(extremes, max_points // 4))
+    keep = np.unique(np.concatenate([_extreme_positions(xv, k), _extreme_positions(yv, k)]))
+
+    budget = max_points - len(keep)
+    rest = np.setdiff1d(np.arange(n), keep, assume_unique=True)
+    if budget <= 0 or len(rest) == 0:
+        return keep
+
+    rng = np.random.default_rng(seed)
+    if strata is None or strata not in df.columns:
+        picked = rng.choice(rest, size=min(budget, len(rest)), replace=False)
+    else:
+        # ausentes formam um grupo próprio
+        codes = pd.factorize(df[strata], use_na_sentinel=False)[0][rest]
+        quota = np.floor(budget * np.bincount(codes) / len(rest)).astype(int)
+        parts = []
+        for g, q in enumerate(quota):
+            members = rest[codes == g]
+            q = min(max(q, 1), len(members))  # todo grupo aparece ao menos uma vez
+            parts.append(rng.choice(members, size=q, replace=False))
+        picked = np.concatenate(parts)
+    return np.sort(np.concatenate([keep, picked]))
+
+
+def density_grid(df, x, y, bins=SCATTER_BINS):
+    """
+    Contagens de linhas numa grade bins×bins de (x, y).
+    Retorna (contagens[x, y], centros_x, centros_y).
+    """
+    xv = df[x].to_numpy(dtype="float64", na_value=np.nan)
+    yv = df[y].to_numpy(dtype="float64", na_value=np.nan)
+    ok = ~(np.isnan(xv) | np.isnan(yv))
+    counts, xe, ye = np.histogram2d(xv[ok], yv[ok], bins=bins)
+    return counts, (xe[:-1] + xe[1:]) / 2, (ye[:-1] + ye[1:]) / 2
@@ -0,0 +1,24 @@
+# utils/sections.py — seções das páginas que só calculam quando abertas
+# --------------------------------------------------------------------
+# As seções das páginas 3 e 4 são fragments (@st.fragment): mexer num widget
+# de uma seção reexecuta só ela. Seções pesadas podem ainda ficar fechadas
+# até o usuário abri-las — enquanto fechadas, nada é calculado.
+import inspect
+
+import streamlit as st
+
+# Streamlit recente: o expander informa se está aberto (.open) e reexecuta ao abrir/fechar
+_EXPANDER_HAS_STATE = "on_change" in inspect.signature(st.expander).parameters
+
+
+def lazy_section(label, key, expanded=False):
+    """
+    Seção colapsável. Retorna (container, aberta?): o chamador só calcula o
+    conteúdo se aberta. Sem suporte a estado no expander, usa um st.toggle.
+    """
+    if _EXPANDER_HAS_STATE:
+        box = st.expander(label, expanded=expanded, key=key, on_change="rerun")
+        is_open = box.open
+        return box, expanded if is_open is None else bool(is_open)
+    is_open = st.toggle(label, value=expanded, key=key)
+    return st.container(), is_open
@@ -0,0 +1,191 @@
+# utils/sketches.py — sketches HyperLogLog para contagens distintas aproximadas
+# ----------------------------------------------------------------------------
+# KPIs de "únicos" (clientes, produtos, cidades, pedidos...) faziam nunique()
+# exato sobre as linhas filtradas a cada mudança de filtro. Aqui, no
+# pré-processamento, cada célula mês × categoria × segmento guarda um sketch
+# HyperLogLog (2^HLL_PRECISION registradores uint8) por coluna: sketches se
+# combinam pelo máximo registrador a registrador, então a contagem sob filtros
+# que cabem nas células é O(células × registradores), independente das linhas.
+# Erro padrão relativo ≈ 1.04 / sqrt(2^HLL_PRECISION) (±1.6% com p=12).
+# Gravado em processed.sketch.parquet (um binário por célula e coluna).
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from utils.cube import _month_bounds
+
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+
+# granularidade das células e colunas com sketch
+SKETCH_DIMS = ("month_code", "category", "segment")
+SKETCH_COLS = ("order_id", "customer_name", "product_name", "city", "state", "country")
+
+
+def standard_error(precision=HLL_PRECISION):
+    """Erro padrão relativo do estimador HLL (1.04 / sqrt(m))."""
+    return 1.04 / np.sqrt(1 << precision)
+
+
+def _hashes(s):
+    """Hash de 64 bits estável (entre processos) de cada valor; categorias: hash por categoria."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        h = pd.util.hash_array(np.asarray(s.cat.categories.astype(str), dtype=object))
+        codes = s.cat.codes.to_numpy()
+        return h[codes[codes >= 0]], codes >= 0
+    valid = s.notna().to_numpy()
+    return pd.util.hash_array(np.asarray(s[valid].astype(str), dtype=object)), valid
+
+
+def _register_updates(h, precision=HLL_PRECISION):
+    """(registrador, rank) de cada hash: p bits altos escolhem o registrador; rank = zeros à esquerda + 1."""
+    reg = (h >> np.uint64(64 - precision)).astype("int64")
+    rest = (h & np.uint64((1 << (64 - precision)) - 1)).astype("float64")  # < 2^52: exato em float64
+    _, bits = np.frexp(rest)  # nº de bits significativos (0 se rest == 0)
+    return reg, (65 - precision - bits).astype("uint8")
+
+
+def estimate(registers):
+    """Estimativa HLL de um vetor de registradores (com correção para cardinalidades pequenas)."""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    e = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype("int64")))
+    zeros = int(np.count_nonzero(registers == 0))
+    if e <= 2.5 * m and zeros:
+        e = m * np.log(m / zeros)  # contagem linear
+    return int(round(e))
+
+
+class Sketches:
+    """Células (mês × categoria × segmento) + registradores HLL {coluna: (células × m)}."""
+
+    def __init__(self, cells, registers):
+        self.cells = cells.reset_index(drop=True)
+        self.registers = registers
+
+    def __len__(self):
+        return len(self.cells)
+
+    @property
+    def nbytes(self):
+        return int(sum(r.nbytes for r in self.registers.values()))
+
+    def cell_mask(self, state):
+        """
+        Células selecionadas pelo estado dos filtros (ver lateral_filters), ou
+        None se algum filtro ativo não cabe nelas (faixas, meses cortados,
+        outras dimensões).
+        """
+        if state is None:
+            return np.ones(len(self), dtype=bool)
+        if any(v is not None for v in state.get("ranges", {}).values()):
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        date_state = state.get("date")
+        if date_state and not date_state.get("full"):
+            bounds = _month_bounds(date_state)
+            if bounds is None or "month_code" not in self.cells.columns:
+                return None
+            mask &= self.cells["month_code"].between(bounds[0], bounds[1]).to_numpy()
+        for col, sel in state.get("dims", {}).items():
+            if sel is None:
+                continue
+            if col not in self.cells.columns:
+                return None
+            mask &= self.cells[col].isin(sel).to_numpy()
+        return mask
+
+    def count(self, col, mask):
+        """Contagem distinta aproximada de 'col' nas células de 'mask' (None se não houver sketch)."""
+        regs = self.registers.get(col)
+        if regs is None:
+            return None
+        if not mask.any():
+            return 0
+        return estimate(regs[mask].max(axis=0))
+
+
+def build_sketches(df, cols=SKETCH_COLS, precision=HLL_PRECISION):
+    """Sketches de um DataFrame (ou bloco). None se faltar alguma dimensão das células."""
+    if any(c not in df.columns for c in SKETCH_DIMS):
+        return None
+    cell_ids, cells = _cell_ids(df[list(SKETCH_DIMS)])
+    m = 1 << precision
+    registers = {}
+    for c in cols:
+        if c not in df.columns:
+            continue
+        h, valid = _hashes(df[c])
+        reg, rank = _register_updates(h, precision)
+        r = np.zeros((len(cells), m), dtype="uint8")
+        np.maximum.at(r, (cell_ids[valid], reg), rank)
+        registers[c] = r
+    return Sketches(cells, registers)
+
+
+def _cell_ids(keys):
+    """Id da célula de cada linha e as células distintas (na ordem de 1ª ocorrência)."""
+    g = keys.groupby(list(keys.columns), observed=True, sort=False, dropna=False)
+    ids = g.ngroup().to_numpy()
+    first = np.full(g.ngroups, -1, dtype="int64")
+    first[ids[::-1]] = np.arange(len(ids))[::-1]
+    return ids, keys.iloc[first].reset_index(drop=True)
+
+
+def merge_sketches(parts):
+    """Combina sketches parciais (blocos, ou gravados + cauda nova): máximo por célula e registrador."""
+    parts = [p for p in parts if p is not None and len(p)]
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    cells = pd.concat([p.cells for p in parts], ignore_index=True)
+    for c in SKETCH_DIMS:
+        if c in cells.columns and not pd.api.types.is_numeric_dtype(cells[c]):
+            cells[c] = cells[c].astype("category")  # categorias diferentes entre partes
+    ids, merged = _cell_ids(cells)
+    registers = {}
+    for c in dict.fromkeys(k for p in parts for k in p.registers):
+        m = next(p.registers[c].shape[1] for p in parts if c in p.registers)
+        r = np.zeros((len(merged), m), dtype="uint8")
+        start = 0
+        for p in parts:
+            if c in p.registers:
+                # células de uma parte são distintas: indexação simples, sem np.maximum.at (lento)
+                idx = ids[start:start + len(p)]
+                r[idx] = np.maximum(r[idx], p.registers[c])
+            start += len(p)
+        registers[c] = r
+    return Sketches(merged, registers)
+
+
+def sketch_path(store_path):
+    """Caminho dos sketches associados ao Parquet processado."""
+    p = Path(store_path)
+    return p.with_name(p.stem + ".sketch.parquet")
+
+
+def write_sketches(sketches, store_path):
+    """Grava as células e, por coluna, os registradores de cada célula (binário)."""
+    out = sketches.cells.copy()
+    for c, r in sketches.registers.items():
+        out[c] = [row.tobytes() for row in r]
+    p = sketch_path(store_path)
+    tmp = p.with_suffix(p.suffix + ".tmp")
+    out.to_parquet(tmp, index=False)
+    tmp.replace(p)
+    return p
+
+
+def read_sketches(store_path):
+    """Lê os sketches gravados (None se ainda não existirem)."""
+    p = sketch_path(store_path)
+    if not p.exists():
+        return None
+    d = pd.read_parquet(p)
+    dims = [c for c in SKETCH_DIMS if c in d.columns]
+    registers = {
+        c: np.frombuffer(b"".join(d[c]), dtype="uint8").reshape(len(d), -1)
+        for c in d.columns if c not in dims
+    }
+    return Sketches(d[dims], registers)
@@ -0,0 +1,246 @@
+# utils/store.py — armazenamento colunar do dataset processado (Parquet)
+# ---------------------------------------------------------------------
+# O processado deixa de ser um CSV (que perde tipos e precisa ser re-parseado)
+# e passa a ser um arquivo Parquet:
+# - datas continuam datetime64 ao recarregar
+# - dimensões textuais viram 'category' (dicionário no Parquet)
+# - a leitura pode trazer apenas as colunas que a página precisa
+# - um manifesto JSON ao lado do Parquet registra de onde/como ele foi gerado
+# - a gravação pode ser feita em blocos (StoreWriter), sem ter tudo em memória
+# - o rodapé do Parquet leva um esquema próprio (SCHEMA_KEY): dtype de cada coluna,
+#   colunas de data e níveis das categorias (união de todos os blocos, ordenados);
+#   read_store restaura exatamente esses tipos/níveis ao carregar
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+
+from utils.dtypes import CATEGORY_COLS
+
+# chave do esquema embutido nos metadados do Parquet (e versão do formato)
+SCHEMA_KEY = b"tt_dashboard.schema"
+SCHEMA_VERSION = 1
+
+def to_categoricals(df, cols=CATEGORY_COLS):
+    """Converte as dimensões conhecidas para 'category' (in-place) e devolve o df."""
+    for c in cols:
+        if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype("category")
+    return df
+
+
+def _widen_schema(schema):
+    """Índices de dicionário em int32: blocos seguintes podem ter mais categorias."""
+    fields = []
+    for f in schema:
+        if pa.types.is_dictionary(f.type):
+            f = f.with_type(pa.dictionary(pa.int32(), f.type.value_type))
+        fields.append(f)
+    return pa.schema(fields, metadata=schema.metadata)
+
+
+class StoreWriter:
+    """
+    Grava o Parquet em blocos (um row group por write), com esquema fixo
+    definido pelo primeiro bloco não vazio. Escreve num .tmp e só troca
+    pelo definitivo no close() — leitores nunca veem arquivo pela metade.
+    Uso:
+        with StoreWriter(path) as w:
+            for chunk in ...:
+                w.write(chunk)
+    """
+
+    def __init__(self, path, schema=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        self.schema = schema
+        self.rows = 0
+        self._writer = None
+        self._pending_empty = None
+        self._dtypes = None   # col -> dtype pandas (do 1º bloco)
+        self._levels = {}     # col -> níveis vistos (categorias de todos os blocos)
+
+    def _open(self, schema):
+        self.schema = schema
+        self._writer = pq.ParquetWriter(self.tmp, schema)
+
+    def write_table(self, table):
+        """Grava uma tabela Arrow já no esquema do arquivo."""
+        if self._writer is None:
+            self._open(self.schema or table.schema)
+        self._track(table)
+        self._writer.write_table(table)
+        self.rows += table.num_rows
+
+    def _track(self, table):
+        """Acumula dtypes (1º bloco) e níveis das categorias para o esquema embutido."""
+        if self._dtypes is None:
+            self._dtypes = {c: str(t) for c, t in table.slice(0, 0).to_pandas().dtypes.items()}
+        for i, f in enumerate(table.schema):
+            if pa.types.is_dictionary(f.type):
+                levels = self._levels.setdefault(f.name, set())
+                for chunk in table.column(i).chunks:
+                    levels.update(chunk.dictionary.to_pylist())
+
+    def embedded_schema(self):
+        """Esquema gravado no rodapé (ver SCHEMA_KEY): dtypes, colunas de data e níveis ordenados."""
+        dtypes = self._dtypes or {}
+        return {
+            "version": SCHEMA_VERSION,
+            "columns": dtypes,
+            "dates": [c for c, t in dtypes.items() if t.startswith("datetime64")],
+            "categories": {c: sorted(v for v in levels if v is not None) for c, levels in self._levels.items()},
+        }
+
+    def write(self, df):
+        """Converte um bloco pandas para Arrow (no esquema fixo) e grava. Aceita também uma tabela Arrow."""
+        if isinstance(df, pa.Table):
+            if self._writer is None and self.schema is None:
+                self._open(_widen_schema(df.schema))
+            self.write_table(df.cast(self.schema))
+            return
+        if df.empty and self._writer is None:
+            # bloco vazio não define esquema; guarda só para o caso de tudo vir vazio
+            self._pending_empty = df
+            return
+        to_categoricals(df)
+        if self.schema is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self._open(_widen_schema(table.schema))
+            table = table.cast(self.schema)
+        else:
+            table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        self.write_table(table)
+
+    def close(self):
+        if self._writer is None:
+            df = self._pending_empty if self._pending_empty is not None else pd.DataFrame()
+            table = pa.Table.from_pandas(to_categoricals(df), preserve_index=False)
+            self._track(table)
+            meta = dict(table.schema.metadata or {})
+            meta[SCHEMA_KEY] = json.dumps(self.embedded_schema(), ensure_ascii=False)
+            pq.write_table(table.replace_schema_metadata(meta), self.tmp)
+        else:
+            self._writer.add_key_value_metadata({SCHEMA_KEY: json.dumps(self.embedded_schema(), ensure_ascii=False)})
+            self._writer.close()
+        self.tmp.replace(self.path)
+        return self.path
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        self.tmp.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_store(df, path):
+    """Grava o DataFrame processado em Parquet (com categorias)."""
+    with StoreWriter(path) as w:
+        w.write(df)
+    return Path(path)
+
+
+def store_columns(path):
+    """Lista as colunas disponíveis no Parquet sem ler os dados."""
+    return list(pq.read_schema(path).names)
+
+
+def read_store_schema(path):
+    """Esquema embutido no Parquet (ver StoreWriter.embedded_schema); None em arquivos antigos."""
+    raw = (pq.read_metadata(path).metadata or {}).get(SCHEMA_KEY)
+    return json.loads(raw) if raw else None
+
+
+def restore_dtypes(df, schema):
+    """
+    Aplica (in-place) o esquema embutido: categorias com exatamente os níveis
+    gravados (ordenados) e demais colunas no dtype gravado. Devolve o df.
+    """
+    levels = schema.get("categories", {})
+    for c in df.columns:
+        s = df[c]
+        if c in levels:
+            if not isinstance(s.dtype, pd.CategoricalDtype):
+                df[c] = s.astype(pd.CategoricalDtype(levels[c]))
+            elif list(s.cat.categories) != levels[c]:
+                df[c] = s.cat.set_categories(levels[c])
+        elif c in schema.get("columns", {}) and str(s.dtype) != schema["columns"][c]:
+            df[c] = s.astype(schema["columns"][c])
+    return df
+
+
+def read_store(path, columns=None):
+    """
+    Lê o Parquet processado. Se 'columns' for informado, lê só essas colunas
+    (as que não existirem no arquivo são ignoradas; repetidas são lidas uma vez).
+    Os tipos saem do esquema embutido (datas em datetime64, categorias com os
+    níveis gravados), sem conversões de texto nas páginas.
+    """
+    if columns is not None:
+        available = set(store_columns(path))
+        columns = [c for c in dict.fromkeys(columns) if c in available]
+    df = pd.read_parquet(path, columns=columns)
+    schema = read_store_schema(path)
+    if schema is not None:
+        return restore_dtypes(df, schema)
+    for c in df.columns:
+        # arquivo sem esquema embutido: row groups com dicionários diferentes voltam na ordem
+        # em que apareceram; mantém as categorias ordenadas (groupby/gráficos por month_year)
+        if isinstance(df[c].dtype, pd.CategoricalDtype) and not df[c].cat.categories.is_monotonic_increasing:
+            df[c] = df[c].cat.reorder_categories(sorted(df[c].cat.categories))
+    return df
+
+
+def append_store(chunks, path):
+    """
+    Anexa linhas novas ao Parquet existente sem carregá-lo inteiro:
+    copia os row groups antigos em lotes e grava os blocos novos em seguida.
+    'chunks' pode ser um DataFrame ou um iterável de DataFrames (ou tabelas Arrow).
+    """
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    with pq.ParquetFile(path) as src:
+        with StoreWriter(path, schema=_widen_schema(src.schema_arrow)) as w:
+            for batch in src.iter_batches():
+                w.write_table(pa.Table.from_batches([batch]).cast(w.schema))
+            for df in chunks:
+                if len(df):
+                    w.write(df)
+    return w.rows
+
+
+# ---------------------------
+# Manifesto (processed.manifest.json)
+# ---------------------------
+def manifest_path(store_path):
+    """Caminho do manifesto associado ao Parquet processado."""
+    p = Path(store_path)
+    return p.with_name(p.stem + ".manifest.json")
+
+
+def read_manifest(path):
+    """Lê o manifesto; None se não existir ou estiver corrompido."""
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def write_manifest(path, data):
+    """Grava o manifesto (JSON legível)."""
+    p = Path(path)
+    tmp = p.with_suffix(p.suffix + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(p)
+    return p
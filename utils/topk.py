@@ -0,0 +1,97 @@
+# utils/topk.py — rankings Top-K / Bottom-K
+# -----------------------------------------
+# As páginas mostravam "top 20" com groupby().sum().sort_values().head(k),
+# às vezes ordenando o mesmo agregado três vezes. Aqui:
+# - group_sums: soma TODAS as métricas por chave numa passada (np.bincount
+#   nos códigos da chave)
+# - Ranking: agregado de uma métrica; top/bottom por seleção parcial
+#   (np.argpartition, O(n)) e ordenação só dos k escolhidos; ends() devolve as
+#   duas pontas com uma única partição
+# Em cache por estado de filtros via filter_cache.filtered_aggregate.
+import numpy as np
+import pandas as pd
+
+
+def select_positions(values, k, largest=True):
+    """Posições dos k maiores (ou menores) valores, já em ordem (sem ordenar tudo)."""
+    values = np.asarray(values)
+    n = len(values)
+    k = max(0, min(int(k), n))
+    if k == 0:
+        return np.zeros(0, dtype="int64")
+    keyed = -values if largest else values
+    part = np.arange(n) if k == n else np.argpartition(keyed, k - 1)[:k]
+    return part[np.argsort(keyed[part], kind="stable")]
+
+
+def _key_codes(s):
+    """Códigos inteiros por linha (-1 = ausente) e rótulos da chave."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.codes.to_numpy(), np.asarray(s.cat.categories, dtype=object)
+    codes, labels = pd.factorize(s)
+    return codes, np.asarray(labels, dtype=object)
+
+
+def group_sums(df, key_col, value_cols):
+    """
+    Somas por chave (só chaves com linhas, como groupby(observed=True)).
+    Retorna (chaves, {métrica: somas}) na mesma ordem de chaves.
+    """
+    codes, labels = _key_codes(df[key_col])
+    valid = codes >= 0
+    codes = codes[valid]
+    seen = np.bincount(codes, minlength=len(labels)) > 0
+    sums = {}
+    for c in dict.fromkeys(value_cols):
+        if c not in df.columns:
+            continue
+        w = np.nan_to_num(df[c].to_numpy(dtype="float64", na_value=np.nan)[valid])
+        sums[c] = np.bincount(codes, weights=w, minlength=len(labels))[seen]
+    return labels[seen], sums
+
+
+class Ranking:
+    """Agregado de uma métrica por chave; fatias Top-K/Bottom-K como DataFrame."""
+
+    def __init__(self, key_col, value_col, keys, values):
+        self.key_col = key_col
+        self.value_col = value_col
+        self.keys = keys
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self):
+        """Bytes dos arrays (para o limite de memória do filter_cache)."""
+        return int(self.keys.nbytes + self.values.nbytes)
+
+    def _frame(self, pos):
+        return pd.DataFrame({self.key_col: self.keys[pos], self.value_col: self.values[pos]})
+
+    def top(self, k):
+        """k maiores (ordem decrescente)."""
+        return self._frame(select_positions(self.values, k, largest=True))
+
+    def bottom(self, k):
+        """k menores (ordem crescente)."""
+        return self._frame(select_positions(self.values, k, largest=False))
+
+    def ends(self, k):
+        """(top k, bottom k) com uma única partição dos valores."""
+        n = len(self)
+        k = max(0, min(int(k), n))
+        if k == 0 or 2 * k >= n:
+            return self.top(k), self.bottom(k)
+        part = np.argpartition(self.values, [k - 1, n - k])
+        lo, hi = part[:k], part[n - k:]
+        lo = lo[np.argsort(self.values[lo], kind="stable")]
+        hi = hi[np.argsort(-self.values[hi], kind="stable")]
+        return self._frame(hi), self._frame(lo)
+
+
+def build_rankings(df, key_col, value_cols):
+    """{métrica: Ranking} por 'key_col' para cada métrica de 'value_cols' presente em df."""
+    keys, sums = group_sums(df, key_col, value_cols)
+    return {c: Ranking(key_col, c, keys, v) for c, v in sums.items()}